@@ -13,7 +13,10 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
-from .models import Entity, Structure, EntityOwnership, ValidationRule, StructureNode, NodeOwnership
+from .models import (
+    Entity, Structure, EntityOwnership, ValidationRule, StructureNode, NodeOwnership,
+    JurisdictionAlert,
+)
 
 
 # Basic admin registration with some improvements
@@ -66,6 +69,7 @@ class EntityOwnershipAdmin(admin.ModelAdmin):
     list_display = ['structure', 'owned_entity', 'ownership_percentage']
     list_filter = ['structure', 'owned_entity']
     search_fields = ['structure__name', 'owned_entity__name']
+    autocomplete_fields = ['owner_ubo']
 
 
 @admin.register(ValidationRule)
@@ -108,6 +112,7 @@ class NodeOwnershipAdmin(admin.ModelAdmin):
     list_display = ['get_owner_name', 'owned_node', 'ownership_percentage', 'structure']
     list_filter = ['structure', 'owned_node__entity_template', 'owned_node__custom_name']
     search_fields = ['owned_node__custom_name', 'owner_party__name', 'owner_node__custom_name']
+    autocomplete_fields = ['owner_party']
     
     def get_owner_name(self, obj):
         if obj.owner_party:
@@ -127,4 +132,47 @@ class NodeOwnershipAdmin(admin.ModelAdmin):
     )
 
 
+class DeadlineStatusFilter(admin.SimpleListFilter):
+    title = 'deadline'
+    parameter_name = 'deadline'
+
+    def lookups(self, request, model_admin):
+        return list(JurisdictionAlert.STATUS_LABELS.items())
+
+    def queryset(self, request, queryset):
+        if self.value() in JurisdictionAlert.STATUS_LABELS:
+            return queryset.filter(deadline_status=self.value())
+        return queryset
+
+
+@admin.register(JurisdictionAlert)
+class JurisdictionAlertAdmin(admin.ModelAdmin):
+    list_display = [
+        'titulo', 'jurisdicao', 'tipo_alerta', 'prioridade', 'next_deadline',
+        'deadline_status_display', 'ativo'
+    ]
+    list_filter = [DeadlineStatusFilter, 'jurisdicao', 'tipo_alerta', 'deadline_type', 'ativo']
+    search_fields = ['titulo', 'descricao']
+    filter_horizontal = ['estruturas_aplicaveis']
+    actions = ['refresh_deadlines']
+
+    def get_queryset(self, request):
+        # Status calculado no banco: filtro e ordenação sem Python por linha
+        return super().get_queryset(request).with_deadline_status()
+
+    @admin.display(description='Status', ordering='deadline_rank')
+    def deadline_status_display(self, obj):
+        return format_html(
+            '<span style="color: {};">{}</span>',
+            obj.get_status_color(), obj.get_status_display()
+        )
+
+    @admin.action(description='Recalcular próximos prazos')
+    def refresh_deadlines(self, request, queryset):
+        updated = JurisdictionAlert.objects.filter(
+            pk__in=queryset.values('pk')
+        ).refresh_next_deadlines()
+        self.message_user(request, f"{updated} prazos atualizados")
+
+
 print("📋 Admin básico carregado com CSS/JS melhorado")
@@ -0,0 +1,56 @@
+"""
+Row claiming
+
+Shared by the review work queues (dashboard.work_queue) and the webhook
+outbox worker (corporate_relationship.webhooks): take up to N available rows
+for one claimant by writing the claim (owner, lease expiry) onto them.
+
+Where the database supports it this is SELECT ... FOR UPDATE SKIP LOCKED, so
+concurrent claimants never wait on or receive the same rows. On SQLite the
+claim is a conditional UPDATE that re-checks availability, followed by a read
+of the rows that now carry this claim; that gives the same no-duplicates
+guarantee because SQLite serializes writes, and a claimant that loses a race
+simply tries the next candidates.
+"""
+
+from django.db import connection, transaction
+
+# Attempts when conditional claims lose races (databases without SKIP LOCKED)
+CLAIM_ATTEMPTS = 3
+
+
+def claim_rows(available, ordering, limit, **claim):
+    """
+    Claim up to ``limit`` rows of the ``available`` queryset, in ``ordering``,
+    by updating them with the ``claim`` field values; returns their pks.
+
+    ``claim`` must identify this claimant (e.g. a user and a lease expiry),
+    since rows are recognised as won by carrying exactly those values.
+    """
+    model = available.model
+    claimed = []
+    with transaction.atomic():
+        if connection.features.has_select_for_update_skip_locked:
+            claimed = list(
+                available.order_by(*ordering)
+                .select_for_update(skip_locked=True)
+                .values_list('pk', flat=True)[:limit]
+            )
+            model.objects.filter(pk__in=claimed).update(**claim)
+        else:
+            for _ in range(CLAIM_ATTEMPTS):
+                candidates = list(
+                    available.exclude(pk__in=claimed)
+                    .order_by(*ordering)
+                    .values_list('pk', flat=True)[:limit - len(claimed)]
+                )
+                if not candidates:
+                    break
+                # Re-check availability in the UPDATE itself
+                available.filter(pk__in=candidates).update(**claim)
+                claimed += model.objects.filter(
+                    pk__in=candidates, **claim
+                ).values_list('pk', flat=True)
+                if len(claimed) >= limit:
+                    break
+    return claimed
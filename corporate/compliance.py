@@ -0,0 +1,178 @@
+"""
+Compliance calendar
+
+Turns JurisdictionAlert.estruturas_aplicaveis (alerts per Entity template)
+into a dated schedule per Structure: every active alert applying to the
+entity_template of an active StructureNode is expanded over a date window
+with JurisdictionAlert.deadlines_between(), and entries for the same alert and
+date are merged into one that lists every node (and, across a partner's
+structures, every structure) it applies to.
+
+All structures requested together are loaded in three queries (nodes,
+entities and one prefetch of their active alerts) and each alert is expanded
+once however many nodes share it. Calendars are cached per structure and
+window under the structure version kept by financial_department.quotes, which
+is bumped when the structure's nodes change, and a global alerts version
+bumped by signals.py whenever an alert or its entities change.
+"""
+
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from corporate_relationship.models import RelationshipStructure
+from financial_department.quotes import bump_version, structure_versions
+from .models import Entity, JurisdictionAlert, StructureNode
+
+ALERTS_VERSION_KEY = 'corporate:alerts_version'
+MAX_CALENDAR_DAYS = 3 * 366
+
+
+def calendar_cache_key(structure_id, structure_version, alerts_version, start, end):
+    return (
+        f'corporate:compliance_calendar:{structure_id}:{structure_version}:'
+        f'{alerts_version}:{start}:{end}'
+    )
+
+
+def _alerts_version():
+    version = cache.get(ALERTS_VERSION_KEY)
+    if version is None:
+        cache.add(ALERTS_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(ALERTS_VERSION_KEY)
+    return version
+
+
+def bump_alerts_version():
+    bump_version(ALERTS_VERSION_KEY)
+
+
+def calendar_window(start=None, end=None):
+    """
+    (start, end) dates from optional ISO strings.
+
+    Defaults to today and COMPLIANCE_CALENDAR_DAYS later. Raises ValueError for
+    malformed dates, an end before the start or a window longer than
+    MAX_CALENDAR_DAYS.
+    """
+    start = date.fromisoformat(start) if start else timezone.localdate()
+    end = date.fromisoformat(end) if end else start + timedelta(days=settings.COMPLIANCE_CALENDAR_DAYS)
+    if end < start:
+        raise ValueError('end must not be before start')
+    if (end - start).days > MAX_CALENDAR_DAYS:
+        raise ValueError(f'The window may span at most {MAX_CALENDAR_DAYS} days')
+    return start, end
+
+
+def _entry(alert, day, structure_id):
+    return {
+        'date': day,
+        'alert_id': alert.pk,
+        'title': alert.titulo,
+        'jurisdiction': alert.jurisdicao,
+        'alert_type': alert.tipo_alerta,
+        'priority': alert.prioridade,
+        'completed': bool(alert.last_completed and day <= alert.last_completed),
+        'structures': [structure_id],
+        'nodes': [],
+    }
+
+
+def _sort_key(entry):
+    return entry['date'], -entry['priority'], entry['title'], entry['alert_id']
+
+
+def build_calendars(structure_ids, start, end):
+    """{structure_id: calendar entries} for ``structure_ids``, uncached"""
+    nodes = list(
+        StructureNode.objects.filter(structure_id__in=set(structure_ids), is_active=True)
+        .order_by('structure_id', 'level', 'custom_name')
+        .values_list('pk', 'structure_id', 'custom_name', 'entity_template_id')
+    )
+    entities = Entity.objects.filter(
+        pk__in={entity_id for *_, entity_id in nodes}
+    ).only('pk').prefetch_related(Prefetch(
+        'jurisdictionalert_set',
+        queryset=JurisdictionAlert.objects.filter(ativo=True).order_by(),
+        to_attr='active_alerts',
+    ))
+
+    alerts = {}
+    dates = {}
+    for entity in entities:
+        alerts[entity.pk] = entity.active_alerts
+        for alert in entity.active_alerts:
+            if alert.pk not in dates:
+                dates[alert.pk] = alert.deadlines_between(start, end)
+
+    calendars = {structure_id: {} for structure_id in structure_ids}
+    for node_id, structure_id, name, entity_id in nodes:
+        entries = calendars[structure_id]
+        for alert in alerts.get(entity_id, ()):
+            for day in dates[alert.pk]:
+                entry = entries.get((alert.pk, day))
+                if entry is None:
+                    entry = entries[(alert.pk, day)] = _entry(alert, day, structure_id)
+                entry['nodes'].append({
+                    'node_id': node_id,
+                    'name': name,
+                    'entity_id': entity_id,
+                    'structure_id': structure_id,
+                })
+    return {
+        structure_id: sorted(entries.values(), key=_sort_key)
+        for structure_id, entries in calendars.items()
+    }
+
+
+def structure_calendars(structure_ids, start, end):
+    """{structure_id: calendar entries}, built in one batch for the uncached structures"""
+    versions = structure_versions(structure_ids)
+    alerts_version = _alerts_version()
+    keys = {
+        calendar_cache_key(structure_id, version, alerts_version, start, end): structure_id
+        for structure_id, version in versions.items()
+    }
+    calendars = {keys[key]: entries for key, entries in cache.get_many(keys).items()}
+
+    missing = [structure_id for structure_id in versions if structure_id not in calendars]
+    if missing:
+        built = build_calendars(missing, start, end)
+        cache.set_many(
+            {key: built[structure_id] for key, structure_id in keys.items() if structure_id in built},
+            settings.COMPLIANCE_CALENDAR_TTL,
+        )
+        calendars.update(built)
+    return calendars
+
+
+def merge_calendars(calendars):
+    """One schedule from several calendars, entries for the same alert and date merged"""
+    merged = {}
+    for entries in calendars:
+        for entry in entries:
+            key = (entry['alert_id'], entry['date'])
+            if key not in merged:
+                merged[key] = {**entry, 'structures': [], 'nodes': []}
+            merged[key]['structures'] += entry['structures']
+            merged[key]['nodes'] += entry['nodes']
+    return sorted(merged.values(), key=_sort_key)
+
+
+def structure_calendar(structure_id, start, end):
+    """Compliance deadlines of a Structure's active nodes between start and end"""
+    return structure_calendars([structure_id], start, end)[structure_id]
+
+
+def partner_calendar(partner_id, start, end):
+    """Merged compliance deadlines of every ACTIVE relationship structure of a partner"""
+    structure_ids = sorted(set(
+        RelationshipStructure.objects.filter(client_id=partner_id, status='ACTIVE')
+        .values_list('structure_id', flat=True)
+    ))
+    calendars = structure_calendars(structure_ids, start, end)
+    return merge_calendars(calendars[structure_id] for structure_id in structure_ids)
@@ -0,0 +1,76 @@
+"""
+Deadline recurrence
+
+Pure date arithmetic for JurisdictionAlert recurrences, shared by the
+per-alert helpers, the bulk refresh in JurisdictionAlertQuerySet and the
+compliance calendar. Month steps clamp to the last day of shorter months
+(Jan 31 + 1 month = Feb 28/29).
+"""
+
+import calendar
+from datetime import timedelta
+
+RECURRENCE_MONTHS = {
+    "MONTHLY": 1,
+    "QUARTERLY": 3,
+    "SEMIANUAL": 6,
+    "ANNUAL": 12,
+    "BIENNIAL": 24,
+}
+
+
+def add_months(day, months):
+    month_index = day.month - 1 + months
+    year = day.year + month_index // 12
+    month = month_index % 12 + 1
+    return day.replace(
+        year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1])
+    )
+
+
+def recurrence_step(pattern, config=None):
+    """
+    ('months', n) or ('days', n) for a recurrence pattern, or None.
+
+    CUSTOM patterns read ``months`` or ``days`` from custom_recurrence_config.
+    """
+    if pattern in RECURRENCE_MONTHS:
+        return ("months", RECURRENCE_MONTHS[pattern])
+    if pattern == "CUSTOM" and config:
+        for unit in ("months", "days"):
+            if int(config.get(unit) or 0) > 0:
+                return (unit, int(config[unit]))
+    return None
+
+
+def advance(day, step, times=1):
+    """``day`` moved forward ``times`` recurrence steps"""
+    unit, amount = step
+    if unit == "months":
+        return add_months(day, amount * times)
+    return day + timedelta(days=amount * times)
+
+
+def occurrences(anchor, step, start, end):
+    """
+    Dates of the recurrence through ``anchor`` that fall within [start, end].
+
+    Every date is computed from ``anchor`` itself, so month clamping never
+    drifts (Jan 31 monthly gives Feb 28, Mar 31, ...), and the window may lie
+    before or after the anchor.
+    """
+    unit, amount = step
+    if unit == "months":
+        times = ((start.year - anchor.year) * 12 + start.month - anchor.month) // amount - 1
+    else:
+        times = (start - anchor).days // amount - 1
+    while advance(anchor, step, times) < start:
+        times += 1
+
+    dates = []
+    day = advance(anchor, step, times)
+    while day <= end:
+        dates.append(day)
+        times += 1
+        day = advance(anchor, step, times)
+    return dates
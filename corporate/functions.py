@@ -0,0 +1,36 @@
+"""
+Reusable database functions
+"""
+
+from django.db import models
+
+
+class DaysUntil(models.Func):
+    """Dias inteiros entre ``today`` e uma coluna de data (negativo se passou)"""
+
+    output_field = models.IntegerField()
+
+    def __init__(self, expression, today, **extra):
+        super().__init__(
+            expression, models.Value(today, output_field=models.DateField()), **extra
+        )
+
+    def as_sql(self, compiler, connection, **extra_context):
+        # PostgreSQL: date - date já é um inteiro em dias
+        return super().as_sql(
+            compiler, connection, template="(%(expressions)s)", arg_joiner=" - ",
+            **extra_context
+        )
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template="CAST(julianday(%(expressions)s) AS INTEGER)",
+            arg_joiner=") - julianday(",
+            **extra_context
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection, function="DATEDIFF", **extra_context
+        )
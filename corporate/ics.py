@@ -0,0 +1,225 @@
+"""
+iCalendar feeds
+
+Per-user and per-structure .ics feeds of JurisdictionAlert next deadlines,
+open ServiceActivity due dates and Passport expirations, for subscription
+from external calendar clients. A user's feed covers the services they
+execute: their activities, the alerts connected to those services and the
+passports of parties owning nodes in the related structures. A structure's
+feed covers the alerts of its nodes' entity templates, the activities of its
+relationship services and the passports of its owning parties.
+
+Calendar clients cannot log in, so feeds are addressed by a signed token
+(feed_token) instead of a session. Tokens carry the issuing user and their
+CalendarFeedKey: they stop working when the key is rotated or the user is no
+longer active staff.
+
+Each request first reads only the primary key and updated_at stamps of the
+rows in the feed (one query per source). Those stamps make up the ETag, so an
+unchanged feed is answered with 304 before anything else is loaded. Each event
+is rendered once and cached under its row's stamps; on a cache miss only the
+rows whose stamps changed are loaded and rendered again. The body is streamed
+in chunks, so a large feed never sits in memory as a whole.
+"""
+
+import hashlib
+from datetime import timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+
+from corporate_relationship.models import ServiceActivity
+from parties.models import Passport
+from .models import CalendarFeedKey, JurisdictionAlert, StructureNode
+
+FEED_SALT = 'corporate.ics'
+FEED_SCOPES = ('user', 'structure')
+CHUNK_SIZE = 500
+
+
+def feed_token(scope, pk, user):
+    """Signed token identifying a feed issued by ``user``, for the calendar_feed URL"""
+    key = CalendarFeedKey.for_user(user).key
+    return signing.Signer(salt=FEED_SALT).sign(f'{scope}-{pk}-{user.pk}-{key}')
+
+
+def read_feed_token(token):
+    """
+    (scope, pk, issuing user) of a feed token; raises signing.BadSignature if
+    it is invalid, its user's key was rotated or the user is no longer active
+    staff
+    """
+    parts = signing.Signer(salt=FEED_SALT).unsign(token).split('-')
+    if len(parts) != 4:
+        raise signing.BadSignature(token)
+    scope, pk, user_id, key = parts
+    if scope not in FEED_SCOPES or not pk.isdigit() or not user_id.isdigit():
+        raise signing.BadSignature(token)
+    if scope == 'user' and pk != user_id:
+        raise signing.BadSignature(token)
+
+    feed_key = CalendarFeedKey.objects.select_related('user').filter(
+        user_id=user_id, key=key, user__is_active=True, user__is_staff=True,
+    ).first()
+    if feed_key is None:
+        raise signing.BadSignature(token)
+    return scope, int(pk), feed_key.user
+
+
+# Rows of each source in a feed
+
+def _alerts(scope, pk):
+    alerts = JurisdictionAlert.objects.filter(ativo=True, next_deadline__isnull=False)
+    if scope == 'user':
+        return alerts.filter(service_connection__executor_id=pk)
+    entities = StructureNode.objects.filter(structure_id=pk, is_active=True).values('entity_template_id')
+    return alerts.filter(estruturas_aplicaveis__in=entities).distinct()
+
+
+def _activities(scope, pk):
+    activities = ServiceActivity.objects.open().filter(due_date__isnull=False)
+    if scope == 'user':
+        return activities.filter(service__executor_id=pk)
+    return activities.filter(service__relationship_structure__structure_id=pk)
+
+
+def _passports(scope, pk):
+    passports = Passport.objects.filter(active=True)
+    if scope == 'user':
+        passports = passports.filter(
+            party__owned_nodes__structure__relationshipstructure__service__executor_id=pk
+        )
+    else:
+        passports = passports.filter(party__owned_nodes__structure_id=pk)
+    return passports.distinct()
+
+
+# Event text (RFC 5545)
+
+def _escape(text):
+    return (
+        str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def _fold(line):
+    """Split a content line into CRLF-terminated lines of at most 75 octets"""
+    parts, current, size = [], '', 0
+    for char in line:
+        width = len(char.encode('utf-8'))
+        if size + width > 75:
+            parts.append(current)
+            current, size = ' ', 1
+        current += char
+        size += width
+    parts.append(current)
+    return ''.join(f'{part}\r\n' for part in parts)
+
+
+def _event(uid, day, summary, description, stamp):
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{uid}',
+        f'DTSTAMP:{stamp.astimezone(dt_timezone.utc):%Y%m%dT%H%M%SZ}',
+        f'DTSTART;VALUE=DATE:{day:%Y%m%d}',
+        f'DTEND;VALUE=DATE:{day + timedelta(days=1):%Y%m%d}',
+        f'SUMMARY:{_escape(summary)}',
+    ]
+    if description:
+        lines.append(f'DESCRIPTION:{_escape(description)}')
+    lines.append('END:VEVENT')
+    return ''.join(_fold(line) for line in lines)
+
+
+def _alert_event(alert):
+    return _event(
+        f'alert-{alert.pk}@sirius', alert.next_deadline,
+        f'[{alert.jurisdicao}] {alert.titulo}', alert.descricao, alert.updated_at,
+    )
+
+
+def _activity_event(activity):
+    return _event(
+        f'activity-{activity.pk}@sirius', activity.due_date,
+        f'{activity.service.name}: {activity.activity_title}',
+        activity.activity_description, activity.updated_at,
+    )
+
+
+def _passport_event(passport):
+    return _event(
+        f'passport-{passport.pk}@sirius', passport.expires_at,
+        f'Passport expires: {passport.party.name} ({passport.issuing_country})',
+        '', passport.updated_at,
+    )
+
+
+# kind: (rows in a feed, stamp fields, model, select_related, renderer)
+SOURCES = {
+    'alert': (_alerts, ('updated_at',), JurisdictionAlert, (), _alert_event),
+    'activity': (
+        _activities, ('updated_at', 'service__updated_at'), ServiceActivity,
+        ('service',), _activity_event,
+    ),
+    'passport': (
+        _passports, ('updated_at', 'party__updated_at'), Passport, ('party',), _passport_event,
+    ),
+}
+
+
+def feed_stamps(scope, pk):
+    """{kind: [(pk, *updated_at stamps)]} of the rows in a feed, one query per source"""
+    return {
+        kind: list(
+            rows(scope, pk).order_by('pk').values_list('pk', *stamp_fields)
+        )
+        for kind, (rows, stamp_fields, *_) in SOURCES.items()
+    }
+
+
+def _digest(value):
+    return hashlib.sha1(repr(value).encode()).hexdigest()
+
+
+def feed_etag(name, stamps):
+    return _digest((name, sorted(stamps.items())))
+
+
+def _event_key(kind, row):
+    return f'corporate:ics:{kind}:{row[0]}:{_digest(row[1:])}'
+
+
+def _render_chunk(kind, rows):
+    _, _, model, related, render = SOURCES[kind]
+    keys = {row[0]: _event_key(kind, row) for row in rows}
+    events = cache.get_many(keys.values())
+
+    missing = [pk for pk, key in keys.items() if key not in events]
+    if missing:
+        rendered = {
+            keys[obj.pk]: render(obj)
+            for obj in model.objects.filter(pk__in=missing).select_related(*related)
+        }
+        cache.set_many(rendered, settings.CALENDAR_FEED_EVENT_TTL)
+        events.update(rendered)
+    # Linhas apagadas entre as duas consultas ficam de fora
+    return ''.join(events[keys[pk]] for pk in keys if keys[pk] in events)
+
+
+async def stream_feed(name, stamps):
+    """
+    Yield the .ics text of a feed, CHUNK_SIZE events at a time.
+
+    Asynchronous because the app is served over ASGI, where Django reads a
+    sync iterator into memory before sending it; each chunk is rendered in a
+    thread instead.
+    """
+    yield _fold('BEGIN:VCALENDAR') + _fold('VERSION:2.0') + _fold('PRODID:-//SIRIUS//Compliance Calendar//EN')
+    yield _fold('CALSCALE:GREGORIAN') + _fold(f'X-WR-CALNAME:{_escape(name)}')
+    for kind, rows in stamps.items():
+        for start in range(0, len(rows), CHUNK_SIZE):
+            yield await sync_to_async(_render_chunk)(kind, rows[start:start + CHUNK_SIZE])
+    yield _fold('END:VCALENDAR')
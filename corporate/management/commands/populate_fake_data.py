@@ -360,7 +360,7 @@ class Command(BaseCommand):
         
         for entity in entities:
             # Criar preço de entidade
-            entity_price, created = EntityPrice.objects.get_or_create(
+            entity_price, created = EntityPrice.objects.current().get_or_create(
                 entity=entity,
                 defaults={
                     'base_currency': 'USD',
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import models
+
+from corporate.models import JurisdictionAlert
+
+
+class Command(BaseCommand):
+    help = 'Recalculate next_deadline of every active JurisdictionAlert in one pass'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Rows per UPDATE batch',
+        )
+
+    def handle(self, *args, **options):
+        updated = JurisdictionAlert.objects.filter(ativo=True).refresh_next_deadlines(
+            batch_size=options['batch_size']
+        )
+
+        counts = dict.fromkeys(JurisdictionAlert.DEADLINE_STATUSES, 0)
+        rows = (
+            JurisdictionAlert.objects.filter(ativo=True)
+            .with_deadline_status()
+            .values('deadline_status')
+            .annotate(total=models.Count('pk'))
+            .order_by()
+        )
+        for row in rows:
+            counts[row['deadline_status']] = row['total']
+        for status, total in counts.items():
+            self.stdout.write(f"   - {JurisdictionAlert.STATUS_LABELS[status]}: {total}")
+
+        self.stdout.write(self.style.SUCCESS(f"{updated} alert deadlines updated"))
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-19 06:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('corporate', '0004_remove_entity_banking_relation_score_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='structure',
+            name='claim_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='structure',
+            name='claimed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='claimed_structures', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='structure',
+            index=models.Index(fields=['status', 'claim_expires_at'], name='corporate_s_status_d8aaaa_idx'),
+        ),
+    ]
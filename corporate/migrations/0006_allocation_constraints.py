@@ -0,0 +1,66 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:35
+
+from django.db import migrations, models
+
+
+def check_existing_rows(apps, schema_editor):
+    """
+    Stop with the offending rows before AddConstraint does: the database would
+    only report that some row violates the check. Nothing is fixed here, since
+    which owner or percentage is right has to be decided on the data itself.
+    """
+    violations = []
+    for operation in Migration.operations:
+        if not isinstance(operation, migrations.AddConstraint):
+            continue
+        model = apps.get_model('corporate', operation.model_name)
+        pks = list(
+            model._base_manager.exclude(operation.constraint.check)
+            .order_by('pk').values_list('pk', flat=True)[:50]
+        )
+        if pks:
+            violations.append(f"{operation.constraint.name}: {model.__name__} pk {pks}")
+    if violations:
+        raise ValueError(
+            "Fix these rows before applying the allocation constraints:\n  "
+            + "\n  ".join(violations)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('corporate', '0005_work_queue_claims'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_existing_rows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='entityownership',
+            constraint=models.CheckConstraint(check=models.Q(models.Q(('owner_entity__isnull', True), ('owner_ubo__isnull', False)), models.Q(('owner_entity__isnull', False), ('owner_ubo__isnull', True)), _connector='OR'), name='entity_ownership_one_owner', violation_error_message='Must specify exactly one owner (UBO or Entity)'),
+        ),
+        migrations.AddConstraint(
+            model_name='entityownership',
+            constraint=models.CheckConstraint(check=models.Q(models.Q(('ownership_percentage__gte', 0), ('ownership_percentage__lte', 100)), ('ownership_percentage__isnull', True), _connector='OR'), name='entity_ownership_percentage_range', violation_error_message='ownership_percentage must be between 0 and 100'),
+        ),
+        migrations.AddConstraint(
+            model_name='nodeownership',
+            constraint=models.CheckConstraint(check=models.Q(models.Q(('owner_node__isnull', True), ('owner_party__isnull', False)), models.Q(('owner_node__isnull', False), ('owner_party__isnull', True)), _connector='OR'), name='node_ownership_one_owner', violation_error_message='Must specify exactly one owner (owner_party or owner_node)'),
+        ),
+        migrations.AddConstraint(
+            model_name='nodeownership',
+            constraint=models.CheckConstraint(check=models.Q(('ownership_percentage__gt', 0), ('ownership_percentage__lte', 100)), name='node_ownership_percentage_range', violation_error_message='ownership_percentage must be between 0.01 and 100'),
+        ),
+        migrations.AddConstraint(
+            model_name='nodeownership',
+            constraint=models.CheckConstraint(check=models.Q(('owner_node', models.F('owned_node')), _negated=True), name='node_ownership_not_self', violation_error_message='Node cannot own itself'),
+        ),
+        migrations.AddConstraint(
+            model_name='successor',
+            constraint=models.CheckConstraint(check=models.Q(('percentual__gt', 0), ('percentual__lte', 100)), name='successor_percentual_range', violation_error_message='percentual must be between 0.01 and 100'),
+        ),
+        migrations.AddConstraint(
+            model_name='successor',
+            constraint=models.CheckConstraint(check=models.Q(('ubo_proprietario', models.F('ubo_sucessor')), _negated=True), name='successor_not_self', violation_error_message='UBO não pode ser sucessor de si mesmo'),
+        ),
+    ]
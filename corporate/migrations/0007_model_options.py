@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:59
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('corporate', '0006_allocation_constraints'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='entity',
+            options={'ordering': ['name'], 'verbose_name': 'Entidade Corporativa', 'verbose_name_plural': 'Entidades Corporativas'},
+        ),
+        migrations.AlterModelOptions(
+            name='nodeownership',
+            options={'verbose_name': 'Relacionamento de Propriedade', 'verbose_name_plural': 'Relacionamentos de Propriedade'},
+        ),
+        migrations.AlterModelOptions(
+            name='structure',
+            options={'ordering': ['-created_at'], 'verbose_name': 'Estrutura Corporativa', 'verbose_name_plural': 'Estruturas Corporativas'},
+        ),
+        migrations.AlterModelOptions(
+            name='structurenode',
+            options={'verbose_name': 'Entidade na Estrutura', 'verbose_name_plural': 'Entidades nas Estruturas'},
+        ),
+    ]
@@ -0,0 +1,168 @@
+"""
+Reusable model mixins
+"""
+
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+
+
+class ChangeTrackingMixin:
+    """
+    Remembers the database value of ``tracked_fields`` so changes can be
+    detected without re-fetching the row before saving.
+
+    Values are snapshotted when an instance is loaded, refreshed or saved.
+    During ``save()`` (including ``post_save`` handlers) ``has_changed`` and
+    ``previous`` still describe the change being saved; afterwards the
+    snapshot is reset to the saved values. Unsaved instances report every
+    tracked field as changed from ``None``.
+    """
+
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_tracked_fields()
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._snapshot_tracked_fields()
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._snapshot_tracked_fields(kwargs.get('update_fields'))
+
+    def _snapshot_tracked_fields(self, only=None):
+        names = self.tracked_fields
+        if only is not None and hasattr(self, '_tracked_snapshot'):
+            # A partial save only persisted these fields
+            names = [name for name in names if name in only]
+            snapshot = self._tracked_snapshot
+        else:
+            snapshot = self._tracked_snapshot = {}
+
+        # Deferred fields are not in __dict__ and are left out of the snapshot
+        for name in names:
+            attname = self._meta.get_field(name).attname
+            if attname in self.__dict__:
+                snapshot[name] = self.__dict__[attname]
+
+    def _current_value(self, field):
+        return getattr(self, self._meta.get_field(field).attname)
+
+    def previous(self, field):
+        """Value of ``field`` as last loaded from or saved to the database"""
+        if field not in self.tracked_fields:
+            raise ValueError(f"{field} is not a tracked field")
+        return getattr(self, '_tracked_snapshot', {}).get(field)
+
+    def has_changed(self, field):
+        """Whether ``field`` differs from its database value"""
+        if field not in self.tracked_fields:
+            raise ValueError(f"{field} is not a tracked field")
+        snapshot = getattr(self, '_tracked_snapshot', None)
+        if snapshot is None or field not in snapshot:
+            return True
+        return snapshot[field] != self._current_value(field)
+
+
+def exactly_one(name, *fields, message=None):
+    """CheckConstraint requiring exactly one of the nullable ``fields`` to be set"""
+    return models.CheckConstraint(
+        check=reduce(or_, (
+            models.Q(**{f'{field}__isnull': field != chosen for field in fields})
+            for chosen in fields
+        )),
+        name=name,
+        violation_error_message=message,
+    )
+
+
+def percentage_range(name, field, allow_zero=False, null=False):
+    """CheckConstraint keeping ``field`` within (0, 100], or [0, 100] with ``allow_zero``"""
+    check = models.Q(**{
+        f'{field}__gte' if allow_zero else f'{field}__gt': 0,
+        f'{field}__lte': 100,
+    })
+    if null:
+        check |= models.Q(**{f'{field}__isnull': True})
+    return models.CheckConstraint(
+        check=check,
+        name=name,
+        violation_error_message=f'{field} must be between {0 if allow_zero else 0.01} and 100',
+    )
+
+
+class AllocationMixin:
+    """
+    Caps the sum of ``allocation_field`` over the rows sharing a parent
+    (percentages of a giver, shares of an entity, ...).
+
+    ``save()`` locks the parent row with select_for_update before summing the
+    siblings, so concurrent saves under the same parent are serialized and
+    cannot both pass the check. ``clean()`` can call ``check_allocation()``
+    without the lock for early form feedback.
+
+    Subclasses implement ``allocation_parent()`` (model and pk of the row to
+    lock, or None to skip the check) and ``allocation_siblings()`` (the rows counted, the
+    instance itself is excluded here), and may override
+    ``allocation_limit()`` and ``counts_toward_allocation()``. Bulk paths that
+    validate a whole set under the same lock themselves (see
+    parties.beneficiaries) set ``skip_allocation_check`` on the instances.
+    """
+
+    skip_allocation_check = False
+
+    allocation_field = 'percentage'
+    allocation_message = 'Total allocation cannot exceed {limit} (available: {available})'
+
+    def allocation_parent(self):
+        raise NotImplementedError
+
+    def allocation_siblings(self):
+        raise NotImplementedError
+
+    def allocation_limit(self):
+        return 100
+
+    def counts_toward_allocation(self):
+        return True
+
+    def check_allocation(self, lock=False):
+        if self.skip_allocation_check:
+            return
+        amount = getattr(self, self.allocation_field)
+        parent = self.allocation_parent()
+        if not amount or parent is None or not self.counts_toward_allocation():
+            return
+        if lock:
+            parent_model, parent_pk = parent
+            list(
+                parent_model._base_manager.select_for_update()
+                .filter(pk=parent_pk).values_list('pk', flat=True)
+            )
+
+        siblings = self.allocation_siblings()
+        if self.pk:
+            siblings = siblings.exclude(pk=self.pk)
+        allocated = siblings.aggregate(total=models.Sum(self.allocation_field))['total'] or 0
+        # Forms and JSON payloads may hand in floats or strings
+        total = Decimal(allocated) + Decimal(str(amount))
+        limit = self.allocation_limit()
+        if total > limit:
+            raise ValidationError({
+                self.allocation_field: self.allocation_message.format(
+                    limit=limit, total=total, available=limit - allocated,
+                )
+            })
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            self.check_allocation(lock=True)
+            super().save(*args, **kwargs)
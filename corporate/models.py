@@ -1,8 +1,14 @@
+import secrets
+
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 
+from .deadlines import advance, occurrences, recurrence_step
+from .functions import DaysUntil
+from .mixins import AllocationMixin, ChangeTrackingMixin, exactly_one, percentage_range
+
 
 class Entity(models.Model):
     """
@@ -321,12 +327,14 @@ class Entity(models.Model):
         ]
 
 
-class Structure(models.Model):
+class Structure(ChangeTrackingMixin, models.Model):
     """
     Represents ownership hierarchies (corporate tree) among Entities and UBOs
     Purpose: Model complex corporate ownership structures
     """
 
+    tracked_fields = ('status',)
+
     STATUS_CHOICES = [
         ('DRAFTING', 'Drafting'),
         ('SENT_FOR_APPROVAL', 'Sent for Approval'),
@@ -339,6 +347,16 @@ class Structure(models.Model):
     # Status Management
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='DRAFTING')
 
+    # Approval work queue claim (lease renewed by heartbeat)
+    claimed_by = models.ForeignKey(
+        'auth.User',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='claimed_structures'
+    )
+    claim_expires_at = models.DateTimeField(null=True, blank=True)
+
     # Validation aggregated fields
     tax_impacts = models.TextField(
         blank=True,
@@ -360,12 +378,17 @@ class Structure(models.Model):
         indexes = [
             models.Index(fields=["status"]),
             models.Index(fields=["created_at"]),
+            models.Index(fields=["status", "claim_expires_at"]),
         ]
 
     def __str__(self):
         return f"{self.name} ({self.get_status_display()})"
 
     def save(self, *args, **kwargs):
+        sent_for_approval = (
+            self.status == 'SENT_FOR_APPROVAL' and self.has_changed('status')
+        )
+
         # Save first to get primary key
         super().save(*args, **kwargs)
         
@@ -376,7 +399,7 @@ class Structure(models.Model):
             if self.tax_impacts or self.severity_levels:
                 super().save(update_fields=['tax_impacts', 'severity_levels'])
         
-        if self.status == 'SENT_FOR_APPROVAL':
+        if sent_for_approval:
             # Trigger notification to approvers
             self.notify_approvers()
 
@@ -459,7 +482,7 @@ class Structure(models.Model):
             self.validate_entity_combinations()
 
 
-class EntityOwnership(models.Model):
+class EntityOwnership(AllocationMixin, models.Model):
     """
     Manages ownership relationships within a Structure
     Handles both UBO → Entity and Entity → Entity ownership
@@ -566,6 +589,23 @@ class EntityOwnership(models.Model):
             models.Index(fields=["owner_ubo"]),
             models.Index(fields=["owner_entity"]),
         ]
+        constraints = [
+            exactly_one(
+                "entity_ownership_one_owner", "owner_ubo", "owner_entity",
+                message="Must specify exactly one owner (UBO or Entity)",
+            ),
+            percentage_range(
+                "entity_ownership_percentage_range", "ownership_percentage",
+                allow_zero=True, null=True,
+            ),
+        ]
+
+    # Percentages held in an entity within a structure (AllocationMixin)
+    allocation_field = 'ownership_percentage'
+    allocation_message = (
+        "Total ownership of an entity in a structure cannot exceed 100% "
+        "(available: {available}%)"
+    )
 
     def __str__(self):
         owner_name = ""
@@ -579,10 +619,7 @@ class EntityOwnership(models.Model):
 
     def clean(self):
         super().clean()
-        # Validate that exactly one owner type is specified
-        owner_count = sum([bool(self.owner_ubo), bool(self.owner_entity)])
-        if owner_count != 1:
-            raise ValidationError("Must specify exactly one owner (UBO or Entity)")
+        # Exactly one owner is enforced by the entity_ownership_one_owner constraint
 
         # Validate Corporate Name or Hash Number when entity is used in structure
         if not self.corporate_name and not self.hash_number:
@@ -590,22 +627,12 @@ class EntityOwnership(models.Model):
                 "Entity in structure must have Corporate Name, Hash Number, or both"
             )
 
-        # Validate share distribution
-        if self.owned_entity.total_shares:
-            self.validate_shares_distribution()
+        # Total held in the entity (save() checks again under lock)
+        self.check_allocation()
 
     def save(self, *args, **kwargs):
-        # Auto-calculate percentage from shares (FASE 4)
-        if self.owned_shares and self.owned_entity.total_shares:
-            calculated_percentage = (self.owned_shares / self.owned_entity.total_shares) * 100
-            if not self.ownership_percentage:
-                self.ownership_percentage = calculated_percentage
-
-        # Auto-calculate shares from percentage (FASE 4)
-        elif self.ownership_percentage and self.owned_entity.total_shares:
-            calculated_shares = int((self.ownership_percentage / 100) * self.owned_entity.total_shares)
-            if not self.owned_shares:
-                self.owned_shares = calculated_shares
+        # Shares and percentage are no longer derived from each other here:
+        # Entity.total_shares was removed (total shares live on StructureNode)
 
         # Calculate total values (FASE 3)
         self.calculate_total_values()
@@ -619,23 +646,14 @@ class EntityOwnership(models.Model):
         if self.share_value_eur and self.owned_shares:
             self.total_value_eur = self.owned_shares * self.share_value_eur
 
-    def validate_shares_distribution(self):
-        """Validate that all shares have owners (FASE 4)"""
-        total_owned = EntityOwnership.objects.filter(
-            structure=self.structure,
-            owned_entity=self.owned_entity
-        ).exclude(pk=self.pk).aggregate(
-            total=models.Sum('owned_shares')
-        )['total'] or 0
+    def allocation_parent(self):
+        return (Structure, self.structure_id) if self.structure_id else None
 
-        if self.owned_shares:
-            total_owned += self.owned_shares
+    def allocation_siblings(self):
+        return EntityOwnership.objects.filter(
+            structure_id=self.structure_id, owned_entity_id=self.owned_entity_id
+        )
 
-        if total_owned > self.owned_entity.total_shares:
-            raise ValidationError(
-                f"Total owned shares ({total_owned}) cannot exceed "
-                f"entity total shares ({self.owned_entity.total_shares})"
-            )
 
 class MasterEntity(models.Model):
     """
@@ -863,6 +881,82 @@ class UBO(models.Model):
         return ", ".join([parte for parte in partes if parte])
 
 
+class JurisdictionAlertQuerySet(models.QuerySet):
+    """Status de prazo calculado no banco, para filtrar e ordenar listas em SQL"""
+
+    def with_deadline_status(self, today=None):
+        """
+        Annotate days_to_deadline, deadline_status (OVERDUE, DUE_SOON,
+        SCHEDULED or NO_DEADLINE, same rules as get_status_display) and
+        deadline_rank (0 = most urgent) for ordering.
+        """
+        today = today or timezone.localdate()
+        return self.annotate(
+            days_to_deadline=DaysUntil("next_deadline", today),
+        ).annotate(
+            deadline_status=models.Case(
+                models.When(next_deadline__isnull=True, then=models.Value("NO_DEADLINE")),
+                models.When(days_to_deadline__lt=0, then=models.Value("OVERDUE")),
+                models.When(
+                    days_to_deadline__lte=models.F("advance_notice_days"),
+                    then=models.Value("DUE_SOON"),
+                ),
+                default=models.Value("SCHEDULED"),
+                output_field=models.CharField(),
+            ),
+            deadline_rank=models.Case(
+                *[
+                    models.When(deadline_status=status, then=models.Value(rank))
+                    for rank, status in enumerate(JurisdictionAlert.DEADLINE_STATUSES)
+                ],
+                output_field=models.IntegerField(),
+            ),
+        )
+
+    def with_status(self, status, today=None):
+        return self.with_deadline_status(today).filter(deadline_status=status)
+
+    def refresh_next_deadlines(self, today=None, batch_size=500):
+        """
+        Recalculate next_deadline for every alert in the queryset in one pass.
+
+        Same rules as update_next_deadline(), except that a recurring alert
+        never completed keeps the deadline it already has. Only rows whose
+        value changes are written, with bulk_update. Returns the number of
+        updated alerts.
+        """
+        today = today or timezone.localdate()
+        now = timezone.now()
+        changed = []
+        alerts = self.only(
+            "pk", "deadline_type", "single_deadline", "recurrence_pattern",
+            "custom_recurrence_config", "last_completed", "auto_calculate_next",
+            "next_deadline",
+        )
+        for alert in alerts.iterator(chunk_size=batch_size):
+            if alert.deadline_type == "SINGLE":
+                deadline = alert.single_deadline
+            elif alert.deadline_type == "RECURRING" and alert.auto_calculate_next:
+                if alert.last_completed is None and alert.next_deadline:
+                    # Nunca concluído: manter o prazo em vez de empurrá-lo a cada execução
+                    continue
+                deadline = alert.calculate_next_deadline(today)
+            else:
+                continue
+            if deadline != alert.next_deadline:
+                alert.next_deadline = deadline
+                alert.updated_at = now  # bulk_update não aplica auto_now
+                changed.append(alert)
+
+        self.model.objects.bulk_update(changed, ["next_deadline", "updated_at"], batch_size=batch_size)
+        if changed:
+            # bulk_update não dispara os signals que invalidam o calendário
+            from .compliance import bump_alerts_version
+
+            transaction.on_commit(bump_alerts_version)
+        return len(changed)
+
+
 class JurisdictionAlert(models.Model):
     """
     Model for jurisdiction-specific alerts and compliance requirements.
@@ -892,6 +986,21 @@ class JurisdictionAlert(models.Model):
         ("RECURRING", "Recurring Deadline"),
     ]
 
+    # Status de prazo na ordem de urgência (deadline_rank)
+    DEADLINE_STATUSES = ("OVERDUE", "DUE_SOON", "SCHEDULED", "NO_DEADLINE")
+    STATUS_LABELS = {
+        "OVERDUE": "Overdue",
+        "DUE_SOON": "Due Soon",
+        "SCHEDULED": "Scheduled",
+        "NO_DEADLINE": "No Deadline",
+    }
+    STATUS_COLORS = {
+        "OVERDUE": "#dc3545",  # Red
+        "DUE_SOON": "#ffc107",  # Yellow
+        "SCHEDULED": "#28a745",  # Green
+        "NO_DEADLINE": "#6c757d",  # Gray
+    }
+
     RECURRENCE_PATTERNS = [
         ("MONTHLY", "Monthly"),
         ("QUARTERLY", "Quarterly"),
@@ -989,6 +1098,8 @@ class JurisdictionAlert(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = JurisdictionAlertQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Jurisdiction Alert"
         verbose_name_plural = "Jurisdiction Alerts"
@@ -1025,35 +1136,36 @@ class JurisdictionAlert(models.Model):
                     "Single deadline should not be set for recurring deadline type"
                 )
 
-    def calculate_next_deadline(self):
+    def calculate_next_deadline(self, today=None):
         """Calculate the next deadline based on recurrence pattern"""
         if self.deadline_type != "RECURRING" or not self.recurrence_pattern:
             return None
 
-        from dateutil.relativedelta import relativedelta
+        step = recurrence_step(self.recurrence_pattern, self.custom_recurrence_config)
+        if step is None:
+            return None
 
         # Use last_completed as base, or current date if never completed
-        base_date = self.last_completed or timezone.now().date()
-
-        if self.recurrence_pattern == "MONTHLY":
-            return base_date + relativedelta(months=1)
-        elif self.recurrence_pattern == "QUARTERLY":
-            return base_date + relativedelta(months=3)
-        elif self.recurrence_pattern == "SEMIANUAL":
-            return base_date + relativedelta(months=6)
-        elif self.recurrence_pattern == "ANNUAL":
-            return base_date + relativedelta(years=1)
-        elif self.recurrence_pattern == "BIENNIAL":
-            return base_date + relativedelta(years=2)
-        elif self.recurrence_pattern == "CUSTOM":
-            # Handle custom patterns from custom_recurrence_config
-            config = self.custom_recurrence_config
-            if "months" in config:
-                return base_date + relativedelta(months=config["months"])
-            elif "days" in config:
-                return base_date + relativedelta(days=config["days"])
-
-        return None
+        base_date = self.last_completed or today or timezone.localdate()
+        return advance(base_date, step)
+
+    def deadlines_between(self, start, end):
+        """
+        Deadline dates of this alert within [start, end].
+
+        Recurrences are expanded from the stored next_deadline (or
+        last_completed), so the result does not depend on the current date;
+        recurring alerts with neither are skipped until a deadline is set.
+        """
+        if self.deadline_type == "SINGLE":
+            day = self.single_deadline
+            return [day] if day and start <= day <= end else []
+
+        step = recurrence_step(self.recurrence_pattern, self.custom_recurrence_config)
+        anchor = self.next_deadline or self.last_completed
+        if step is None or anchor is None:
+            return []
+        return occurrences(anchor, step, start, end)
 
     def update_next_deadline(self):
         """Update the next_deadline field based on calculation"""
@@ -1066,7 +1178,7 @@ class JurisdictionAlert(models.Model):
 
     def mark_completed(self, completion_date=None):
         """Mark alert as completed and update next deadline"""
-        completion_date = completion_date or timezone.now().date()
+        completion_date = completion_date or timezone.localdate()
         self.last_completed = completion_date
 
         if self.deadline_type == "RECURRING" and self.auto_calculate_next:
@@ -1074,50 +1186,45 @@ class JurisdictionAlert(models.Model):
 
         self.save(update_fields=["last_completed", "next_deadline"])
 
-    def is_overdue(self):
-        """Check if alert is overdue"""
-        if not self.next_deadline:
-            return False
-        return timezone.now().date() > self.next_deadline
-
     def days_until_deadline(self):
         """Calculate days until next deadline"""
+        if hasattr(self, "days_to_deadline"):  # annotated by with_deadline_status()
+            return self.days_to_deadline
         if not self.next_deadline:
             return None
-        delta = self.next_deadline - timezone.now().date()
-        return delta.days
+        return (self.next_deadline - timezone.localdate()).days
 
-    def needs_advance_notice(self):
-        """Check if advance notice should be triggered"""
+    def get_deadline_status(self):
+        """OVERDUE, DUE_SOON, SCHEDULED or NO_DEADLINE"""
+        if hasattr(self, "deadline_status"):  # annotated by with_deadline_status()
+            return self.deadline_status
         days_until = self.days_until_deadline()
         if days_until is None:
-            return False
-        return 0 <= days_until <= self.advance_notice_days
+            return "NO_DEADLINE"
+        if days_until < 0:
+            return "OVERDUE"
+        if days_until <= self.advance_notice_days:
+            return "DUE_SOON"
+        return "SCHEDULED"
+
+    def is_overdue(self):
+        """Check if alert is overdue"""
+        return self.get_deadline_status() == "OVERDUE"
+
+    def needs_advance_notice(self):
+        """Check if advance notice should be triggered"""
+        return self.get_deadline_status() == "DUE_SOON"
 
     def get_status_display(self):
         """Get human-readable status"""
-        if self.is_overdue():
-            return "Overdue"
-        elif self.needs_advance_notice():
-            return "Due Soon"
-        elif self.next_deadline:
-            return "Scheduled"
-        else:
-            return "No Deadline"
+        return self.STATUS_LABELS[self.get_deadline_status()]
 
     def get_status_color(self):
         """Get color code for status display"""
-        if self.is_overdue():
-            return "#dc3545"  # Red
-        elif self.needs_advance_notice():
-            return "#ffc107"  # Yellow
-        elif self.next_deadline:
-            return "#28a745"  # Green
-        else:
-            return "#6c757d"  # Gray
+        return self.STATUS_COLORS[self.get_deadline_status()]
 
 
-class Successor(models.Model):
+class Successor(AllocationMixin, models.Model):
     """
     Modelo para gestão de sucessão entre UBOs
     This model will be migrated to parties.BeneficiaryRelation in Phase 3
@@ -1178,6 +1285,18 @@ class Successor(models.Model):
             models.Index(fields=["ubo_proprietario", "ativo"]),
             models.Index(fields=["data_efetivacao"]),
         ]
+        constraints = [
+            percentage_range("successor_percentual_range", "percentual"),
+            models.CheckConstraint(
+                check=~models.Q(ubo_proprietario=models.F("ubo_sucessor")),
+                name="successor_not_self",
+                violation_error_message="UBO não pode ser sucessor de si mesmo",
+            ),
+        ]
+
+    # Soma dos percentuais ativos de um proprietário (AllocationMixin)
+    allocation_field = "percentual"
+    allocation_message = "Soma dos percentuais excede 100%. Disponível: {available}%"
 
     def __str__(self):
         return (
@@ -1188,31 +1307,17 @@ class Successor(models.Model):
     def clean(self):
         """Validações customizadas"""
         super().clean()
+        # Sem lock: o save() repete a verificação com o proprietário bloqueado
+        self.check_allocation()
 
-        # Validar que sucessor não é o mesmo que proprietário
-        if self.ubo_proprietario == self.ubo_sucessor:
-            raise ValidationError("UBO não pode ser sucessor de si mesmo")
+    def allocation_parent(self):
+        return (UBO, self.ubo_proprietario_id) if self.ubo_proprietario_id else None
 
-        # Validar soma de percentuais para o mesmo proprietário
-        if self.pk:
-            outros_sucessores = Successor.objects.filter(
-                ubo_proprietario=self.ubo_proprietario, ativo=True
-            ).exclude(pk=self.pk)
-        else:
-            outros_sucessores = Successor.objects.filter(
-                ubo_proprietario=self.ubo_proprietario, ativo=True
-            )
+    def allocation_siblings(self):
+        return Successor.objects.filter(ubo_proprietario_id=self.ubo_proprietario_id, ativo=True)
 
-        total_outros = sum(s.percentual for s in outros_sucessores)
-        if total_outros + self.percentual > 100:
-            raise ValidationError(
-                {
-                    "percentual": (
-                        f"Soma dos percentuais excede 100%. "
-                        f"Disponível: {100 - total_outros}%"
-                    )
-                }
-            )
+    def counts_toward_allocation(self):
+        return self.ativo
 
 
 class StructureOwnership(models.Model):
@@ -1378,7 +1483,7 @@ class StructureNode(models.Model):
             raise ValidationError("Child node level must be greater than parent level")
 
 
-class NodeOwnership(models.Model):
+class NodeOwnership(AllocationMixin, models.Model):
     """
     Represents ownership relationships between nodes in a structure.
     Replaces EntityOwnership for the new node-based system.
@@ -1462,6 +1567,22 @@ class NodeOwnership(models.Model):
             models.Index(fields=['owner_node']),
             models.Index(fields=['owned_node']),
         ]
+        constraints = [
+            exactly_one(
+                'node_ownership_one_owner', 'owner_party', 'owner_node',
+                message="Must specify exactly one owner (owner_party or owner_node)",
+            ),
+            percentage_range('node_ownership_percentage_range', 'ownership_percentage'),
+            models.CheckConstraint(
+                check=~models.Q(owner_node=models.F('owned_node')),
+                name='node_ownership_not_self',
+                violation_error_message="Node cannot own itself",
+            ),
+        ]
+
+    # Percentages held in a node (AllocationMixin)
+    allocation_field = 'ownership_percentage'
+    allocation_message = "Total ownership of a node cannot exceed 100% (available: {available}%)"
     
     def __str__(self):
         owner_name = self.owner_party.name if self.owner_party else self.owner_node.custom_name
@@ -1470,22 +1591,21 @@ class NodeOwnership(models.Model):
     def clean(self):
         """Validate ownership constraints"""
         super().clean()
-        
-        # Must have exactly one owner (party or node)
-        if not self.owner_party and not self.owner_node:
-            raise ValidationError("Must specify either owner_party or owner_node")
-        
-        if self.owner_party and self.owner_node:
-            raise ValidationError("Cannot specify both owner_party and owner_node")
-        
-        # Prevent self-ownership for nodes
-        if self.owner_node and self.owner_node == self.owned_node:
-            raise ValidationError("Node cannot own itself")
+        # Exactly one owner and no self-ownership are enforced by constraints
         
         # Validate shares consistency
         if self.owned_shares and self.owned_node.total_shares:
             if self.owned_shares > self.owned_node.total_shares:
                 raise ValidationError("Owned shares cannot exceed total shares")
+
+        # Total held in the node (save() checks again under lock)
+        self.check_allocation()
+
+    def allocation_parent(self):
+        return (StructureNode, self.owned_node_id) if self.owned_node_id else None
+
+    def allocation_siblings(self):
+        return NodeOwnership.objects.filter(owned_node_id=self.owned_node_id)
     
     def save(self, *args, **kwargs):
         """Auto-calculate total value if possible"""
@@ -1493,3 +1613,35 @@ class NodeOwnership(models.Model):
             self.total_value_usd = self.owned_shares * self.share_value_usd
         super().save(*args, **kwargs)
 
+
+def _feed_key():
+    return secrets.token_hex(16)
+
+
+class CalendarFeedKey(models.Model):
+    """
+    Per-user secret signed into the user's calendar feed tokens (see
+    corporate/ics.py). Rotating it revokes every feed URL the user issued.
+    """
+    user = models.OneToOneField(
+        'auth.User',
+        on_delete=models.CASCADE,
+        related_name='calendar_feed_key'
+    )
+    key = models.CharField(max_length=32, default=_feed_key)
+    rotated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Calendar Feed Key"
+        verbose_name_plural = "Calendar Feed Keys"
+
+    def __str__(self):
+        return f"Calendar feed key of {self.user}"
+
+    @classmethod
+    def for_user(cls, user):
+        return cls.objects.get_or_create(user=user)[0]
+
+    def rotate(self):
+        self.key = _feed_key()
+        self.save(update_fields=['key', 'rotated_at'])
@@ -0,0 +1,19 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .compliance import bump_alerts_version
+from .models import JurisdictionAlert
+
+
+# Versão usada na chave do cache do calendário de compliance (compliance.py)
+
+@receiver([post_save, post_delete], sender=JurisdictionAlert)
+def bump_compliance_alerts_version(sender, instance, **kwargs):
+    transaction.on_commit(bump_alerts_version)
+
+
+@receiver(m2m_changed, sender=JurisdictionAlert.estruturas_aplicaveis.through)
+def bump_compliance_entities_version(sender, action, **kwargs):
+    if action.startswith('post_'):
+        transaction.on_commit(bump_alerts_version)
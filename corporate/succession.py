@@ -0,0 +1,207 @@
+"""
+Succession resolver
+
+Answers "if these parties pass away, who ends up with what": the shares a
+deceased party leaves through its active BeneficiaryRelations (or a UBO
+through its Successors) are passed on to each heir, and on again when an heir
+is deceased as well, over as many generations as the chains go. What a giver
+does not allocate (benefits adding up to less than 100%) stays with its
+estate. A chain leading back to a party already on it is a cycle; the share
+that would go round it stays with the estate of that party and the cycle is
+reported.
+
+The graph is loaded with one query for all deceased givers and each giver is
+resolved once (results are reused wherever a giver appears in several
+chains, unless its chain ran into a cycle). post_succession_ownership()
+applies the result to the NodeOwnerships of the structures the deceased hold
+nodes in, with two more queries, so a what-if stays interactive however deep
+the chains are.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from parties.models import BeneficiaryRelation, Party
+from .models import NodeOwnership, Successor
+
+HUNDRED = Decimal(100)
+PRECISION = Decimal('0.0001')
+
+
+def beneficiary_graph(party_ids):
+    """{giver party id: [(beneficiary id, fraction)]} of the active benefits of ``party_ids``"""
+    graph = defaultdict(list)
+    rows = BeneficiaryRelation.objects.filter(
+        active=True, giver_party_id__in=party_ids
+    ).order_by('pk').values_list('giver_party_id', 'beneficiary_id', 'percentage')
+    for giver, heir, percentage in rows:
+        graph[giver].append((heir, percentage / HUNDRED))
+    return graph
+
+
+def successor_graph(ubo_ids):
+    """{UBO id: [(successor UBO id, fraction)]} of the active successions of ``ubo_ids``"""
+    graph = defaultdict(list)
+    rows = Successor.objects.filter(
+        ativo=True, ubo_proprietario_id__in=ubo_ids
+    ).order_by('pk').values_list('ubo_proprietario_id', 'ubo_sucessor_id', 'percentual')
+    for giver, heir, percentage in rows:
+        graph[giver].append((heir, percentage / HUNDRED))
+    return graph
+
+
+def _resolve(giver, graph, deceased, path, memo, cycles):
+    """({heir: fraction}, {estate: fraction}, reusable) of one unit left by ``giver``"""
+    if giver in memo:
+        return memo[giver]
+    heirs = defaultdict(Decimal)
+    estates = defaultdict(Decimal)
+    reusable = True
+    given = Decimal(0)
+
+    path.append(giver)
+    for heir, fraction in graph.get(giver, ()):
+        given += fraction
+        if heir not in deceased:
+            heirs[heir] += fraction
+        elif heir in path:
+            # Ciclo: a parcela volta ao espólio de quem já está na cadeia
+            cycle = path[path.index(heir):]
+            start = cycle.index(min(cycle))
+            cycles.add(tuple(cycle[start:] + cycle[:start]))
+            estates[heir] += fraction
+            reusable = False
+        else:
+            sub_heirs, sub_estates, sub_reusable = _resolve(heir, graph, deceased, path, memo, cycles)
+            for party, share in sub_heirs.items():
+                heirs[party] += fraction * share
+            for party, share in sub_estates.items():
+                estates[party] += fraction * share
+            reusable = reusable and sub_reusable
+    path.pop()
+
+    if given < 1:
+        estates[giver] += 1 - given
+    result = (dict(heirs), dict(estates), reusable)
+    if reusable:
+        memo[giver] = result
+    return result
+
+
+def resolve_succession(graph, deceased):
+    """
+    {deceased id: {'heirs': {id: fraction}, 'estates': {id: fraction}}} and
+    the cycles found, for a graph of {giver: [(heir, fraction)]}.
+
+    Fractions are of everything the deceased held: ``heirs`` are the living
+    parties that receive part of it, ``estates`` the deceased whose estate
+    keeps the part that was not allocated or went round a cycle.
+    """
+    deceased = set(deceased)
+    memo = {}
+    cycles = set()
+    flows = {}
+    for giver in sorted(deceased):
+        heirs, estates, _ = _resolve(giver, graph, deceased, [], memo, cycles)
+        flows[giver] = {'heirs': heirs, 'estates': estates}
+    return flows, sorted(cycles)
+
+
+def party_succession(party_ids):
+    """resolve_succession() over the BeneficiaryRelations of deceased parties"""
+    return resolve_succession(beneficiary_graph(party_ids), party_ids)
+
+
+def ubo_succession(ubo_ids):
+    """resolve_succession() over the Successors of deceased UBOs"""
+    return resolve_succession(successor_graph(ubo_ids), ubo_ids)
+
+
+def _percent(fraction):
+    return (fraction * HUNDRED).quantize(PRECISION)
+
+
+def post_succession_ownership(party_ids, structure_ids=None):
+    """
+    The NodeOwnership table after ``party_ids`` pass away, by structure and
+    owned node, with the percentage each owner held before.
+
+    Covers the structures where the deceased own nodes, or ``structure_ids``.
+    Owners are parties, owner nodes or the estate of a deceased party.
+    """
+    party_ids = set(party_ids)
+    flows, cycles = party_succession(party_ids)
+
+    if structure_ids is None:
+        structure_ids = NodeOwnership.objects.filter(owner_party_id__in=party_ids).values('structure_id')
+    rows = (
+        NodeOwnership.objects.filter(structure_id__in=structure_ids)
+        .order_by('structure_id', 'owned_node__custom_name', 'pk')
+        .values_list(
+            'structure_id', 'structure__name', 'owned_node_id', 'owned_node__custom_name',
+            'owner_party_id', 'owner_node_id', 'owner_node__custom_name', 'ownership_percentage',
+        )
+    )
+
+    table = {}
+
+    def holding(structure, node, owner_type, owner_id, owner_name=None):
+        key = (structure[0], node[0], owner_type, owner_id)
+        if key not in table:
+            table[key] = {
+                'structure_id': structure[0],
+                'structure': structure[1],
+                'node_id': node[0],
+                'node': node[1],
+                'owner_type': owner_type,
+                'owner_id': owner_id,
+                'owner': owner_name,
+                'before': Decimal(0),
+                'after': Decimal(0),
+                'inherited_from': [],
+            }
+        return table[key]
+
+    for structure_id, structure_name, node_id, node_name, party_id, *owner_node, percentage in rows:
+        structure, node = (structure_id, structure_name), (node_id, node_name)
+        if owner_node[0]:
+            row = holding(structure, node, 'node', *owner_node)
+            row['before'] += percentage
+            row['after'] += percentage
+            continue
+
+        holding(structure, node, 'party', party_id)['before'] += percentage
+        if party_id not in party_ids:
+            holding(structure, node, 'party', party_id)['after'] += percentage
+            continue
+        received = [('party', heir, share) for heir, share in flows[party_id]['heirs'].items()]
+        received += [('estate', estate, share) for estate, share in flows[party_id]['estates'].items()]
+        for owner_type, owner_id, share in received:
+            row = holding(structure, node, owner_type, owner_id)
+            row['after'] += percentage * share
+            row['inherited_from'].append(party_id)
+
+    names = dict(
+        Party.objects.filter(
+            pk__in={row['owner_id'] for row in table.values() if row['owner_type'] != 'node'}
+        ).values_list('pk', 'name')
+    )
+    for row in table.values():
+        if row['owner_type'] != 'node':
+            row['owner'] = names.get(row['owner_id'])
+        row['after'] = row['after'].quantize(PRECISION)
+
+    return {
+        'flows': {
+            party_id: {
+                kind: {pk: _percent(share) for pk, share in shares.items()}
+                for kind, shares in flow.items()
+            }
+            for party_id, flow in flows.items()
+        },
+        'cycles': [list(cycle) for cycle in cycles],
+        'ownership': sorted(
+            table.values(),
+            key=lambda row: (row['structure_id'], row['node'], -row['after'], row['owner_type'], row['owner_id']),
+        ),
+    }
@@ -1,42 +1,57 @@
+from asgiref.sync import async_to_sync
 from django.test import TestCase
 from django.core.exceptions import ValidationError
 from django.contrib.auth.models import User
-from corporate.models import Structure, UBO, StructureOwnership
-from corporate_relationship.models import Client, Service
-from sales.models import PersonalizedProduct
+from django.core import signing
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from corporate.models import (
+    CalendarFeedKey, Entity, EntityOwnership, JurisdictionAlert, NodeOwnership, Structure, StructureNode,
+    Successor, UBO, StructureOwnership
+)
+from corporate.compliance import partner_calendar, structure_calendar
+from corporate.ics import FEED_SALT, feed_token
+from corporate.succession import post_succession_ownership, ubo_succession
+from corporate_relationship.models import RelationshipStructure, Service, ServiceActivity
+from parties.models import BeneficiaryRelation, Party, Passport
+from sales.models import Partner, PersonalizedProduct
 from djmoney.money import Money
+from unittest import mock
+from decimal import Decimal
 
 
 class StructureModelTest(TestCase):
     def setUp(self):
-        self.structure_data = {
-            'nome': 'Test LLC',
-            'tipo': 'LLC_DISREGARDED',
+        self.entity_data = {
+            'name': 'Test LLC',
+            'entity_type': 'LLC_DISREGARDED',
             'tax_classification': 'LLC_DISREGARDED_ENTITY',
-            'descricao': 'Test structure for unit testing',
-            'jurisdicao': 'US',
-            'estado_us': 'DE',
-            'custo_base': 1000.00,
-            'custo_manutencao': 500.00,
+            'jurisdiction': 'US',
+            'us_state': 'DE',
         }
 
     def test_structure_creation(self):
-        structure = Structure.objects.create(**self.structure_data)
-        self.assertEqual(structure.nome, 'Test LLC')
-        self.assertEqual(structure.tipo, 'LLC_DISREGARDED')
-        self.assertEqual(structure.get_custo_total_primeiro_ano(), 1500.00)
+        entity = Entity.objects.create(**self.entity_data)
+        self.assertEqual(entity.name, 'Test LLC')
+        self.assertEqual(entity.entity_type, 'LLC_DISREGARDED')
+        structure = Structure.objects.create(name='Test Structure', description='Test')
+        StructureNode.objects.create(structure=structure, entity_template=entity, custom_name='Top')
+        self.assertEqual(structure.status, 'DRAFTING')
+        self.assertEqual(list(structure.nodes.values_list('entity_template', flat=True)), [entity.pk])
 
     def test_jurisdiction_validation(self):
         # Test that BR state cannot be set for US jurisdiction
         with self.assertRaises(ValidationError):
-            structure = Structure(**self.structure_data)
-            structure.estado_br = 'SP'
-            structure.full_clean()
+            entity = Entity(**self.entity_data)
+            entity.br_state = 'SP'
+            entity.full_clean()
 
 
 class ClientModelTest(TestCase):
     def test_client_creation(self):
-        client = Client.objects.create(
+        # Client foi substituído por sales.Partner
+        client = Partner.objects.create(
+            party=Party.objects.create(name='Test Client Inc.', person_type='JURIDICAL_PERSON'),
             company_name='Test Client Inc.',
             address='123 Test Street, Test City, TC 12345',
         )
@@ -50,10 +65,6 @@ class ServiceModelTest(TestCase):
             email='test@example.com',
             password='testpass123'
         )
-        self.client_obj = Client.objects.create(
-            company_name='Test Client Inc.',
-            address='123 Test Street, Test City, TC 12345',
-        )
 
     def test_service_creation_with_money(self):
         service = Service.objects.create(
@@ -71,13 +82,10 @@ class ServiceModelTest(TestCase):
 
 class PersonalizedProductTest(TestCase):
     def setUp(self):
-        self.structure = Structure.objects.create(
-            nome='Test Structure',
-            tipo='CORP',
-            descricao='Test',
-            jurisdicao='US',
-            custo_base=1000.00,
-            custo_manutencao=500.00,
+        self.structure = Entity.objects.create(
+            name='Test Structure',
+            entity_type='CORP',
+            jurisdiction='US',
         )
 
     def test_personalized_product_approval(self):
@@ -97,13 +105,10 @@ class PersonalizedProductTest(TestCase):
 
 class JurisdictionAlertTest(TestCase):
     def setUp(self):
-        self.structure = Structure.objects.create(
-            nome='Test Structure for Alert',
-            tipo='CORP',
-            descricao='Test structure for alert testing',
-            jurisdicao='US',
-            custo_base=1000.00,
-            custo_manutencao=500.00,
+        self.structure = Entity.objects.create(
+            name='Test Structure for Alert',
+            entity_type='CORP',
+            jurisdiction='US',
         )
 
     def test_single_deadline_alert_creation(self):
@@ -160,3 +165,520 @@ class JurisdictionAlertTest(TestCase):
                 deadline_type='RECURRING',
             )
             alert.full_clean()
+
+
+class JurisdictionAlertDeadlineTest(TestCase):
+    def setUp(self):
+        from datetime import date
+        self.today = date(2026, 1, 31)
+        defaults = {'descricao': 'Test', 'jurisdicao': 'US', 'tipo_alerta': 'FILING'}
+        self.single = JurisdictionAlert.objects.create(
+            titulo='Single', deadline_type='SINGLE', single_deadline=date(2026, 1, 20),
+            **defaults
+        )
+        self.monthly = JurisdictionAlert.objects.create(
+            titulo='Monthly', deadline_type='RECURRING', recurrence_pattern='MONTHLY',
+            last_completed=date(2026, 1, 31), **defaults
+        )
+        self.custom = JurisdictionAlert.objects.create(
+            titulo='Custom', deadline_type='RECURRING', recurrence_pattern='CUSTOM',
+            custom_recurrence_config={'days': 10}, **defaults
+        )
+        self.pending = JurisdictionAlert.objects.create(
+            titulo='Pending', deadline_type='RECURRING', recurrence_pattern='ANNUAL',
+            next_deadline=date(2026, 2, 15), advance_notice_days=30, **defaults
+        )
+        self.no_deadline = JurisdictionAlert.objects.create(
+            titulo='Manual', deadline_type='RECURRING', recurrence_pattern='ANNUAL',
+            auto_calculate_next=False, **defaults
+        )
+
+    def test_refresh_next_deadlines_in_one_pass(self):
+        from datetime import date
+        with self.assertNumQueries(2):  # select, bulk update
+            updated = JurisdictionAlert.objects.refresh_next_deadlines(self.today)
+        self.assertEqual(updated, 3)
+
+        deadlines = dict(JurisdictionAlert.objects.values_list('titulo', 'next_deadline'))
+        self.assertEqual(deadlines, {
+            'Single': date(2026, 1, 20),
+            'Monthly': date(2026, 2, 28),  # month end clamps
+            'Custom': date(2026, 2, 10),
+            'Pending': date(2026, 2, 15),  # never completed: kept
+            'Manual': None,
+        })
+        self.assertEqual(JurisdictionAlert.objects.refresh_next_deadlines(self.today), 0)
+
+    def test_deadline_status_annotation_matches_helpers(self):
+        from datetime import date
+        JurisdictionAlert.objects.refresh_next_deadlines(self.today)
+        JurisdictionAlert.objects.filter(pk=self.monthly.pk).update(next_deadline=date(2026, 6, 1))
+
+        with mock.patch('django.utils.timezone.localdate', return_value=self.today):
+            alerts = list(
+                JurisdictionAlert.objects.with_deadline_status(self.today).order_by('deadline_rank', 'titulo')
+            )
+            statuses = [(alert.titulo, alert.deadline_status) for alert in alerts]
+            for alert in alerts:
+                plain = JurisdictionAlert.objects.get(pk=alert.pk)
+                self.assertEqual(plain.get_status_display(), alert.get_status_display())
+                self.assertEqual(plain.is_overdue(), alert.is_overdue())
+
+        self.assertEqual(statuses, [
+            ('Single', 'OVERDUE'),
+            ('Custom', 'DUE_SOON'),
+            ('Pending', 'DUE_SOON'),
+            ('Monthly', 'SCHEDULED'),
+            ('Manual', 'NO_DEADLINE'),
+        ])
+        self.assertEqual(
+            list(JurisdictionAlert.objects.with_status('DUE_SOON', self.today).values_list('titulo', flat=True).order_by('titulo')),
+            ['Custom', 'Pending'],
+        )
+
+
+class ComplianceCalendarTest(TestCase):
+    def setUp(self):
+        from datetime import date
+        cache.clear()
+        self.start, self.end = date(2026, 1, 1), date(2026, 6, 30)
+        self.llc = Entity.objects.create(name='Wyoming LLC')
+        self.trust = Entity.objects.create(name='Bahamas Trust')
+        defaults = {'descricao': 'Test', 'tipo_alerta': 'FILING'}
+
+        self.report = JurisdictionAlert.objects.create(
+            titulo='Annual report', jurisdicao='WY', deadline_type='SINGLE',
+            single_deadline=date(2026, 3, 1), prioridade=4, **defaults
+        )
+        self.report.estruturas_aplicaveis.add(self.llc)
+        self.tax = JurisdictionAlert.objects.create(
+            titulo='Quarterly tax', jurisdicao='US', deadline_type='RECURRING',
+            recurrence_pattern='QUARTERLY', next_deadline=date(2026, 4, 15),
+            last_completed=date(2026, 1, 15), **defaults
+        )
+        self.tax.estruturas_aplicaveis.add(self.llc, self.trust)
+        inactive = JurisdictionAlert.objects.create(
+            titulo='Old rule', jurisdicao='BS', deadline_type='SINGLE',
+            single_deadline=date(2026, 2, 1), ativo=False, **defaults
+        )
+        inactive.estruturas_aplicaveis.add(self.trust)
+
+        self.holding = Structure.objects.create(name='Holding', description='Test')
+        top = StructureNode.objects.create(
+            structure=self.holding, entity_template=self.trust, custom_name='Trust',
+        )
+        for n in range(2):
+            StructureNode.objects.create(
+                structure=self.holding, entity_template=self.llc,
+                custom_name=f'LLC {n}', level=2, parent_node=top,
+            )
+        self.second = Structure.objects.create(name='Second', description='Test')
+        StructureNode.objects.create(
+            structure=self.second, entity_template=self.llc, custom_name='Solo LLC',
+        )
+
+        party = Party.objects.create(name='Acme Holdings', person_type='JURIDICAL_PERSON')
+        self.partner = Partner.objects.create(party=party, company_name='Acme', address='Main St')
+        for structure in (self.holding, self.second):
+            RelationshipStructure.objects.create(structure=structure, client=self.partner)
+
+    def test_structure_calendar_expands_and_merges(self):
+        from datetime import date
+        with self.assertNumQueries(3):  # nodes, entities, alerts prefetch
+            calendar = structure_calendar(self.holding.pk, self.start, self.end)
+
+        self.assertEqual(
+            [(entry['date'], entry['title'], entry['completed']) for entry in calendar],
+            [
+                (date(2026, 1, 15), 'Quarterly tax', True),
+                (date(2026, 3, 1), 'Annual report', False),
+                (date(2026, 4, 15), 'Quarterly tax', False),
+            ],
+        )
+        self.assertEqual(
+            [node['name'] for node in calendar[0]['nodes']], ['Trust', 'LLC 0', 'LLC 1']
+        )
+        self.assertEqual(calendar[1]['structures'], [self.holding.pk])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(structure_calendar(self.holding.pk, self.start, self.end), calendar)
+
+    def test_partner_calendar_deduplicates_across_structures(self):
+        calendar = partner_calendar(self.partner.pk, self.start, self.end)
+        self.assertEqual(len(calendar), 3)
+        self.assertEqual(calendar[1]['structures'], [self.holding.pk, self.second.pk])
+        self.assertEqual(
+            [node['name'] for node in calendar[1]['nodes']], ['LLC 0', 'LLC 1', 'Solo LLC']
+        )
+
+    def test_cache_follows_nodes_and_alerts(self):
+        from datetime import date
+        structure_calendar(self.second.pk, self.start, self.end)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.report.estruturas_aplicaveis.remove(self.llc)
+        self.assertEqual(
+            [entry['title'] for entry in structure_calendar(self.second.pk, self.start, self.end)],
+            ['Quarterly tax', 'Quarterly tax'],
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            StructureNode.objects.create(
+                structure=self.second, entity_template=self.trust, custom_name='Trust',
+            )
+        calendar = structure_calendar(self.second.pk, self.start, self.end)
+        self.assertEqual(len(calendar[0]['nodes']), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            # update() skips signals; the bulk refresh invalidates on its own
+            JurisdictionAlert.objects.filter(pk=self.tax.pk).update(last_completed=date(2026, 2, 1))
+            JurisdictionAlert.objects.refresh_next_deadlines(date(2026, 2, 1))
+        calendar = structure_calendar(self.second.pk, self.start, self.end)
+        self.assertEqual(
+            [entry['date'] for entry in calendar], [date(2026, 2, 1), date(2026, 5, 1)]
+        )
+
+    def test_calendar_api(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'a@example.com', 'pw'))
+        response = self.client.get(
+            f'/corporate/api/structures/{self.holding.pk}/compliance-calendar/'
+            '?start=2026-01-01&end=2026-06-30'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['deadlines'][0]['date'], '2026-01-15')
+
+        response = self.client.get(
+            f'/relationship/api/partners/{self.partner.pk}/compliance-calendar/'
+            '?start=2026-01-01&end=2026-06-30'
+        )
+        self.assertEqual(len(response.json()['deadlines']), 3)
+
+        response = self.client.get(
+            f'/corporate/api/structures/{self.holding.pk}/compliance-calendar/?start=2026-06-30&end=2026-01-01'
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/corporate/api/structures/0/compliance-calendar/')
+        self.assertEqual(response.status_code, 404)
+
+
+class CalendarFeedTest(TestCase):
+    def setUp(self):
+        from datetime import date
+        cache.clear()
+        self.executor = User.objects.create_user('executor', is_staff=True)
+        self.tokens = {}
+        llc = Entity.objects.create(name='Wyoming LLC')
+        self.structure = Structure.objects.create(name='Holding', description='Test')
+        node = StructureNode.objects.create(
+            structure=self.structure, entity_template=llc, custom_name='LLC',
+        )
+        party = Party.objects.create(name='Jane Roe', person_type='NATURAL_PERSON')
+        NodeOwnership.objects.create(
+            structure=self.structure, owner_party=party, owned_node=node, ownership_percentage=100,
+        )
+        Passport.objects.create(
+            party=party, number='X123', issued_at=date(2020, 1, 1),
+            expires_at=date(2030, 1, 1), issuing_country='BR',
+        )
+
+        partner_party = Party.objects.create(name='Acme Holdings', person_type='JURIDICAL_PERSON')
+        partner = Partner.objects.create(party=partner_party, company_name='Acme', address='Main St')
+        service = Service.objects.create(
+            name='Annual filing', service_price=100, regulator_fee=10, executor=self.executor,
+            counterparty_name='Registry',
+            relationship_structure=RelationshipStructure.objects.create(
+                structure=self.structure, client=partner,
+            ),
+        )
+        self.activity = ServiceActivity.objects.create(
+            service=service, activity_title='Collect signatures', start_date=date(2026, 1, 1),
+            due_date=date(2026, 2, 1),
+        )
+        ServiceActivity.objects.create(
+            service=service, activity_title='Done', start_date=date(2026, 1, 1),
+            due_date=date(2026, 1, 15), status='COMPLETED',
+        )
+        alert = JurisdictionAlert.objects.create(
+            titulo='Annual report; Wyoming', descricao='File online, pay fee', jurisdicao='WY',
+            tipo_alerta='FILING', single_deadline=date(2026, 3, 1), next_deadline=date(2026, 3, 1),
+            service_connection=service,
+        )
+        alert.estruturas_aplicaveis.add(llc)
+
+    def _get(self, scope, pk, **headers):
+        return self.client.get(f'/corporate/calendar/{self._token(scope, pk)}.ics', **headers)
+
+    def _token(self, scope, pk):
+        # Issued once per feed so the key lookup stays out of the request counts
+        key = (scope, pk)
+        if key not in self.tokens:
+            self.tokens[key] = feed_token(scope, pk, self.executor)
+        return self.tokens[key]
+
+    def _body(self, response):
+        async def read():
+            return b''.join([chunk async for chunk in response.streaming_content])
+        return async_to_sync(read)().decode()
+
+    def test_structure_feed(self):
+        response = self._get('structure', self.structure.pk)
+        self.assertEqual(response.status_code, 200)
+        # Streamed chunk by chunk under ASGI, not read into memory first
+        self.assertTrue(response.is_async)
+        body = self._body(response)
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertEqual(body.count('BEGIN:VEVENT'), 3)
+        self.assertIn('SUMMARY:[WY] Annual report\\; Wyoming\r\n', body)
+        self.assertIn('DTSTART;VALUE=DATE:20260201\r\n', body)
+        self.assertIn('SUMMARY:Passport expires: Jane Roe (BR)\r\n', body)
+        self.assertNotIn('Done', body)
+
+        with self.assertNumQueries(5):  # feed key, structure, stamps of the three sources
+            response = self._get(
+                'structure', self.structure.pk, HTTP_IF_NONE_MATCH=response['ETag'],
+            )
+        self.assertEqual(response.status_code, 304)
+
+    def test_only_changed_events_are_rebuilt(self):
+        first = self._get('structure', self.structure.pk)
+        self._body(first)
+
+        self.activity.activity_title = 'Collect all signatures'
+        self.activity.save()
+        with self.assertNumQueries(6):  # + the changed activity
+            response = self._get(
+                'structure', self.structure.pk, HTTP_IF_NONE_MATCH=first['ETag'],
+            )
+            body = self._body(response)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertIn('Annual filing: Collect all signatures', body)
+        self.assertEqual(body.count('BEGIN:VEVENT'), 3)
+
+    def test_user_feed_and_tokens(self):
+        response = self._get('user', self.executor.pk)
+        self.assertEqual(self._body(response).count('BEGIN:VEVENT'), 3)
+        response = self.client.get('/corporate/calendar/structure-1:forged.ics')
+        self.assertEqual(response.status_code, 404)
+
+        admin = User.objects.create_superuser('admin', 'a@example.com', 'pw')
+        self.client.force_login(admin)
+        response = self.client.get(f'/corporate/api/calendar-feeds/?structure={self.structure.pk}')
+        self.assertIn(feed_token('structure', self.structure.pk, admin), response.json()['structure'])
+        response = self.client.get('/corporate/api/calendar-feeds/?structure=0')
+        self.assertEqual(response.status_code, 404)
+
+    def test_tokens_are_revocable(self):
+        old = f'/corporate/calendar/{feed_token("structure", self.structure.pk, self.executor)}.ics'
+        self.assertEqual(self.client.get(old).status_code, 200)
+
+        # Rotating the key revokes every URL issued before
+        self.client.force_login(self.executor)
+        response = self.client.post('/corporate/api/calendar-feeds/')
+        self.assertEqual(self.client.get(old).status_code, 404)
+        self.assertEqual(self.client.get(response.json()['user']).status_code, 200)
+
+        # So does the user losing staff access
+        self.executor.is_staff = False
+        self.executor.save()
+        self.assertEqual(self.client.get(response.json()['user']).status_code, 404)
+
+        # A user token only serves its own user's feed
+        other = User.objects.create_user('other', is_staff=True)
+        forged = signing.Signer(salt=FEED_SALT).sign(
+            f'user-{self.executor.pk}-{other.pk}-{CalendarFeedKey.for_user(other).key}'
+        )
+        self.assertEqual(self.client.get(f'/corporate/calendar/{forged}.ics').status_code, 404)
+
+
+class AllocationConstraintTest(TestCase):
+    def setUp(self):
+        self.structure = Structure.objects.create(name='Holding', description='Test')
+        entity = Entity.objects.create(name='Wyoming LLC')
+        self.parent, self.child = [
+            StructureNode.objects.create(
+                structure=self.structure, entity_template=entity, custom_name=name,
+            )
+            for name in ('Parent', 'Child')
+        ]
+        self.party = Party.objects.create(name='Jane Roe', person_type='NATURAL_PERSON')
+
+    def test_node_ownership_total_is_checked_under_lock(self):
+        NodeOwnership.objects.create(
+            structure=self.structure, owner_party=self.party, owned_node=self.child,
+            ownership_percentage=60,
+        )
+        with self.assertNumQueries(5):  # savepoint, lock, sum, insert, release
+            NodeOwnership.objects.create(
+                structure=self.structure, owner_node=self.parent, owned_node=self.child,
+                ownership_percentage=40,
+            )
+
+        extra = NodeOwnership(
+            structure=self.structure, owner_node=self.parent, owned_node=self.parent,
+            ownership_percentage=10,
+        )
+        with self.assertRaises(ValidationError):
+            extra.full_clean()  # self-ownership
+        extra.owned_node = self.child
+        with self.assertRaisesMessage(ValidationError, 'available: 0%'):
+            extra.save()
+        self.assertEqual(NodeOwnership.objects.count(), 2)
+
+    def test_owner_exclusivity_and_ranges_are_enforced_by_the_database(self):
+        invalid = [
+            {'owner_party': self.party, 'owner_node': self.parent, 'ownership_percentage': 10},
+            {'ownership_percentage': 10},
+            {'owner_party': self.party, 'ownership_percentage': 0},
+        ]
+        for fields in invalid:
+            with self.subTest(fields=fields):
+                ownership = NodeOwnership(structure=self.structure, owned_node=self.child, **fields)
+                with self.assertRaises(ValidationError):
+                    ownership.full_clean()
+                with self.assertRaises(IntegrityError), transaction.atomic():
+                    NodeOwnership.objects.bulk_create([ownership])
+
+    def test_entity_ownership_total_per_structure(self):
+        entity = Entity.objects.create(name='Bahamas Trust')
+        EntityOwnership.objects.create(
+            structure=self.structure, owner_ubo=self.party, owned_entity=entity,
+            ownership_percentage=70, corporate_name='Trust A',
+        )
+        with self.assertRaises(ValidationError):
+            EntityOwnership.objects.create(
+                structure=self.structure, owner_entity=Entity.objects.create(name='Holdco'),
+                owned_entity=entity, ownership_percentage=40, corporate_name='Trust A',
+            )
+        other = Structure.objects.create(name='Other', description='Test')
+        EntityOwnership.objects.create(
+            structure=other, owner_ubo=self.party, owned_entity=entity,
+            ownership_percentage=40, corporate_name='Trust A',
+        )
+
+    def test_successor_percentages(self):
+        owner, first, second = [UBO.objects.create(nome=name) for name in ('Owner', 'First', 'Second')]
+        Successor.objects.create(ubo_proprietario=owner, ubo_sucessor=first, percentual=60)
+        with self.assertRaisesMessage(ValidationError, 'Disponível: 40'):
+            Successor.objects.create(ubo_proprietario=owner, ubo_sucessor=second, percentual=50)
+
+        Successor.objects.create(
+            ubo_proprietario=owner, ubo_sucessor=second, percentual=50, ativo=False,
+        )
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Successor.objects.create(ubo_proprietario=owner, ubo_sucessor=owner, percentual=10)
+
+
+class SuccessionResolverTest(TestCase):
+    def setUp(self):
+        self.structure = Structure.objects.create(name='Family Holding', description='Test')
+        entity = Entity.objects.create(name='Wyoming LLC')
+        self.holdco, self.opco = [
+            StructureNode.objects.create(
+                structure=self.structure, entity_template=entity, custom_name=name,
+            )
+            for name in ('Holdco', 'Opco')
+        ]
+        self.parties = {
+            name: Party.objects.create(name=name, person_type='NATURAL_PERSON')
+            for name in ('Grandfather', 'Father', 'Widow', 'Son', 'Daughter', 'Partner')
+        }
+        for owner, percentage in (('Grandfather', 80), ('Partner', 20)):
+            NodeOwnership.objects.create(
+                structure=self.structure, owner_party=self.parties[owner],
+                owned_node=self.holdco, ownership_percentage=percentage,
+            )
+        NodeOwnership.objects.create(
+            structure=self.structure, owner_node=self.holdco, owned_node=self.opco,
+            ownership_percentage=100,
+        )
+        # 20% of the grandfather's estate is not allocated
+        for giver, heir, percentage in (
+            ('Grandfather', 'Father', 50), ('Grandfather', 'Widow', 30),
+            ('Father', 'Son', 50), ('Father', 'Daughter', 50),
+        ):
+            self.benefit(giver, heir, percentage)
+
+    def benefit(self, giver, heir, percentage):
+        BeneficiaryRelation.objects.create(
+            giver_party=self.parties[giver], beneficiary=self.parties[heir], percentage=percentage,
+        )
+
+    def test_shares_flow_through_generations(self):
+        grandfather, father = self.parties['Grandfather'].pk, self.parties['Father'].pk
+        with self.assertNumQueries(3):  # graph, ownerships, names
+            result = post_succession_ownership([grandfather, father])
+
+        self.assertEqual(result['cycles'], [])
+        self.assertEqual(result['flows'][grandfather], {
+            'heirs': {
+                self.parties['Widow'].pk: Decimal('30.0000'),
+                self.parties['Son'].pk: Decimal('25.0000'),
+                self.parties['Daughter'].pk: Decimal('25.0000'),
+            },
+            'estates': {grandfather: Decimal('20.0000')},
+        })
+        holdco = {
+            (row['owner_type'], row['owner']): (row['before'], row['after'])
+            for row in result['ownership'] if row['node_id'] == self.holdco.pk
+        }
+        self.assertEqual(holdco, {
+            ('party', 'Grandfather'): (80, 0),
+            ('party', 'Partner'): (20, 20),
+            ('party', 'Widow'): (0, 24),
+            ('party', 'Son'): (0, 20),
+            ('party', 'Daughter'): (0, 20),
+            ('estate', 'Grandfather'): (0, 16),
+        })
+        opco = [row for row in result['ownership'] if row['node_id'] == self.opco.pk]
+        self.assertEqual(
+            [(row['owner_type'], row['owner'], row['after']) for row in opco],
+            [('node', 'Holdco', 100)],
+        )
+
+    def test_only_deceased_heirs_pass_shares_on(self):
+        result = post_succession_ownership([self.parties['Grandfather'].pk])
+        self.assertEqual(result['flows'][self.parties['Grandfather'].pk]['heirs'], {
+            self.parties['Father'].pk: Decimal('50.0000'),
+            self.parties['Widow'].pk: Decimal('30.0000'),
+        })
+
+    def test_cycles_stay_with_the_estate(self):
+        self.benefit('Son', 'Father', 100)
+        self.benefit('Widow', 'Son', 100)
+        ids = [self.parties[name].pk for name in ('Father', 'Son', 'Widow')]
+        result = post_succession_ownership(ids)
+
+        father, son, widow = ids
+        self.assertEqual(result['cycles'], [[father, son]])
+        self.assertEqual(result['flows'][father], {
+            'heirs': {self.parties['Daughter'].pk: Decimal('50.0000')},
+            'estates': {father: Decimal('50.0000')},
+        })
+        self.assertEqual(result['flows'][widow]['estates'], {son: Decimal('50.0000')})
+        self.assertEqual(result['ownership'], [])  # none of them owns nodes
+
+    def test_ubo_successor_chains(self):
+        owner, heir, grandchild = [UBO.objects.create(nome=name) for name in ('Owner', 'Heir', 'Grandchild')]
+        Successor.objects.create(ubo_proprietario=owner, ubo_sucessor=heir, percentual=100)
+        Successor.objects.create(ubo_proprietario=heir, ubo_sucessor=grandchild, percentual=40)
+
+        flows, cycles = ubo_succession([owner.pk, heir.pk])
+        self.assertEqual(flows[owner.pk]['heirs'], {grandchild.pk: Decimal('0.4')})
+        self.assertEqual(flows[owner.pk]['estates'], {heir.pk: Decimal('0.6')})
+
+    def test_succession_api(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'a@example.com', 'pw'))
+        grandfather = self.parties['Grandfather'].pk
+        response = self.client.get('/corporate/api/succession/', {'parties': f'{grandfather}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['deceased'], [{'id': grandfather, 'name': 'Grandfather'}])
+        self.assertEqual(len(response.json()['ownership']), 6)
+
+        self.assertEqual(self.client.get('/corporate/api/succession/').status_code, 400)
+        self.assertEqual(
+            self.client.get('/corporate/api/succession/', {'parties': 'x'}).status_code, 400
+        )
+        self.assertEqual(
+            self.client.get('/corporate/api/succession/', {'parties': '0'}).status_code, 404
+        )
@@ -11,6 +11,14 @@ urlpatterns = [
     path('structures/', views.StructureVisualizationView.as_view(), name='structure_list'),
     path('structures/<int:structure_id>/', views.StructureVisualizationView.as_view(), name='structure_detail'),
     path('api/structures/<int:structure_id>/json/', views.structure_json_api, name='structure_json_api'),
+    path('api/structures/<int:structure_id>/quote/', views.structure_quote_api, name='structure_quote_api'),
+    path(
+        'api/structures/<int:structure_id>/compliance-calendar/',
+        views.structure_compliance_calendar_api, name='structure_compliance_calendar_api'
+    ),
+    path('api/succession/', views.succession_api, name='succession_api'),
+    path('api/calendar-feeds/', views.calendar_feed_urls_api, name='calendar_feed_urls_api'),
+    path('calendar/<str:token>.ics', views.calendar_feed, name='calendar_feed'),
     
     # TODO: Implement these views
     # path('structure-builder/', views.StructureBuilderView.as_view(), name='structure_builder'),
@@ -1,18 +1,29 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.conf import settings
+from django.core import signing
+from django.http import Http404, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.core.exceptions import ValidationError
 from django.db import transaction
 from django.urls import reverse
+from django.utils.http import parse_etags, quote_etag
 from django.utils.decorators import method_decorator
 from django.views.generic import TemplateView
 from django.contrib.auth.mixins import UserPassesTestMixin
 import json
-
-from .models import Structure, Entity, EntityOwnership, ValidationRule, StructureNode, NodeOwnership
+from datetime import date
+
+from .compliance import calendar_window, structure_calendar
+from .ics import feed_etag, feed_stamps, feed_token, read_feed_token, stream_feed
+from .models import (
+    CalendarFeedKey, Structure, Entity, EntityOwnership, ValidationRule, StructureNode, NodeOwnership,
+)
+from .succession import post_succession_ownership
+from financial_department.fx import Converter, ExchangeRateMissing
+from financial_department.quotes import cached_structure_quote, quote_structure
 from parties.models import Party
 
 
@@ -36,9 +47,8 @@ class StructureWizardView(AdminRequiredMixin, TemplateView):
         if structure_id:
             structure = get_object_or_404(Structure, pk=structure_id)
         
-        # Get all available entities and parties
+        # Get all available entities
         entities = Entity.objects.filter(active=True).order_by('name')
-        parties = Party.objects.all().order_by('name')
         
         # Get existing ownerships if editing
         ownerships = []
@@ -46,12 +56,29 @@ class StructureWizardView(AdminRequiredMixin, TemplateView):
             ownerships = list(structure.entity_ownerships.select_related(
                 'owner_ubo', 'owner_entity', 'owned_entity'
             ).all())
+
+        # Parties are searched on demand (parties:party_search); only those
+        # already in the structure go into the page
+        parties = [
+            {'id': party.pk, 'name': party.name, 'nationality': party.nationality}
+            for party in {o.owner_ubo_id: o.owner_ubo for o in ownerships if o.owner_ubo_id}.values()
+        ]
         
         context.update({
             'structure': structure,
             'entities': entities,
-            'parties': parties,
-            'ownerships': ownerships,
+            # Page data for structure_wizard.js, rendered with json_script
+            'wizard_entities': [
+                {
+                    'id': entity.pk,
+                    'name': entity.name,
+                    'entity_type': entity.entity_type,
+                    'jurisdiction': entity.jurisdiction,
+                }
+                for entity in entities
+            ],
+            'wizard_parties': parties,
+            'wizard_ownerships': [_wizard_ownership(o) for o in ownerships],
             'is_editing': bool(structure_id),
             'wizard_steps': [
                 {'id': 1, 'name': 'Basic Info', 'icon': '📋'},
@@ -65,6 +92,29 @@ class StructureWizardView(AdminRequiredMixin, TemplateView):
         return context
 
 
+def _number(value):
+    return float(value) if value is not None else None
+
+
+def _wizard_ownership(ownership):
+    """EntityOwnership in the shape structure_wizard.js keeps its ownerships"""
+    return {
+        'id': ownership.pk,
+        'owned_entity_id': ownership.owned_entity_id,
+        'owned_entity_name': ownership.owned_entity.name,
+        'owner_ubo_id': ownership.owner_ubo_id,
+        'owner_ubo_name': ownership.owner_ubo.name if ownership.owner_ubo_id else None,
+        'owner_entity_id': ownership.owner_entity_id,
+        'owner_entity_name': ownership.owner_entity.name if ownership.owner_entity_id else None,
+        'percentage': _number(ownership.ownership_percentage),
+        'shares': ownership.owned_shares,
+        'corporate_name': ownership.corporate_name,
+        'hash_number': ownership.hash_number,
+        'share_value_usd': _number(ownership.share_value_usd),
+        'share_value_eur': _number(ownership.share_value_eur),
+    }
+
+
 @staff_member_required
 @require_http_methods(["POST"])
 def save_structure_step(request):
@@ -245,6 +295,7 @@ def validate_and_preview(request, data, structure_id):
             'success': True,
             'validation': validation_results,
             'preview': preview_data,
+            'quote': cached_structure_quote(structure.pk),
             'can_save': len(validation_results['errors']) == 0
         })
         
@@ -709,3 +760,143 @@ def structure_json_api(request, structure_id):
         'data': structure_data
     })
 
+
+@staff_member_required
+def structure_quote_api(request, structure_id):
+    """
+    JSON API endpoint for the structure price quote (per node and total),
+    optionally converted (?currency=) and as of a past date (?on=)
+    """
+    currency = request.GET.get('currency')
+    if currency and currency not in settings.CURRENCIES:
+        return JsonResponse({'error': 'Invalid currency'}, status=400)
+    try:
+        on = date.fromisoformat(request.GET['on']) if request.GET.get('on') else None
+    except ValueError:
+        return JsonResponse({'error': 'Invalid date'}, status=400)
+
+    # Historical quotes (?on=YYYY-MM-DD) come from the price history, uncached
+    quote = quote_structure(structure_id, on) if on else cached_structure_quote(structure_id)
+    if quote is None:
+        return JsonResponse({'error': 'Structure not found'}, status=404)
+
+    if currency:
+        converter = Converter(currency)
+        try:
+            converted = {
+                field: converter.total({
+                    code: totals[field] for code, totals in quote['totals'].items()
+                }, on=on)
+                for field in ('base_cost', 'total_cost')
+            }
+        except ExchangeRateMissing as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        quote = {**quote, 'converted': {'currency': currency, **converted}}
+    return JsonResponse(quote)
+
+
+@staff_member_required
+def structure_compliance_calendar_api(request, structure_id):
+    """
+    JSON API endpoint for the compliance deadlines of a structure's nodes
+    between ?start= and ?end= (YYYY-MM-DD, default: the next year)
+    """
+    try:
+        start, end = calendar_window(request.GET.get('start'), request.GET.get('end'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    structure = get_object_or_404(Structure.objects.only('pk', 'name'), pk=structure_id)
+
+    return JsonResponse({
+        'structure': {'id': structure.pk, 'name': structure.name},
+        'start': start,
+        'end': end,
+        'deadlines': structure_calendar(structure.pk, start, end),
+    })
+
+
+@require_http_methods(["GET", "HEAD"])
+def calendar_feed(request, token):
+    """
+    .ics feed of a user or a structure, addressed by a signed token instead of
+    a login so calendar clients can subscribe (see corporate/ics.py)
+    """
+    try:
+        scope, pk, user = read_feed_token(token)
+    except signing.BadSignature:
+        raise Http404
+    if scope == 'user':
+        name = user.get_username()
+    else:
+        name = get_object_or_404(Structure.objects.only('name'), pk=pk).name
+    name = f'SIRIUS - {name}'
+
+    stamps = feed_stamps(scope, pk)
+    etag = quote_etag(feed_etag(name, stamps))
+    if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+    if etag in if_none_match or '*' in if_none_match:
+        response = HttpResponseNotModified()
+    else:
+        response = StreamingHttpResponse(
+            stream_feed(name, stamps), content_type='text/calendar; charset=utf-8'
+        )
+        response['Content-Disposition'] = f'inline; filename="{scope}-{pk}.ics"'
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@staff_member_required
+@require_http_methods(["GET", "POST"])
+def calendar_feed_urls_api(request):
+    """
+    Subscription URLs of the current user's .ics feed and, with
+    ?structure=<id>, of a structure's feed. POST rotates the user's feed key
+    first, revoking every URL issued before.
+    """
+    if request.method == 'POST':
+        CalendarFeedKey.for_user(request.user).rotate()
+
+    def feed_url(scope, pk):
+        return request.build_absolute_uri(
+            reverse('corporate:calendar_feed', args=[feed_token(scope, pk, request.user)])
+        )
+
+    urls = {'user': feed_url('user', request.user.pk)}
+    structure_id = request.GET.get('structure')
+    if structure_id:
+        if not structure_id.isdigit() or not Structure.objects.filter(pk=structure_id).exists():
+            return JsonResponse({'error': 'Structure not found'}, status=404)
+        urls['structure'] = feed_url('structure', int(structure_id))
+    return JsonResponse(urls)
+
+
+@staff_member_required
+def succession_api(request):
+    """
+    What-if succession: who ends up with what if ?parties=<id,id> pass away,
+    and the node ownership of their structures (or ?structures=<id,id>)
+    afterwards (see corporate/succession.py)
+    """
+    def ids(name):
+        values = [value for value in request.GET.get(name, '').split(',') if value]
+        if not all(value.isdigit() for value in values):
+            raise ValueError(f'{name} must be a comma-separated list of ids')
+        return {int(value) for value in values}
+
+    try:
+        party_ids = ids('parties')
+        structure_ids = ids('structures') or None
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if not party_ids:
+        return JsonResponse({'error': 'parties is required'}, status=400)
+    deceased = dict(Party.objects.filter(pk__in=party_ids).values_list('pk', 'name'))
+    if len(deceased) != len(party_ids):
+        return JsonResponse({'error': 'Party not found'}, status=404)
+
+    result = post_succession_ownership(party_ids, structure_ids)
+    return JsonResponse({
+        'deceased': [{'id': pk, 'name': name} for pk, name in sorted(deceased.items())],
+        **result,
+    })
@@ -1,7 +1,13 @@
+from collections import Counter
+
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.utils import timezone
+from django.utils.functional import cached_property
 from .models import (
     File, RelationshipStructure, 
-    Service, ServiceActivity, WebhookLog
+    Service, ServiceActivity, WebhookLog, WebhookLogCounter
 )
 
 
@@ -10,6 +16,7 @@ class FileAdmin(admin.ModelAdmin):
     list_display = ['structure', 'approved_by', 'approval_date', 'created_at']
     list_filter = ['approval_date', 'created_at']
     search_fields = ['structure__name', 'approved_by__name', 'file_number']
+    autocomplete_fields = ['approved_by']
     readonly_fields = ['created_at', 'file_number']
 
     fieldsets = [
@@ -89,24 +96,69 @@ class ServiceAdmin(admin.ModelAdmin):
     total_cost_display.short_description = 'Total Cost'
 
 
+class DueStatusFilter(admin.SimpleListFilter):
+    title = 'due'
+    parameter_name = 'due'
+
+    def lookups(self, request, model_admin):
+        return [
+            ('overdue', 'Overdue'),
+            ('week', 'Due within 7 days'),
+            ('month', 'Due within 30 days'),
+        ]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'overdue':
+            return queryset.overdue()
+        if self.value() == 'week':
+            return queryset.due_within(7)
+        if self.value() == 'month':
+            return queryset.due_within(30)
+        return queryset
+
+
 @admin.register(ServiceActivity)
 class ServiceActivityAdmin(admin.ModelAdmin):
-    list_display = ['service', 'activity_title', 'status', 'start_date', 'due_date']
-    list_filter = ['status', 'service']
+    list_display = [
+        'service', 'activity_title', 'status', 'start_date', 'due_date',
+        'days_until_due_display'
+    ]
+    list_filter = [DueStatusFilter, 'status', 'service']
     search_fields = ['activity_title', 'service__name']
     list_select_related = ['service']
     ordering = ['service', 'start_date']
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_days_until_due()
+
+    @admin.display(description='Days until due', ordering='days_until_due')
+    def days_until_due_display(self, obj):
+        return obj.days_until_due
+
+
+class WebhookLogPaginator(Paginator):
+    """Uses WebhookLogCounter for the unfiltered changelist instead of COUNT(*)"""
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            return sum(WebhookLogCounter.totals().values())
+        return super().count
+
 
 @admin.register(WebhookLog)
 class WebhookLogAdmin(admin.ModelAdmin):
+    paginator = WebhookLogPaginator
+    show_full_result_count = False
+    change_list_template = 'admin/corporate_relationship/webhooklog/change_list.html'
     list_display = [
         'event_type', 
         'status', 
         'response_status_code',
         'attempt_count',
         'created_at',
-        'last_attempt_at'
+        'last_attempt_at',
+        'next_attempt_at'
     ]
     list_filter = [
         'status', 
@@ -118,16 +170,20 @@ class WebhookLogAdmin(admin.ModelAdmin):
     readonly_fields = [
         'created_at', 
         'last_attempt_at', 
+        'next_attempt_at',
         'response_status_code',
-        'response_body'
+        'response_body',
+        'payload_hash',
+        'compacted_at'
     ]
+    actions = ['retry_webhooks']
 
     fieldsets = [
         ('Event Information', {
             'fields': ['event_type', 'payload', 'url']
         }),
         ('Status', {
-            'fields': ['status', 'attempt_count']
+            'fields': ['status', 'attempt_count', 'next_attempt_at']
         }),
         ('Response', {
             'fields': [
@@ -141,9 +197,50 @@ class WebhookLogAdmin(admin.ModelAdmin):
             'fields': ['created_at', 'last_attempt_at'],
             'classes': ['collapse']
         }),
+        ('Retention', {
+            'fields': ['payload_hash', 'compacted_at'],
+            'classes': ['collapse']
+        }),
     ]
 
     def has_add_permission(self, request):
         # WebhookLog é apenas para leitura - criado automaticamente
         return False
 
+    def changelist_view(self, request, extra_context=None):
+        extra_context = extra_context or {}
+        extra_context['status_counts'] = WebhookLogCounter.totals()
+        return super().changelist_view(request, extra_context=extra_context)
+
+    # Mantém WebhookLogCounter em dia com edições e exclusões pelo admin
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            if change and 'status' in form.changed_data:
+                WebhookLogCounter.adjust({form.initial['status']: -1, obj.status: 1})
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            super().delete_model(request, obj)
+            WebhookLogCounter.adjust({obj.status: -1})
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            statuses = Counter(queryset.values_list('status', flat=True))
+            super().delete_queryset(request, queryset)
+            WebhookLogCounter.adjust({
+                status: -count for status, count in statuses.items()
+            })
+
+    @admin.action(description="Retry selected webhooks now")
+    def retry_webhooks(self, request, queryset):
+        # Devolve ao outbox; o run_webhook_worker faz a nova entrega
+        retry = queryset.exclude(status='SUCCESS')
+        with transaction.atomic():
+            failed = retry.filter(status='FAILED').count()
+            updated = retry.update(
+                status='PENDING', attempt_count=0, next_attempt_at=timezone.now()
+            )
+            WebhookLogCounter.adjust({'FAILED': -failed, 'PENDING': failed})
+        self.message_user(request, f"{updated} webhook(s) queued for retry.")
+
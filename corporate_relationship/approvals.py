@@ -0,0 +1,133 @@
+"""
+PersonalizedProduct approval
+
+Shared rules for what approving a product produces (partner, relationship
+structures, webhook payload) and a bulk path that applies them to many
+products with set-based queries. Single saves go through the post_save signal
+in signals.py; bulk approval updates the rows directly and does the partner
+and webhook work for the whole set in a fixed number of queries.
+"""
+
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from parties.models import Party
+from sales.models import Partner, PersonalizedProduct
+from .webhooks import enqueue_many
+
+logger = logging.getLogger(__name__)
+
+APPROVAL_EVENT = 'personalized_product_approved'
+
+
+def partner_name_for_product(product):
+    """
+    Nome do Party/Partner associado ao produto.
+
+    FIXME: confirmar regra de negócio para identificar/criar partner
+    """
+    # Em um cenário real, isso viria de UBO ou campos específicos
+    if hasattr(product, 'ubos') and product.ubos.exists():
+        first_ubo = product.ubos.first()
+        if first_ubo and first_ubo.nome:
+            return f"Company of {first_ubo.nome}"
+    return f"Partner for Product {product.id}"
+
+
+def product_structures(product):
+    """
+    Structures do produto que recebem RelationshipStructure.
+
+    FIXME: confirmar como obter structures do PersonalizedProduct. Hoje não há
+    vínculo com Structure (base_structure aponta para um Entity, que é só um
+    template), então nenhum produto gera RelationshipStructure.
+    """
+    return []
+
+
+def approval_payload(product, structures_ids, partner):
+    return {
+        "event": APPROVAL_EVENT,
+        "product_id": product.id,
+        "structures": structures_ids,
+        "partner_id": partner.id,
+        "approved_at": timezone.now().isoformat(),
+    }
+
+
+def _partners_by_name(names):
+    """Get or create one Partner per Party name with set-based queries"""
+    parties = {}
+    for party in Party.objects.filter(name__in=names).order_by('pk'):
+        parties.setdefault(party.name, party)
+
+    missing = names - parties.keys()
+    if missing:
+        Party.objects.bulk_create([
+            Party(name=name, person_type='LEGAL_ENTITY') for name in sorted(missing)
+        ])
+        # Re-read so ids are available on every backend
+        for party in Party.objects.filter(name__in=missing).order_by('pk'):
+            parties.setdefault(party.name, party)
+
+    party_ids = [party.pk for party in parties.values()]
+    partners = {
+        partner.party_id: partner
+        for partner in Partner.objects.filter(party_id__in=party_ids)
+    }
+    missing_parties = [pk for pk in party_ids if pk not in partners]
+    if missing_parties:
+        Partner.objects.bulk_create(
+            [Partner(party_id=pk) for pk in missing_parties], ignore_conflicts=True
+        )
+        partners.update(
+            (partner.party_id, partner)
+            for partner in Partner.objects.filter(party_id__in=missing_parties)
+        )
+        logger.info(f"Created {len(missing_parties)} partners for bulk approval")
+
+    return {name: partners[party.pk] for name, party in parties.items()}
+
+
+def bulk_approve_products(products):
+    """
+    Approve many PersonalizedProducts at once.
+
+    ``products`` may be instances or ids; products already APPROVED are
+    skipped. Partners are resolved for the whole set, statuses change with one
+    UPDATE and the webhooks are queued together, all in one transaction.
+    Returns the ids of the approved products.
+
+    No RelationshipStructures are created: a PersonalizedProduct has no link
+    to a Structure (base_structure is an Entity template, see
+    product_structures), so the webhooks carry an empty ``structures`` list.
+    """
+    ids = [getattr(product, 'pk', product) for product in products]
+
+    with transaction.atomic():
+        products = list(
+            PersonalizedProduct.objects.select_for_update(of=('self',))
+            .filter(pk__in=ids)
+            .exclude(status='APPROVED')
+        )
+        if not products:
+            return []
+
+        names = {product.pk: partner_name_for_product(product) for product in products}
+        partners = _partners_by_name(set(names.values()))
+
+        # update() skips the post_save signal, which would redo this per product
+        approved_ids = [product.pk for product in products]
+        PersonalizedProduct.objects.filter(pk__in=approved_ids).update(
+            status='APPROVED', updated_at=timezone.now()
+        )
+
+        enqueue_many(APPROVAL_EVENT, [
+            approval_payload(product, [], partners[names[product.pk]])
+            for product in products
+        ])
+
+    logger.info(f"Bulk approved {len(approved_ids)} PersonalizedProducts")
+    return approved_ids
@@ -0,0 +1,97 @@
+"""
+ServiceActivity due-date digests
+
+The scan_service_activities command aggregates open activities that are
+overdue or due within the window per executor and per service, using one
+aggregate query each, and caches the result for the staff dashboard panel.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from .models import ServiceActivity
+
+DIGEST_CACHE_KEY = 'corporate_relationship:activity_digest'
+
+
+def _counts(today):
+    return {
+        'overdue': Count('pk', filter=Q(due_date__lt=today)),
+        'due_soon': Count('pk', filter=Q(due_date__gte=today)),
+        'next_due': Min('due_date'),
+    }
+
+
+def build_digest(days=None, today=None):
+    """Overdue and due-soon counts in total, per executor and per service"""
+    days = settings.SERVICE_ACTIVITY_DUE_SOON_DAYS if days is None else days
+    today = today or timezone.localdate()
+    activities = ServiceActivity.objects.open().filter(
+        due_date__lte=today + timedelta(days=days)
+    )
+
+    by_executor = (
+        activities.values(
+            'service__executor', 'service__executor__username',
+            'service__executor__email',
+        )
+        .annotate(**_counts(today))
+        .order_by('-overdue', 'next_due')
+    )
+    by_service = (
+        activities.values('service', 'service__name', 'service__executor__username')
+        .annotate(**_counts(today))
+        .order_by('-overdue', 'next_due')
+    )
+
+    by_executor = [
+        {
+            'executor_id': row['service__executor'],
+            'executor': row['service__executor__username'],
+            'email': row['service__executor__email'],
+            'overdue': row['overdue'],
+            'due_soon': row['due_soon'],
+            'next_due': row['next_due'],
+        }
+        for row in by_executor
+    ]
+    by_service = [
+        {
+            'service_id': row['service'],
+            'service': row['service__name'],
+            'executor': row['service__executor__username'],
+            'overdue': row['overdue'],
+            'due_soon': row['due_soon'],
+            'next_due': row['next_due'],
+        }
+        for row in by_service
+    ]
+
+    return {
+        'generated_at': timezone.now(),
+        'today': today,
+        'window_days': days,
+        'totals': {
+            'overdue': sum(row['overdue'] for row in by_executor),
+            'due_soon': sum(row['due_soon'] for row in by_executor),
+        },
+        'by_executor': by_executor,
+        'by_service': by_service,
+    }
+
+
+def store_digest(digest):
+    cache.set(DIGEST_CACHE_KEY, digest, settings.SERVICE_ACTIVITY_DIGEST_TTL)
+
+
+def get_digest():
+    """Last scanned digest, computing one if the scan has not run yet"""
+    digest = cache.get(DIGEST_CACHE_KEY)
+    if digest is None or digest['today'] != timezone.localdate():
+        digest = build_digest()
+        store_digest(digest)
+    return digest
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from corporate_relationship.approvals import bulk_approve_products
+from sales.models import PersonalizedProduct
+
+
+class Command(BaseCommand):
+    help = 'Approve PersonalizedProducts in bulk (partners, relationship structures and webhooks)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', type=int, help='PersonalizedProduct ids')
+        parser.add_argument(
+            '--status',
+            choices=[choice for choice, _ in PersonalizedProduct.STATUS_CHOICES if choice != 'APPROVED'],
+            help='Approve every active product currently in this status',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Products approved per transaction',
+        )
+
+    def handle(self, *args, **options):
+        ids = list(options['ids'])
+        if options['status']:
+            ids += PersonalizedProduct.objects.filter(
+                status=options['status'], ativo=True
+            ).values_list('pk', flat=True)
+        if not ids:
+            raise CommandError('Pass product ids or --status')
+
+        approved = 0
+        chunk_size = options['chunk_size']
+        for start in range(0, len(ids), chunk_size):
+            approved += len(bulk_approve_products(ids[start:start + chunk_size]))
+
+        self.stdout.write(self.style.SUCCESS(f"Approved {approved} personalized products"))
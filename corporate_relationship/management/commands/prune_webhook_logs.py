@@ -0,0 +1,87 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from corporate_relationship.models import WebhookLog, WebhookLogCounter
+from corporate_relationship.retention import FINISHED_STATUSES, compact_logs, purge_logs
+
+
+class Command(BaseCommand):
+    help = 'Compact, archive and delete old WebhookLog entries in small chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--compact-after-days',
+            type=int,
+            default=settings.WEBHOOK_LOG_COMPACT_DAYS,
+            help='Drop payload/response of successful logs older than this',
+        )
+        parser.add_argument(
+            '--delete-after-days',
+            type=int,
+            default=settings.WEBHOOK_LOG_RETENTION_DAYS,
+            help='Delete finished logs older than this',
+        )
+        parser.add_argument(
+            '--archive-dir',
+            default=settings.WEBHOOK_LOG_ARCHIVE_DIR,
+            help='Append deleted logs to a .jsonl.gz file in this directory',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Rows per transaction',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0,
+            help='Seconds to sleep between chunks',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many logs would be compacted/deleted',
+        )
+        parser.add_argument(
+            '--rebuild-counters',
+            action='store_true',
+            help='Recount WebhookLogCounter from the table before pruning',
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        compact_cutoff = now - timedelta(days=options['compact_after_days'])
+        delete_cutoff = now - timedelta(days=options['delete_after_days'])
+
+        if options['rebuild_counters']:
+            totals = WebhookLogCounter.rebuild()
+            self.stdout.write(f"Counters rebuilt: {totals}")
+
+        if options['dry_run']:
+            to_compact = WebhookLog.objects.filter(
+                status='SUCCESS', created_at__lt=compact_cutoff, compacted_at__isnull=True
+            ).count()
+            to_delete = WebhookLog.objects.filter(
+                status__in=FINISHED_STATUSES, created_at__lt=delete_cutoff
+            ).count()
+            self.stdout.write(
+                f"Would compact {to_compact} and delete {to_delete} webhook logs"
+            )
+            return
+
+        compacted = compact_logs(compact_cutoff, options['chunk_size'], options['pause'])
+        self.stdout.write(f"Compacted {compacted} webhook logs")
+
+        deleted, path = purge_logs(
+            delete_cutoff,
+            options['chunk_size'],
+            archive_dir=options['archive_dir'] or None,
+            pause=options['pause'],
+        )
+        if path:
+            self.stdout.write(f"Archived to {path}")
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} webhook logs"))
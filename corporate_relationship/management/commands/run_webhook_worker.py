@@ -0,0 +1,66 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from corporate_relationship.webhooks import WebhookClient, process_batch
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued webhooks (WebhookLog outbox) with retries and backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process due webhooks and exit instead of polling',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.WEBHOOK_BATCH_SIZE,
+            help='Webhooks claimed per batch',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.WEBHOOK_WORKER_CONCURRENCY,
+            help='Concurrent requests (and pooled connections per destination)',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=5.0,
+            help='Seconds to sleep when there is nothing to deliver',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Webhook worker started")
+        totals = {'SUCCESS': 0, 'PENDING': 0, 'FAILED': 0}
+
+        # One client for the worker's lifetime keeps connections alive and
+        # circuit breaker state across batches
+        with WebhookClient(concurrency=options['concurrency']) as client:
+            try:
+                while True:
+                    counts = process_batch(options['batch_size'], client)
+                    for status, count in counts.items():
+                        totals[status] += count
+
+                    processed = sum(counts.values())
+                    if processed:
+                        self.stdout.write(
+                            f"Delivered {counts['SUCCESS']}, retrying {counts['PENDING']}, "
+                            f"failed {counts['FAILED']}"
+                        )
+                    elif options['once']:
+                        break
+                    else:
+                        time.sleep(options['poll_interval'])
+            except KeyboardInterrupt:
+                self.stdout.write("Webhook worker interrupted")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Webhook worker finished: {totals['SUCCESS']} delivered, "
+            f"{totals['PENDING']} rescheduled, {totals['FAILED']} failed"
+        ))
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from corporate_relationship.digests import build_digest, store_digest
+
+
+class Command(BaseCommand):
+    help = 'Scan overdue and due-soon service activities and refresh the dashboard digest'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.SERVICE_ACTIVITY_DUE_SOON_DAYS,
+            help='Window for activities due soon',
+        )
+
+    def handle(self, *args, **options):
+        digest = build_digest(options['days'])
+        store_digest(digest)
+
+        totals = digest['totals']
+        self.stdout.write(
+            f"{totals['overdue']} overdue and {totals['due_soon']} due within "
+            f"{digest['window_days']} days"
+        )
+
+        self.stdout.write("\nPer executor:")
+        for row in digest['by_executor']:
+            self.stdout.write(
+                f"   - {row['executor']}: {row['overdue']} overdue, "
+                f"{row['due_soon']} due soon (next {row['next_due']})"
+            )
+
+        self.stdout.write("\nPer service:")
+        for row in digest['by_service']:
+            self.stdout.write(
+                f"   - {row['service']} ({row['executor']}): {row['overdue']} overdue, "
+                f"{row['due_soon']} due soon"
+            )
+
+        self.stdout.write(self.style.SUCCESS("Service activity digest updated"))
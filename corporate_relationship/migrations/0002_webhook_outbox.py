@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('corporate_relationship', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhooklog',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, help_text='Quando o worker deve tentar (novamente) a entrega', null=True),
+        ),
+        migrations.AlterField(
+            model_name='webhooklog',
+            name='attempt_count',
+            field=models.PositiveIntegerField(default=0, help_text='Número de tentativas realizadas'),
+        ),
+        migrations.AlterField(
+            model_name='webhooklog',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, help_text='Data em que o evento foi enfileirado'),
+        ),
+        migrations.AlterField(
+            model_name='webhooklog',
+            name='last_attempt_at',
+            field=models.DateTimeField(blank=True, help_text='Data da última tentativa', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='webhooklog',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='corporate_r_status_7b301c_idx'),
+        ),
+    ]
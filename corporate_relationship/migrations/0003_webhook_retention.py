@@ -0,0 +1,72 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:05
+
+from django.db import migrations, models
+
+
+def populate_counters(apps, schema_editor):
+    WebhookLog = apps.get_model('corporate_relationship', 'WebhookLog')
+    WebhookLogCounter = apps.get_model('corporate_relationship', 'WebhookLogCounter')
+    counts = dict(
+        WebhookLog.objects.values_list('status')
+        .annotate(total=models.Count('pk'))
+        .order_by()
+    )
+    WebhookLogCounter.objects.bulk_create([
+        WebhookLogCounter(
+            status=status, shard=shard,
+            count=counts.get(status, 0) if shard == 0 else 0,
+        )
+        for status in ('SUCCESS', 'FAILED', 'PENDING')
+        for shard in range(8)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('corporate_relationship', '0002_webhook_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookLogCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('SUCCESS', 'Success'), ('FAILED', 'Failed'), ('PENDING', 'Pending')], max_length=10)),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Webhook Log Counter',
+                'verbose_name_plural': 'Webhook Log Counters',
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='webhooklog',
+            name='corporate_r_status_45909b_idx',
+        ),
+        migrations.AddField(
+            model_name='webhooklog',
+            name='compacted_at',
+            field=models.DateTimeField(blank=True, help_text='Data em que payload e resposta foram descartados', null=True),
+        ),
+        migrations.AddField(
+            model_name='webhooklog',
+            name='payload_hash',
+            field=models.CharField(blank=True, help_text='SHA-256 do payload, mantido após a compactação', max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='webhooklog',
+            name='payload',
+            field=models.JSONField(blank=True, help_text='Payload enviado no webhook (removido na compactação)', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='webhooklog',
+            index=models.Index(fields=['status', 'created_at'], name='corporate_r_status_e5214b_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='webhooklogcounter',
+            unique_together={('status', 'shard')},
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
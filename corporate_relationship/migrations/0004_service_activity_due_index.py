@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('corporate_relationship', '0003_webhook_retention'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='serviceactivity',
+            index=models.Index(fields=['status', 'due_date'], name='corporate_r_status_1d658a_idx'),
+        ),
+    ]
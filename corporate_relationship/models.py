@@ -1,6 +1,13 @@
+import random
+from datetime import timedelta
+
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from djmoney.models.fields import MoneyField
+
+from corporate.functions import DaysUntil
+from corporate.mixins import ChangeTrackingMixin
 import uuid
 
 
@@ -102,13 +109,16 @@ class RelationshipStructure(models.Model):
         return f"{self.structure.name} - {self.client.company_name}"
 
 
-class Service(models.Model):
+class Service(ChangeTrackingMixin, models.Model):
     """
     Serviço que pode ser executado para um cliente.
     Migrado de corporate.Service com suporte multi-moeda.
     Updated to work with new structure
     """
 
+    # Mudança de estrutura invalida o portfolio dos dois partners
+    tracked_fields = ("relationship_structure",)
+
     name = models.CharField(max_length=120, help_text="Nome do serviço")
     description = models.TextField(
         blank=True, help_text="Descrição detalhada do serviço"
@@ -174,6 +184,30 @@ class Service(models.Model):
         return self.service_price + self.regulator_fee
 
 
+class ServiceActivityQuerySet(models.QuerySet):
+    """Filtros de prazo calculados no banco"""
+
+    CLOSED_STATUSES = ("COMPLETED", "CANCELLED")
+
+    def open(self):
+        return self.exclude(status__in=self.CLOSED_STATUSES)
+
+    def overdue(self, today=None):
+        today = today or timezone.localdate()
+        return self.open().filter(due_date__lt=today)
+
+    def due_within(self, days, today=None):
+        """Abertas com vencimento entre hoje e hoje + ``days``"""
+        today = today or timezone.localdate()
+        return self.open().filter(
+            due_date__gte=today, due_date__lte=today + timedelta(days=days)
+        )
+
+    def with_days_until_due(self, today=None):
+        today = today or timezone.localdate()
+        return self.annotate(days_until_due=DaysUntil("due_date", today))
+
+
 class ServiceActivity(models.Model):
     """
     Atividade específica dentro de um serviço.
@@ -239,6 +273,8 @@ class ServiceActivity(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ServiceActivityQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Service Activity"
         verbose_name_plural = "Service Activities"
@@ -248,6 +284,7 @@ class ServiceActivity(models.Model):
             models.Index(fields=["status"]),
             models.Index(fields=["due_date"]),
             models.Index(fields=["priority"]),
+            models.Index(fields=["status", "due_date"]),
         ]
 
     def __str__(self):
@@ -255,23 +292,30 @@ class ServiceActivity(models.Model):
 
     def is_overdue(self):
         """Check if activity is overdue"""
-        if not self.due_date or self.status == "COMPLETED":
+        if self.due_date is None or self.status in ServiceActivityQuerySet.CLOSED_STATUSES:
             return False
-        from django.utils import timezone
-        return timezone.now().date() > self.due_date
+        return self.days_until_due < 0
 
+    @property
     def days_until_due(self):
-        """Calculate days until due date"""
+        """Days until due date (annotated by with_days_until_due() when available)"""
+        if "_days_until_due" in self.__dict__:
+            return self._days_until_due
         if not self.due_date:
             return None
-        from django.utils import timezone
-        delta = self.due_date - timezone.now().date()
-        return delta.days
+        return (self.due_date - timezone.localdate()).days
+
+    @days_until_due.setter
+    def days_until_due(self, value):
+        # Recebe a anotação de with_days_until_due()
+        self._days_until_due = value
 
 
 class WebhookLog(models.Model):
     """
     Log de tentativas de webhook para auditoria e retentativas.
+    Funciona como outbox transacional: o evento é gravado como PENDING na
+    mesma transação que o originou e entregue pelo run_webhook_worker.
     """
 
     STATUS_CHOICES = [
@@ -284,7 +328,16 @@ class WebhookLog(models.Model):
         max_length=50,
         help_text="Tipo do evento (ex: personalized_product_approved)",
     )
-    payload = models.JSONField(help_text="Payload enviado no webhook")
+    payload = models.JSONField(
+        null=True,
+        blank=True,
+        help_text="Payload enviado no webhook (removido na compactação)",
+    )
+    payload_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        help_text="SHA-256 do payload, mantido após a compactação",
+    )
     url = models.URLField(help_text="URL de destino do webhook")
     status = models.CharField(
         max_length=10,
@@ -302,15 +355,23 @@ class WebhookLog(models.Model):
         blank=True, help_text="Mensagem de erro se houver falha"
     )
     attempt_count = models.PositiveIntegerField(
-        default=1, help_text="Número de tentativas realizadas"
+        default=0, help_text="Número de tentativas realizadas"
+    )
+    next_attempt_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Quando o worker deve tentar (novamente) a entrega",
     )
 
     # Metadata
     created_at = models.DateTimeField(
-        auto_now_add=True, help_text="Data da primeira tentativa"
+        auto_now_add=True, help_text="Data em que o evento foi enfileirado"
     )
     last_attempt_at = models.DateTimeField(
-        auto_now=True, help_text="Data da última tentativa"
+        null=True, blank=True, help_text="Data da última tentativa"
+    )
+    compacted_at = models.DateTimeField(
+        null=True, blank=True, help_text="Data em que payload e resposta foram descartados"
     )
 
     class Meta:
@@ -319,10 +380,75 @@ class WebhookLog(models.Model):
         ordering = ["-created_at"]
         indexes = [
             models.Index(fields=["event_type"]),
-            models.Index(fields=["status"]),
             models.Index(fields=["created_at"]),
+            # Retenção filtra por status + idade; também cobre filtros por status
+            models.Index(fields=["status", "created_at"]),
+            models.Index(fields=["status", "next_attempt_at"]),
         ]
 
     def __str__(self):
         return f"{self.event_type} - {self.status} ({self.attempt_count} attempts)"
 
+
+class WebhookLogCounter(models.Model):
+    """
+    Contadores de WebhookLog por status, para o admin não precisar de
+    COUNT(*) na tabela inteira.
+
+    Cada status é dividido em SHARDS linhas e cada ajuste escolhe uma ao
+    acaso, evitando que todas as transações disputem a mesma linha.
+    """
+
+    SHARDS = 8
+
+    status = models.CharField(max_length=10, choices=WebhookLog.STATUS_CHOICES)
+    shard = models.PositiveSmallIntegerField()
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Webhook Log Counter"
+        verbose_name_plural = "Webhook Log Counters"
+        unique_together = ["status", "shard"]
+
+    def __str__(self):
+        return f"{self.status}[{self.shard}] = {self.count}"
+
+    @classmethod
+    def adjust(cls, deltas):
+        """Apply {status: delta} changes"""
+        shard = random.randrange(cls.SHARDS)
+        for status, delta in deltas.items():
+            if not delta:
+                continue
+            counter = cls.objects.filter(status=status, shard=shard)
+            if not counter.update(count=models.F("count") + delta):
+                cls.objects.get_or_create(status=status, shard=shard)
+                counter.update(count=models.F("count") + delta)
+
+    @classmethod
+    def totals(cls):
+        """Current {status: count}, including statuses with no rows"""
+        totals = {status: 0 for status, _ in WebhookLog.STATUS_CHOICES}
+        rows = cls.objects.values("status").annotate(total=models.Sum("count"))
+        for row in rows:
+            totals[row["status"]] = row["total"]
+        return totals
+
+    @classmethod
+    def rebuild(cls):
+        """Recount from WebhookLog (full scan; use after manual changes)"""
+        counts = dict(
+            WebhookLog.objects.values_list("status")
+            .annotate(total=models.Count("pk"))
+            .order_by()
+        )
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create([
+                cls(status=status, shard=shard,
+                    count=counts.get(status, 0) if shard == 0 else 0)
+                for status, _ in WebhookLog.STATUS_CHOICES
+                for shard in range(cls.SHARDS)
+            ])
+        return cls.totals()
+
@@ -0,0 +1,284 @@
+"""
+Relationship reports
+
+Aggregations over Services and ServiceActivities computed with grouped
+queries, so their cost depends on the number of executors and weeks rather
+than on the number of activities.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Prefetch, Q, Sum, Window
+from django.db.models.functions import RowNumber, TruncWeek
+from django.utils import timezone
+
+from dashboard.cache import get_or_compute
+from sales.models import Partner
+from .models import RelationshipStructure, Service, ServiceActivity
+
+UPCOMING_PER_EXECUTOR = 5
+
+
+def workload_cache_key(today, weeks):
+    return f'corporate_relationship:workload:{today.isoformat()}:{weeks}'
+
+
+def _status_counts(today):
+    return {
+        'planned': Count('pk', filter=Q(status='PLANNED')),
+        'in_progress': Count('pk', filter=Q(status='IN_PROGRESS')),
+        'overdue': Count('pk', filter=Q(due_date__lt=today)),
+    }
+
+
+def _money_by_executor(field, executor_ids):
+    """{executor_id: {currency: total}} for a Service MoneyField"""
+    totals = defaultdict(dict)
+    rows = (
+        Service.objects.filter(executor__in=executor_ids)
+        .values('executor', f'{field}_currency')
+        .annotate(total=Sum(field))
+        .order_by()
+    )
+    for row in rows:
+        totals[row['executor']][row[f'{field}_currency']] = row['total']
+    return totals
+
+
+def executor_workload(weeks=None, today=None):
+    """
+    Open activity load per executor and per week of due date.
+
+    Covers activities due up to ``weeks`` weeks ahead, overdue ones included,
+    plus per-currency service_price/regulator_fee totals and each executor's
+    next due activities. Four queries regardless of the number of activities.
+    """
+    weeks = settings.WORKLOAD_WEEKS if weeks is None else weeks
+    today = today or timezone.localdate()
+    horizon = today + timedelta(weeks=weeks)
+    activities = ServiceActivity.objects.open().filter(
+        due_date__isnull=False, due_date__lt=horizon
+    )
+
+    executors = {}
+
+    def executor_entry(executor_id, username=None):
+        if executor_id not in executors:
+            executors[executor_id] = {
+                'executor_id': executor_id,
+                'executor': username,
+                'totals': {'planned': 0, 'in_progress': 0, 'overdue': 0},
+                'weeks': [],
+                'service_price': {},
+                'regulator_fee': {},
+                'upcoming': [],
+            }
+        return executors[executor_id]
+
+    weekly = (
+        activities.annotate(week=TruncWeek('due_date'))
+        .values('service__executor', 'service__executor__username', 'week')
+        .annotate(**_status_counts(today))
+        .order_by('service__executor', 'week')
+    )
+    for row in weekly:
+        entry = executor_entry(row['service__executor'], row['service__executor__username'])
+        counts = {key: row[key] for key in ('planned', 'in_progress', 'overdue')}
+        entry['weeks'].append({'week': row['week'], **counts})
+        for key, value in counts.items():
+            entry['totals'][key] += value
+
+    upcoming = (
+        activities.filter(due_date__gte=today)
+        .annotate(rank=Window(
+            RowNumber(),
+            partition_by=[F('service__executor')],
+            order_by=[F('due_date').asc(), F('pk').asc()],
+        ))
+        .filter(rank__lte=UPCOMING_PER_EXECUTOR)
+        .values(
+            'pk', 'activity_title', 'status', 'due_date', 'service__name',
+            'service__executor',
+        )
+        .order_by('service__executor', 'due_date', 'pk')
+    )
+    for row in upcoming:
+        executor_entry(row['service__executor'])['upcoming'].append({
+            'activity_id': row['pk'],
+            'title': row['activity_title'],
+            'service': row['service__name'],
+            'status': row['status'],
+            'due_date': row['due_date'],
+        })
+
+    for field in ('service_price', 'regulator_fee'):
+        for executor_id, totals in _money_by_executor(field, list(executors)).items():
+            executors[executor_id][field] = totals
+
+    return {
+        'generated_at': timezone.now(),
+        'today': today,
+        'weeks': weeks,
+        'executors': sorted(
+            executors.values(), key=lambda entry: -entry['totals']['overdue']
+        ),
+    }
+
+
+def cached_executor_workload(weeks=None):
+    """executor_workload() cached for the current day"""
+    weeks = settings.WORKLOAD_WEEKS if weeks is None else weeks
+    today = timezone.localdate()
+    return get_or_compute(
+        workload_cache_key(today, weeks),
+        lambda: executor_workload(weeks, today),
+        ttl=settings.WORKLOAD_CACHE_TTL,
+        stale_ttl=0,
+    )
+
+
+def portfolio_cache_key(partner_id):
+    return f'corporate_relationship:portfolio:{partner_id}'
+
+
+def invalidate_portfolios(partner_ids):
+    cache.delete_many([portfolio_cache_key(pk) for pk in set(partner_ids) if pk])
+
+
+def _money(value):
+    return {'amount': value.amount, 'currency': str(value.currency)}
+
+
+def _add(totals, currency, amount):
+    totals[currency] = totals.get(currency, 0) + amount
+
+
+def _money_by_relationship(field, relationship_ids):
+    """{relationship_id: {currency: total}} for a Service MoneyField"""
+    totals = defaultdict(dict)
+    rows = (
+        Service.objects.filter(relationship_structure__in=relationship_ids)
+        .values('relationship_structure', f'{field}_currency')
+        .annotate(total=Sum(field))
+        .order_by()
+    )
+    for row in rows:
+        totals[row['relationship_structure']][row[f'{field}_currency']] = row['total']
+    return totals
+
+
+def partner_portfolio(partner_id, today=None):
+    """
+    Partner -> relationship structures -> structures, services and open
+    activities, with per-currency totals.
+
+    Six queries however large the portfolio: partner, relationships with
+    their structures, services, open activities and two grouped money sums.
+    Returns None when the partner does not exist.
+    """
+    today = today or timezone.localdate()
+    partner = Partner.objects.select_related('party').filter(pk=partner_id).first()
+    if partner is None:
+        return None
+
+    open_activities = (
+        ServiceActivity.objects.open()
+        .with_days_until_due(today)
+        .order_by('due_date', 'pk')
+    )
+    services = (
+        Service.objects.select_related('executor')
+        .prefetch_related(Prefetch('activities', queryset=open_activities, to_attr='open_activities'))
+        .order_by('name', 'pk')
+    )
+    relationships = list(
+        RelationshipStructure.objects.filter(client=partner)
+        .select_related('structure')
+        .prefetch_related(Prefetch('service_set', queryset=services, to_attr='services'))
+        .order_by('-created_at', 'pk')
+    )
+
+    relationship_ids = [relationship.pk for relationship in relationships]
+    prices = _money_by_relationship('service_price', relationship_ids)
+    fees = _money_by_relationship('regulator_fee', relationship_ids)
+
+    totals = {
+        'service_price': {},
+        'regulator_fee': {},
+        'structures': len(relationships),
+        'services': 0,
+        'open_activities': 0,
+    }
+    rollup = []
+    for relationship in relationships:
+        for currency, amount in prices[relationship.pk].items():
+            _add(totals['service_price'], currency, amount)
+        for currency, amount in fees[relationship.pk].items():
+            _add(totals['regulator_fee'], currency, amount)
+        totals['services'] += len(relationship.services)
+
+        activities = []
+        for service in relationship.services:
+            totals['open_activities'] += len(service.open_activities)
+            activities += [
+                {
+                    'id': activity.pk,
+                    'title': activity.activity_title,
+                    'service_id': service.pk,
+                    'status': activity.status,
+                    'priority': activity.priority,
+                    'due_date': activity.due_date,
+                    'days_until_due': activity.days_until_due,
+                }
+                for activity in service.open_activities
+            ]
+
+        rollup.append({
+            'id': relationship.pk,
+            'status': relationship.status,
+            'created_at': relationship.created_at,
+            'structure': {
+                'id': relationship.structure.pk,
+                'name': relationship.structure.name,
+                'status': relationship.structure.status,
+            },
+            'service_price': prices[relationship.pk],
+            'regulator_fee': fees[relationship.pk],
+            'services': [
+                {
+                    'id': service.pk,
+                    'name': service.name,
+                    'executor': service.executor.get_username(),
+                    'service_price': _money(service.service_price),
+                    'regulator_fee': _money(service.regulator_fee),
+                    'open_activities': len(service.open_activities),
+                }
+                for service in relationship.services
+            ],
+            'open_activities': activities,
+        })
+
+    return {
+        'generated_at': timezone.now(),
+        'partner': {
+            'id': partner.pk,
+            'company_name': partner.company_name,
+            'party': partner.party.name,
+            'partnership_status': partner.partnership_status,
+        },
+        'totals': totals,
+        'relationships': rollup,
+    }
+
+
+def cached_partner_portfolio(partner_id):
+    """partner_portfolio() cached until something in the portfolio changes"""
+    return get_or_compute(
+        portfolio_cache_key(partner_id),
+        lambda: partner_portfolio(partner_id),
+        ttl=settings.PORTFOLIO_CACHE_TTL,
+        stale_ttl=0,
+    )
@@ -0,0 +1,124 @@
+"""
+WebhookLog retention
+
+Old logs are handled in two steps, both in short chunked transactions so the
+table is never locked for long:
+
+- compaction: successful logs past WEBHOOK_LOG_COMPACT_DAYS lose their payload
+  and response body; a SHA-256 of the payload is kept for auditing.
+- purge: finished (SUCCESS/FAILED) logs past WEBHOOK_LOG_RETENTION_DAYS are
+  deleted, optionally after being appended to a gzip-compressed JSONL archive.
+
+PENDING logs are never touched. WebhookLogCounter is kept in step with every
+deleted chunk.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from .models import WebhookLog, WebhookLogCounter
+
+FINISHED_STATUSES = ('SUCCESS', 'FAILED')
+ARCHIVE_FIELDS = (
+    'id', 'event_type', 'payload', 'payload_hash', 'url', 'status',
+    'response_status_code', 'response_body', 'error_message', 'attempt_count',
+    'created_at', 'last_attempt_at', 'compacted_at',
+)
+
+
+def payload_hash(payload):
+    """SHA-256 of the canonical JSON encoding of ``payload``"""
+    encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'), cls=DjangoJSONEncoder)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def _chunks(queryset, chunk_size):
+    """Yield lists of pks, re-querying each time since rows leave the queryset"""
+    while True:
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return
+        yield ids
+
+
+def compact_logs(cutoff, chunk_size=1000, pause=0):
+    """Drop payload and response body of SUCCESS logs created before ``cutoff``"""
+    pending = WebhookLog.objects.filter(
+        status='SUCCESS', created_at__lt=cutoff, compacted_at__isnull=True
+    )
+    compacted = 0
+    for ids in _chunks(pending, chunk_size):
+        now = timezone.now()
+        with transaction.atomic():
+            logs = list(WebhookLog.objects.filter(pk__in=ids).only('pk', 'payload'))
+            for log in logs:
+                log.payload_hash = payload_hash(log.payload)
+                log.payload = None
+                log.response_body = ''
+                log.compacted_at = now
+            WebhookLog.objects.bulk_update(
+                logs, ['payload', 'payload_hash', 'response_body', 'compacted_at']
+            )
+        compacted += len(logs)
+        if pause:
+            time.sleep(pause)
+    return compacted
+
+
+def archive_path(archive_dir, now=None):
+    now = now or timezone.now()
+    return os.path.join(archive_dir, f"webhooklogs-{now:%Y%m%d-%H%M%S}.jsonl.gz")
+
+
+def purge_logs(cutoff, chunk_size=1000, archive_dir=None, pause=0):
+    """
+    Delete finished logs created before ``cutoff``.
+
+    With ``archive_dir`` each chunk is appended to one .jsonl.gz file for the
+    run before it is deleted. Returns (deleted count, archive path or None).
+    """
+    expired = WebhookLog.objects.filter(
+        status__in=FINISHED_STATUSES, created_at__lt=cutoff
+    )
+    path = None
+    archive = None
+    if archive_dir:
+        os.makedirs(archive_dir, exist_ok=True)
+        path = archive_path(archive_dir)
+        archive = gzip.open(path, 'at', encoding='utf-8')
+
+    deleted = 0
+    try:
+        for ids in _chunks(expired, chunk_size):
+            with transaction.atomic():
+                # Re-check under lock: a log retried meanwhile is PENDING again
+                rows = list(
+                    expired.filter(pk__in=ids).select_for_update()
+                    .values(*ARCHIVE_FIELDS)
+                )
+                if archive:
+                    for row in rows:
+                        archive.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+                    archive.flush()
+
+                WebhookLog.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+                statuses = Counter(row['status'] for row in rows)
+                WebhookLogCounter.adjust({
+                    status: -count for status, count in statuses.items()
+                })
+            deleted += len(rows)
+            if pause:
+                time.sleep(pause)
+    finally:
+        if archive:
+            archive.close()
+
+    return deleted, path
@@ -1,11 +1,16 @@
 import logging
-import requests
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from django.utils import timezone
-from django.conf import settings
+from corporate.models import Structure
+from parties.models import Party
 from sales.models import PersonalizedProduct
-from .models import RelationshipStructure, WebhookLog
+from .approvals import (
+    APPROVAL_EVENT, approval_payload, partner_name_for_product, product_structures
+)
+from .models import RelationshipStructure, Service, ServiceActivity
+from .reports import invalidate_portfolios
+from .webhooks import enqueue
 from sales.models import Partner  # Client foi migrado para Partner no sales
 
 logger = logging.getLogger(__name__)
@@ -18,81 +23,58 @@ def handle_personalized_product_approval(sender, instance, created, **kwargs):
     
     Ao mudar status para APPROVED:
     1. Cria RelationshipStructure para cada Structure
-    2. Dispara webhook
+    2. Enfileira o webhook (outbox, entregue pelo run_webhook_worker)
     3. Clona serviços padrão (TODO: implementar quando definidos)
     """
-    # Verifica se é uma mudança para status APPROVED
-    if not hasattr(instance, '_previous_status'):
-        # Na primeira criação, salvar o status atual para próximas comparações
-        instance._previous_status = instance.status
-        return
-    
-    previous_status = getattr(instance, '_previous_status', None)
-    current_status = instance.status
-    
-    # Só processa se mudou PARA APPROVED
-    if previous_status != 'APPROVED' and current_status == 'APPROVED':
+    # Só processa se mudou PARA APPROVED (status anterior vem do snapshot,
+    # sem SELECT extra antes do save)
+    if instance.status == 'APPROVED' and instance.has_changed('status'):
         logger.info(f"Processing approval for PersonalizedProduct {instance.id}")
         
         try:
-            # 1. Criar/recuperar RelationshipStructure para cada Structure
-            partner = _get_or_create_partner_for_product(instance)
-            structures_ids = []
+            # Savepoint próprio: um erro de banco aqui é desfeito sem deixar
+            # quebrada a transação do save do produto
+            with transaction.atomic():
+                # 1. Criar/recuperar RelationshipStructure para cada Structure
+                partner = _get_or_create_partner_for_product(instance)
+                structures_ids = []
             
-            # FIXME: confirmar como obter structures do PersonalizedProduct
-            # Assumindo que existe um relacionamento structures ou similar
-            if hasattr(instance, 'structures'):
-                structures = instance.structures.all()
-            elif hasattr(instance, 'base_structure') and instance.base_structure:
-                structures = [instance.base_structure]
-            else:
-                # Tentar através de base_product se existir
-                structures = []
-                if hasattr(instance, 'base_product') and instance.base_product:
-                    # Implementar lógica para obter structures do product
-                    pass
+                structures = product_structures(instance)
             
-            for structure in structures:
-                relationship, created = RelationshipStructure.objects.get_or_create(
-                    structure=structure,
-                    # client=partner,  # Comentado pois RelationshipStructure pode não ter campo client
-                    defaults={'status': 'ACTIVE'}
-                )
-                structures_ids.append(structure.id)
+                for structure in structures:
+                    try:
+                        # Savepoint: uma estrutura inválida não pode abortar a
+                        # transação do save nem impedir o webhook
+                        with transaction.atomic():
+                            relationship, created = RelationshipStructure.objects.get_or_create(
+                                structure=structure,
+                                client=partner,
+                                defaults={'status': 'ACTIVE'}
+                            )
+                    except Exception as e:
+                        logger.error(f"Error creating RelationshipStructure for {structure}: {str(e)}")
+                        continue
+                    structures_ids.append(structure.id)
                 
-                if created:
-                    logger.info(f"Created RelationshipStructure for {structure.nome} - {partner.party.name}")
+                    if created:
+                        logger.info(f"Created RelationshipStructure for {structure.name} - {partner.party.name}")
                 
-                # TODO: Clonar serviços padrão da estrutura
-                # _clone_default_services_for_structure(structure, relationship)
+                    # TODO: Clonar serviços padrão da estrutura
+                    # _clone_default_services_for_structure(structure, relationship)
             
-            # 2. Disparar webhook
-            _send_approval_webhook(instance, structures_ids, partner)
+                # 2. Enfileirar webhook na mesma transação do save
+                _send_approval_webhook(instance, structures_ids, partner)
             
         except Exception as e:
             logger.error(f"Error processing PersonalizedProduct approval: {str(e)}")
             # Continua a execução mesmo com erro para não quebrar o save
-    
-    # Atualizar status anterior para próxima comparação
-    instance._previous_status = current_status
 
 
 def _get_or_create_partner_for_product(product):
     """
     Obtém ou cria um Partner baseado no PersonalizedProduct.
-    
-    FIXME: confirmar regra de negócio para identificar/criar partner
     """
-    # Por enquanto, usar informações básicas do produto
-    # Em um cenário real, isso viria de UBO ou campos específicos
-    
-    partner_name = f"Partner for Product {product.id}"
-    
-    # Tentar extrair informações de UBOs se existirem
-    if hasattr(product, 'ubos') and product.ubos.exists():
-        first_ubo = product.ubos.first()
-        if first_ubo and first_ubo.nome:
-            partner_name = f"Company of {first_ubo.nome}"
+    partner_name = partner_name_for_product(product)
     
     # Criar Party primeiro (necessário para Partner)
     from parties.models import Party
@@ -114,55 +96,83 @@ def _get_or_create_partner_for_product(product):
 
 def _send_approval_webhook(product, structures_ids, partner):
     """
-    Envia webhook de aprovação de produto.
+    Enfileira o webhook de aprovação de produto.
+
+    Apenas grava o WebhookLog PENDING; a entrega (com retentativas) é feita
+    pelo comando run_webhook_worker depois do commit.
     """
-    payload = {
-        "event": "personalized_product_approved",
-        "product_id": product.id,
-        "structures": structures_ids,
-        "partner_id": partner.id,
-        "approved_at": timezone.now().isoformat(),
-    }
+    payload = approval_payload(product, structures_ids, partner)
     
-    webhook_url = getattr(settings, 'RELATIONSHIP_WEBHOOK_URL', None)
-    if not webhook_url:
-        logger.warning("RELATIONSHIP_WEBHOOK_URL not configured")
+    if enqueue(APPROVAL_EVENT, payload):
+        logger.info(f"Webhook queued for product {product.id}")
+
+
+def _invalidate_portfolios_on_commit(partner_ids):
+    """
+    ``partner_ids`` pode ser um queryset: só é avaliado depois do commit, para
+    que o save não pague a consulta dos partners afetados
+    """
+    if isinstance(partner_ids, (list, tuple)) and not any(partner_ids):
         return
-    
-    # Criar log de webhook
-    webhook_log = WebhookLog.objects.create(
-        event_type="personalized_product_approved",
-        payload=payload,
-        url=webhook_url,
-        status='PENDING'
-    )
-    
-    try:
-        timeout = getattr(settings, 'WEBHOOK_TIMEOUT', 10)
-        response = requests.post(
-            webhook_url, 
-            json=payload, 
-            timeout=timeout,
-            headers={'Content-Type': 'application/json'}
+    transaction.on_commit(lambda: invalidate_portfolios(partner_ids))
+
+
+def _partners_of_relationships(relationship_ids):
+    relationship_ids = [pk for pk in relationship_ids if pk]
+    if not relationship_ids:
+        return []
+    return RelationshipStructure.objects.filter(
+        pk__in=relationship_ids
+    ).values_list('client_id', flat=True)
+
+
+# Invalidação do cache de portfolio (reports.partner_portfolio)
+@receiver([post_save, post_delete], sender=Partner)
+def invalidate_partner_portfolio(sender, instance, **kwargs):
+    _invalidate_portfolios_on_commit([instance.pk])
+
+
+@receiver(post_save, sender=Party)
+def invalidate_party_portfolio(sender, instance, created, **kwargs):
+    if not created:
+        _invalidate_portfolios_on_commit(
+            Partner.objects.filter(party=instance).values_list('pk', flat=True)
         )
-        
-        # Atualizar log com resposta
-        webhook_log.status = 'SUCCESS' if response.status_code < 400 else 'FAILED'
-        webhook_log.response_status_code = response.status_code
-        webhook_log.response_body = response.text[:1000]  # Limitar tamanho
-        webhook_log.save()
-        
-        if response.status_code >= 400:
-            logger.warning(f"Webhook returned status {response.status_code}")
-        else:
-            logger.info(f"Webhook sent successfully for product {product.id}")
-            
-    except requests.exceptions.RequestException as e:
-        webhook_log.status = 'FAILED'
-        webhook_log.error_message = str(e)[:500]  # Limitar tamanho
-        webhook_log.save()
-        
-        logger.error(f"Failed to send webhook: {str(e)}")
+
+
+@receiver([post_save, post_delete], sender=RelationshipStructure)
+def invalidate_relationship_portfolio(sender, instance, **kwargs):
+    _invalidate_portfolios_on_commit([instance.client_id])
+
+
+@receiver(post_save, sender=Structure)
+def invalidate_structure_portfolios(sender, instance, created, update_fields=None, **kwargs):
+    # O portfolio só mostra nome e status; o save parcial dos campos calculados não conta
+    if update_fields is not None and not {'name', 'status'} & set(update_fields):
+        return
+    if not created:
+        _invalidate_portfolios_on_commit(
+            RelationshipStructure.objects.filter(
+                structure=instance
+            ).values_list('client_id', flat=True)
+        )
+
+
+@receiver([post_save, post_delete], sender=Service)
+def invalidate_service_portfolios(sender, instance, **kwargs):
+    relationship_ids = [instance.relationship_structure_id]
+    if instance.has_changed('relationship_structure'):
+        relationship_ids.append(instance.previous('relationship_structure'))
+    _invalidate_portfolios_on_commit(_partners_of_relationships(relationship_ids))
+
+
+@receiver([post_save, post_delete], sender=ServiceActivity)
+def invalidate_activity_portfolio(sender, instance, **kwargs):
+    _invalidate_portfolios_on_commit(
+        RelationshipStructure.objects.filter(
+            service__pk=instance.service_id
+        ).values_list('client_id', flat=True)
+    )
 
 
 # TODO: Implementar clonagem de serviços padrão
@@ -1,3 +1,570 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from djmoney.money import Money
+
+from corporate.models import Entity, Structure
+from financial_department.models import ExchangeRate
+from parties.models import Party
+from sales.models import Partner, PersonalizedProduct
+from . import approvals, signals, webhooks
+from .reports import executor_workload, partner_portfolio, portfolio_cache_key
+from .digests import DIGEST_CACHE_KEY, build_digest
+from .models import (
+    RelationshipStructure, Service, ServiceActivity, WebhookLog, WebhookLogCounter
+)
+from .retention import compact_logs, payload_hash, purge_logs
+from .webhooks import CircuitBreaker, WebhookClient
+
+
+class StubWebhookServer:
+    """Local HTTP receiver answering every POST with ``status_code``"""
+
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+        self.requests = []
+        self.client_ports = set()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                server.requests.append((dict(self.headers), json.loads(body)))
+                server.client_ports.add(self.client_address[1])
+                self.send_response(server.status_code)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'ok')
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_port}/webhook'
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@override_settings(WEBHOOK_RETRIES=2, WEBHOOK_BACKOFF_SECONDS=30)
+class WebhookOutboxTest(TestCase):
+    def _queue(self, url, payload=None):
+        return webhooks.enqueue('test_event', payload or {'id': 1}, url=url)
+
+    def test_approval_queues_webhook_without_sending(self):
+        product = PersonalizedProduct.objects.create(nome='Produto')
+
+        with mock.patch('requests.post') as post:
+            product.status = 'APPROVED'
+            product.save()
+
+        post.assert_not_called()
+        log = WebhookLog.objects.get(event_type='personalized_product_approved')
+        self.assertEqual(log.status, 'PENDING')
+        self.assertEqual(log.attempt_count, 0)
+        self.assertEqual(log.payload['product_id'], product.pk)
+
+    def test_database_error_in_approval_is_rolled_back(self):
+        product = PersonalizedProduct.objects.create(nome='Produto')
+
+        def fail(product):
+            Party.objects.create(name='Half-created partner', person_type='JURIDICAL_PERSON')
+            raise IntegrityError('duplicate partner')
+
+        with mock.patch.object(signals, '_get_or_create_partner_for_product', side_effect=fail):
+            product.status = 'APPROVED'
+            product.save()
+
+        self.assertEqual(PersonalizedProduct.objects.get(pk=product.pk).status, 'APPROVED')
+        self.assertFalse(Party.objects.filter(name='Half-created partner').exists())
+        self.assertFalse(WebhookLog.objects.exists())
+
+    def test_worker_delivers_to_receiver(self):
+        with StubWebhookServer() as server:
+            log = self._queue(server.url, {'id': 42})
+            call_command('run_webhook_worker', '--once', stdout=mock.MagicMock())
+
+        log.refresh_from_db()
+        self.assertEqual(log.status, 'SUCCESS')
+        self.assertEqual(log.attempt_count, 1)
+        self.assertEqual(log.response_status_code, 200)
+        headers, body = server.requests[0]
+        self.assertEqual(body, {'id': 42})
+        self.assertEqual(headers['X-Webhook-Delivery'], str(log.pk))
+
+    def test_server_error_is_retried_with_backoff(self):
+        with StubWebhookServer(status_code=503) as server:
+            log = self._queue(server.url)
+            counts = webhooks.process_batch()
+            # Not due again until the backoff elapses
+            self.assertEqual(webhooks.process_batch(), {'SUCCESS': 0, 'PENDING': 0, 'FAILED': 0})
+
+        self.assertEqual(counts['PENDING'], 1)
+        log.refresh_from_db()
+        self.assertEqual(log.status, 'PENDING')
+        self.assertEqual(log.attempt_count, 1)
+        self.assertGreater(log.next_attempt_at, timezone.now() + timedelta(seconds=25))
+        self.assertEqual(len(server.requests), 1)
+
+    def test_gives_up_after_retries(self):
+        with StubWebhookServer(status_code=500) as server:
+            log = self._queue(server.url)
+            for _ in range(3):
+                WebhookLog.objects.filter(pk=log.pk).update(next_attempt_at=timezone.now())
+                webhooks.process_batch()
+
+        log.refresh_from_db()
+        self.assertEqual(log.status, 'FAILED')
+        self.assertEqual(log.attempt_count, 3)
+        self.assertEqual(len(server.requests), 3)
+
+    def test_client_error_fails_immediately(self):
+        with StubWebhookServer(status_code=404) as server:
+            log = self._queue(server.url)
+            webhooks.process_batch()
+
+        log.refresh_from_db()
+        self.assertEqual(log.status, 'FAILED')
+        self.assertEqual(log.attempt_count, 1)
+
+    def test_unreachable_receiver_records_error(self):
+        with StubWebhookServer() as server:
+            url = server.url
+        log = self._queue(url)
+
+        webhooks.process_batch()
+
+        log.refresh_from_db()
+        self.assertEqual(log.status, 'PENDING')
+        self.assertIsNone(log.response_status_code)
+        self.assertTrue(log.error_message)
+
+    def test_claimed_rows_are_not_claimed_twice(self):
+        logs = [self._queue('http://127.0.0.1:9/webhook') for _ in range(3)]
+
+        first = webhooks.claim_batch(2)
+        second = webhooks.claim_batch(5)
+
+        self.assertEqual([log.pk for log in first], [logs[0].pk, logs[1].pk])
+        self.assertEqual([log.pk for log in second], [logs[2].pk])
+        self.assertEqual(webhooks.claim_batch(5), [])
+
+    @override_settings(WEBHOOK_TIMEOUT=10)
+    def test_lease_covers_every_wave_of_the_batch(self):
+        # 20 webhooks, 4 at a time: 5 waves of up to 2 timeouts, plus margin
+        self.assertEqual(webhooks.lease_seconds(20, 4), 110)
+        log = self._queue('http://127.0.0.1:9/webhook')
+        before = timezone.now()
+        webhooks.claim_batch(20, concurrency=4)
+        log.refresh_from_db()
+        self.assertGreaterEqual(log.next_attempt_at, before + timedelta(seconds=110))
+
+
+@override_settings(WEBHOOK_RETRIES=2, WEBHOOK_BACKOFF_SECONDS=30)
+class WebhookClientTest(TestCase):
+    def _queue_many(self, url, count):
+        return [
+            webhooks.enqueue('test_event', {'n': n}, url=url) for n in range(count)
+        ]
+
+    def test_connections_are_reused(self):
+        with StubWebhookServer() as server:
+            self._queue_many(server.url, 5)
+            with WebhookClient(concurrency=1) as client:
+                counts = webhooks.process_batch(client=client)
+
+        self.assertEqual(counts['SUCCESS'], 5)
+        self.assertEqual(len(server.requests), 5)
+        self.assertEqual(len(server.client_ports), 1)
+
+    def test_batch_mode_sends_one_request(self):
+        with StubWebhookServer() as server:
+            logs = self._queue_many(server.url, 3)
+            with WebhookClient(batch_urls=[server.url]) as client:
+                counts = webhooks.process_batch(client=client)
+
+        self.assertEqual(counts['SUCCESS'], 3)
+        self.assertEqual(len(server.requests), 1)
+        headers, body = server.requests[0]
+        self.assertEqual(headers['X-Webhook-Batch-Size'], '3')
+        self.assertEqual(
+            [event['delivery'] for event in body['events']], [log.pk for log in logs]
+        )
+
+    def test_open_circuit_defers_without_using_attempts(self):
+        breaker = CircuitBreaker(threshold=2, cooldown=120)
+        with StubWebhookServer(status_code=503) as server:
+            self._queue_many(server.url, 4)
+            with WebhookClient(concurrency=1, breaker=breaker) as client:
+                webhooks.process_batch(client=client)
+                # Destination is skipped while the circuit is open
+                self.assertEqual(webhooks.claim_batch(10, breaker.open_destinations()), [])
+
+        self.assertEqual(len(server.requests), 2)
+        deferred = WebhookLog.objects.filter(attempt_count=0)
+        self.assertEqual(deferred.count(), 2)
+        for log in deferred:
+            self.assertEqual(log.status, 'PENDING')
+            self.assertEqual(log.next_attempt_at, breaker.open_until(server.url))
+
+    def test_circuit_closes_after_successful_probe(self):
+        breaker = CircuitBreaker(threshold=1, cooldown=60)
+        now = timezone.now()
+        breaker.record('http://example.test/hook', False, now=now)
+
+        self.assertFalse(breaker.allow('http://example.test/hook', now=now))
+        later = now + timedelta(seconds=61)
+        self.assertTrue(breaker.allow('http://example.test/hook', now=later))
+        breaker.record('http://example.test/hook', True, now=later)
+        self.assertEqual(breaker.open_destinations(now=later), [])
+
+
+class WebhookRetentionTest(TestCase):
+    def setUp(self):
+        self.old = timezone.now() - timedelta(days=400)
+        self.logs = {}
+        for status in ('SUCCESS', 'FAILED', 'PENDING'):
+            log = webhooks.enqueue('test_event', {'status': status}, url='http://example.test/hook')
+            WebhookLog.objects.filter(pk=log.pk).update(status=status, created_at=self.old)
+            self.logs[status] = log
+        WebhookLogCounter.rebuild()
+
+    def test_counters_follow_worker_results(self):
+        WebhookLogCounter.rebuild()
+        with StubWebhookServer() as server:
+            webhooks.enqueue('test_event', {}, url=server.url)
+            webhooks.process_batch()
+
+        self.assertEqual(
+            WebhookLogCounter.totals(), {'SUCCESS': 2, 'FAILED': 1, 'PENDING': 1}
+        )
+
+    def test_compaction_keeps_hash(self):
+        self.assertEqual(compact_logs(timezone.now(), chunk_size=1), 1)
+
+        log = WebhookLog.objects.get(pk=self.logs['SUCCESS'].pk)
+        self.assertIsNone(log.payload)
+        self.assertEqual(log.payload_hash, payload_hash({'status': 'SUCCESS'}))
+        self.assertIsNotNone(log.compacted_at)
+        # Failed logs keep their payload for investigation
+        self.assertIsNotNone(WebhookLog.objects.get(pk=self.logs['FAILED'].pk).payload)
+
+    def test_purge_archives_finished_logs(self):
+        with tempfile.TemporaryDirectory() as archive_dir:
+            deleted, path = purge_logs(timezone.now(), chunk_size=1, archive_dir=archive_dir)
+            with gzip.open(path, 'rt') as archive:
+                rows = [json.loads(line) for line in archive]
+            self.assertEqual(os.path.dirname(path), archive_dir)
+
+        self.assertEqual(deleted, 2)
+        self.assertEqual({row['status'] for row in rows}, {'SUCCESS', 'FAILED'})
+        self.assertEqual(list(WebhookLog.objects.values_list('status', flat=True)), ['PENDING'])
+        self.assertEqual(
+            WebhookLogCounter.totals(), {'SUCCESS': 0, 'FAILED': 0, 'PENDING': 1}
+        )
+
+    def test_command_respects_retention_window(self):
+        recent = webhooks.enqueue('test_event', {}, url='http://example.test/hook')
+        WebhookLog.objects.filter(pk=recent.pk).update(status='SUCCESS')
+
+        call_command('prune_webhook_logs', stdout=mock.MagicMock())
+
+        self.assertEqual(
+            set(WebhookLog.objects.values_list('pk', flat=True)),
+            {self.logs['PENDING'].pk, recent.pk},
+        )
+
+    def test_admin_changelist_uses_counters(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'testpass123')
+        self.client.force_login(admin_user)
+
+        response = self.client.get('/admin/corporate_relationship/webhooklog/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].result_count, 3)
+        self.assertContains(response, '<strong>FAILED</strong>: 1', html=False)
+
+
+class BulkApprovalTest(TestCase):
+    def setUp(self):
+        self.products = PersonalizedProduct.objects.bulk_create([
+            PersonalizedProduct(nome=f'Produto {n}') for n in range(20)
+        ])
+        self.products = list(PersonalizedProduct.objects.order_by('pk'))
+
+    def test_bulk_approval_uses_constant_queries(self):
+        with self.assertNumQueries(12):
+            approved = approvals.bulk_approve_products(self.products)
+
+        self.assertEqual(len(approved), 20)
+        self.assertEqual(PersonalizedProduct.objects.filter(status='APPROVED').count(), 20)
+        self.assertEqual(Partner.objects.count(), 20)
+        logs = WebhookLog.objects.filter(event_type=approvals.APPROVAL_EVENT)
+        self.assertEqual(
+            sorted(log.payload['product_id'] for log in logs), sorted(approved)
+        )
+        self.assertEqual(WebhookLogCounter.totals()['PENDING'], 20)
+
+    def test_matches_single_approval_and_reuses_partners(self):
+        first = self.products[0]
+        first.status = 'APPROVED'
+        first.save()
+        PersonalizedProduct.objects.filter(pk=first.pk).update(status='DRAFT')
+
+        approvals.bulk_approve_products([product.pk for product in self.products])
+
+        self.assertEqual(Party.objects.filter(name=f'Partner for Product {first.pk}').count(), 1)
+        self.assertEqual(Partner.objects.count(), 20)
+        # Already approved products are skipped
+        self.assertEqual(approvals.bulk_approve_products(self.products), [])
+
+    def test_entity_based_products_get_no_relationship_structures(self):
+        entity = Entity.objects.create(name='Wyoming LLC')
+        PersonalizedProduct.objects.filter(pk=self.products[0].pk).update(base_structure=entity)
+
+        approvals.bulk_approve_products(self.products[:1])
+
+        self.assertFalse(RelationshipStructure.objects.exists())
+        log = WebhookLog.objects.get(event_type=approvals.APPROVAL_EVENT)
+        self.assertEqual(log.payload['structures'], [])
+
+
+class ServiceActivityDueTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.localdate()
+        self.alice = User.objects.create_user('alice', 'alice@example.com')
+        self.bob = User.objects.create_user('bob', 'bob@example.com')
+        self.filing = self._service('Annual filing', self.alice)
+        self.registry = self._service('Registry update', self.bob)
+
+        self.late = self._activity(self.filing, -3)
+        self.soon = self._activity(self.filing, 2)
+        self.later = self._activity(self.registry, 20)
+        self._activity(self.registry, -10, status='COMPLETED')
+        self._activity(self.registry, -1, status='CANCELLED')
+        self.registry_late = self._activity(self.registry, -1)
+
+    def _service(self, name, executor):
+        return Service.objects.create(
+            name=name, service_price=100, regulator_fee=10,
+            executor=executor, counterparty_name='Registry',
+        )
+
+    def _activity(self, service, days, status='PLANNED'):
+        return ServiceActivity.objects.create(
+            service=service, activity_title=f'Due {days}', status=status,
+            start_date=self.today - timedelta(days=30),
+            due_date=self.today + timedelta(days=days),
+        )
+
+    def test_queryset_filters(self):
+        self.assertCountEqual(
+            ServiceActivity.objects.overdue(), [self.late, self.registry_late]
+        )
+        self.assertCountEqual(ServiceActivity.objects.due_within(7), [self.soon])
+
+    def test_days_until_due_annotation_matches_python(self):
+        annotated = {
+            activity.pk: activity.days_until_due
+            for activity in ServiceActivity.objects.with_days_until_due()
+        }
+        for activity in ServiceActivity.objects.all():
+            self.assertEqual(annotated[activity.pk], activity.days_until_due)
+        self.assertEqual(
+            list(ServiceActivity.objects.with_days_until_due()
+                 .filter(days_until_due__lt=0, pk=self.late.pk)
+                 .values_list('days_until_due', flat=True)),
+            [-3],
+        )
+        self.assertTrue(self.late.is_overdue())
+
+    def test_digest_groups_by_executor_and_service(self):
+        with self.assertNumQueries(2):
+            digest = build_digest(days=7)
+
+        self.assertEqual(digest['totals'], {'overdue': 2, 'due_soon': 1})
+        by_executor = {row['executor']: row for row in digest['by_executor']}
+        self.assertEqual(by_executor['alice']['overdue'], 1)
+        self.assertEqual(by_executor['alice']['due_soon'], 1)
+        self.assertEqual(by_executor['bob']['next_due'], self.registry_late.due_date)
+        self.assertEqual(
+            [row['service'] for row in digest['by_service']],
+            ['Annual filing', 'Registry update'],
+        )
+
+    def test_scan_feeds_dashboard_panel(self):
+        call_command('scan_service_activities', stdout=mock.MagicMock())
+        self.assertEqual(cache.get(DIGEST_CACHE_KEY)['totals']['overdue'], 2)
+
+        staff = User.objects.create_user('staff', password='testpass123', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get('/admin/dashboard/')
+
+        self.assertContains(response, 'Service Activities Due')
+        self.assertEqual(response.context['activity_digest']['totals']['due_soon'], 1)
+
+    def test_executor_workload(self):
+        with self.assertNumQueries(4):
+            report = executor_workload(weeks=4)
+
+        by_executor = {row['executor']: row for row in report['executors']}
+        self.assertEqual(by_executor['alice']['totals'], {'planned': 2, 'in_progress': 0, 'overdue': 1})
+        self.assertEqual(sum(week['planned'] for week in by_executor['alice']['weeks']), 2)
+        self.assertEqual(
+            [row['activity_id'] for row in by_executor['alice']['upcoming']], [self.soon.pk]
+        )
+        # Due in 20 days: inside the four-week window
+        self.assertEqual(by_executor['bob']['upcoming'][0]['activity_id'], self.later.pk)
+        self.assertEqual(by_executor['bob']['service_price'], {'USD': Decimal('100.00')})
+
+    def test_workload_api_is_cached_per_day(self):
+        staff = User.objects.create_user('staff', password='testpass123', is_staff=True)
+        self.client.force_login(staff)
+
+        response = self.client.get('/relationship/api/workload/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['executors']), 2)
+
+        self._activity(self.filing, -5)
+        cached = self.client.get('/relationship/api/workload/').json()
+        self.assertEqual(cached['executors'][0]['totals']['overdue'], 1)
+
+        self.assertEqual(self.client.get('/relationship/api/workload/?weeks=x').status_code, 400)
+
+
+class PartnerPortfolioTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.localdate()
+        executor = User.objects.create_user('executor')
+        party = Party.objects.create(name='Acme Holdings', person_type='JURIDICAL_PERSON')
+        self.partner = Partner.objects.create(party=party, company_name='Acme', address='Main St')
+
+        self.relationships = []
+        for name, currency in (('Acme Trust', 'USD'), ('Acme BV', 'EUR')):
+            structure = Structure.objects.create(name=name, description='Test')
+            relationship = RelationshipStructure.objects.create(
+                structure=structure, client=self.partner
+            )
+            self.relationships.append(relationship)
+            for n in range(2):
+                service = Service.objects.create(
+                    name=f'{name} service {n}', executor=executor,
+                    counterparty_name='Registry', relationship_structure=relationship,
+                    service_price=Money(100, currency), regulator_fee=Money(10, currency),
+                )
+                ServiceActivity.objects.create(
+                    service=service, activity_title='Filing', start_date=self.today,
+                    due_date=self.today + timedelta(days=n),
+                )
+                ServiceActivity.objects.create(
+                    service=service, activity_title='Done', start_date=self.today,
+                    status='COMPLETED',
+                )
+        self.service = service
+
+    def test_portfolio_in_fixed_queries(self):
+        with self.assertNumQueries(6):
+            portfolio = partner_portfolio(self.partner.pk)
+
+        totals = portfolio['totals']
+        self.assertEqual(totals['service_price'], {'USD': Decimal('200.00'), 'EUR': Decimal('200.00')})
+        self.assertEqual(totals['regulator_fee'], {'USD': Decimal('20.00'), 'EUR': Decimal('20.00')})
+        self.assertEqual((totals['structures'], totals['services'], totals['open_activities']), (2, 4, 4))
+        trust = next(r for r in portfolio['relationships'] if r['structure']['name'] == 'Acme Trust')
+        self.assertEqual(trust['service_price'], {'USD': Decimal('200.00')})
+        self.assertEqual(
+            sorted(a['days_until_due'] for a in trust['open_activities']), [0, 1]
+        )
+
+    def test_api_caches_and_invalidates_on_change(self):
+        staff = User.objects.create_user('staff', password='testpass123', is_staff=True)
+        self.client.force_login(staff)
+        url = f'/relationship/api/partners/{self.partner.pk}/portfolio/'
+
+        self.assertEqual(self.client.get(url).json()['totals']['open_activities'], 4)
+        self.assertIsNotNone(cache.get(portfolio_cache_key(self.partner.pk)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ServiceActivity.objects.create(
+                service=self.service, activity_title='New', start_date=self.today
+            )
+        self.assertIsNone(cache.get(portfolio_cache_key(self.partner.pk)))
+        self.assertEqual(self.client.get(url).json()['totals']['open_activities'], 5)
+
+        self.assertEqual(self.client.get('/relationship/api/partners/999/portfolio/').status_code, 404)
+
+    def test_api_converts_totals_to_requested_currency(self):
+        staff = User.objects.create_user('staff', password='testpass123', is_staff=True)
+        self.client.force_login(staff)
+        url = f'/relationship/api/partners/{self.partner.pk}/portfolio/'
+        with self.captureOnCommitCallbacks(execute=True):
+            ExchangeRate.objects.create(currency='EUR', date=self.today, rate=Decimal('0.5'))
+
+        converted = self.client.get(url, {'currency': 'USD'}).json()['totals']['converted']
+        self.assertEqual(converted, {
+            'currency': 'USD', 'service_price': '600.00', 'regulator_fee': '60.00',
+        })
+        self.assertEqual(self.client.get(url, {'currency': 'BRL'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'currency': 'ABC'}).status_code, 400)
+
+    def test_moving_service_invalidates_both_partners(self):
+        other_party = Party.objects.create(name='Other', person_type='JURIDICAL_PERSON')
+        other = Partner.objects.create(party=other_party, company_name='Other', address='x')
+        structure = Structure.objects.create(name='Other LLC', description='Test')
+        target = RelationshipStructure.objects.create(structure=structure, client=other)
+        cache.set(portfolio_cache_key(self.partner.pk), 'cached')
+        cache.set(portfolio_cache_key(other.pk), 'cached')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service.relationship_structure = target
+            self.service.save()
+
+        self.assertIsNone(cache.get(portfolio_cache_key(self.partner.pk)))
+        self.assertIsNone(cache.get(portfolio_cache_key(other.pk)))
+
+    def test_partner_lookup_runs_after_commit(self):
+        activity = ServiceActivity.objects.filter(service=self.service).first()
+        structure = self.relationships[0].structure
+        cache.set(portfolio_cache_key(self.partner.pk), 'cached')
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            with CaptureQueriesContext(connection) as queries:
+                activity.activity_title = 'Renamed'
+                activity.save()
+                structure.description = 'Changed'
+                structure.save()
+                self.partner.party.save()
+        # The affected partners are only looked up on commit
+        lookups = [
+            query['sql'] for query in queries.captured_queries
+            if 'relationshipstructure' in query['sql'] or 'sales_partner' in query['sql']
+        ]
+        self.assertEqual(lookups, [])
+        self.assertIsNotNone(cache.get(portfolio_cache_key(self.partner.pk)))
+
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(cache.get(portfolio_cache_key(self.partner.pk)))
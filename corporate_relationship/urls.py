@@ -0,0 +1,16 @@
+from django.urls import path
+from . import views
+
+app_name = 'corporate_relationship'
+
+urlpatterns = [
+    path('api/workload/', views.executor_workload_api, name='executor_workload'),
+    path(
+        'api/partners/<int:partner_id>/portfolio/', views.partner_portfolio_api,
+        name='partner_portfolio'
+    ),
+    path(
+        'api/partners/<int:partner_id>/compliance-calendar/',
+        views.partner_compliance_calendar_api, name='partner_compliance_calendar'
+    ),
+]
@@ -1,3 +1,70 @@
-from django.shortcuts import render
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 
-# Create your views here.
+from corporate.compliance import calendar_window, partner_calendar
+from financial_department.fx import Converter, ExchangeRateMissing
+from sales.models import Partner
+from .reports import cached_executor_workload, cached_partner_portfolio
+
+MAX_WORKLOAD_WEEKS = 52
+
+
+@staff_member_required
+def executor_workload_api(request):
+    """Open activities per executor and week, with service totals per currency"""
+    try:
+        weeks = int(request.GET.get('weeks', 0)) or None
+    except ValueError:
+        return JsonResponse({'error': 'Invalid weeks'}, status=400)
+    if weeks is not None and not 0 < weeks <= MAX_WORKLOAD_WEEKS:
+        return JsonResponse({'error': f'weeks must be between 1 and {MAX_WORKLOAD_WEEKS}'}, status=400)
+
+    return JsonResponse(cached_executor_workload(weeks))
+
+
+@staff_member_required
+def partner_portfolio_api(request, partner_id):
+    """Relationship structures, services and open activities of a partner"""
+    currency = request.GET.get('currency')
+    if currency and currency not in settings.CURRENCIES:
+        return JsonResponse({'error': 'Invalid currency'}, status=400)
+
+    portfolio = cached_partner_portfolio(partner_id)
+    if portfolio is None:
+        return JsonResponse({'error': 'Partner not found'}, status=404)
+
+    if currency:
+        # Totais em várias moedas somados na moeda pedida (câmbio de hoje)
+        converter = Converter(currency)
+        totals = portfolio['totals']
+        try:
+            converted = {
+                field: converter.total(totals[field])
+                for field in ('service_price', 'regulator_fee')
+            }
+        except ExchangeRateMissing as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        portfolio = {
+            **portfolio,
+            'totals': {**totals, 'converted': {'currency': currency, **converted}},
+        }
+    return JsonResponse(portfolio)
+
+
+@staff_member_required
+def partner_compliance_calendar_api(request, partner_id):
+    """Compliance deadlines across a partner's active structures (?start=, ?end=)"""
+    try:
+        start, end = calendar_window(request.GET.get('start'), request.GET.get('end'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if not Partner.objects.filter(pk=partner_id).exists():
+        return JsonResponse({'error': 'Partner not found'}, status=404)
+
+    return JsonResponse({
+        'partner_id': partner_id,
+        'start': start,
+        'end': end,
+        'deadlines': partner_calendar(partner_id, start, end),
+    })
@@ -0,0 +1,395 @@
+"""
+Webhook outbox
+
+Events are written to WebhookLog as PENDING rows in the same transaction as
+the change that produced them, so a webhook is queued if and only if that
+change commits. The run_webhook_worker command delivers them: each worker
+claims a batch of due rows (corporate.claims), posts them concurrently and
+reschedules failures with exponential backoff until WEBHOOK_RETRIES is exhausted.
+
+Claimed rows get a short lease through next_attempt_at, so several workers can
+run side by side and a worker that dies mid-batch only delays its rows until
+the lease expires. Delivery is at-least-once; receivers can deduplicate on the
+X-Webhook-Delivery header (or the ``delivery`` field of each batched event).
+
+WebhookClient keeps a keep-alive connection pool per destination, optionally
+sends many events per request to receivers that opt in through
+WEBHOOK_BATCH_URLS, and trips a per-destination circuit breaker so a dead
+endpoint stops consuming worker capacity.
+"""
+
+import logging
+import math
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from corporate.claims import claim_rows
+from .models import WebhookLog, WebhookLogCounter
+
+logger = logging.getLogger(__name__)
+
+# Status codes worth retrying; other 4xx responses fail immediately
+RETRYABLE_STATUS_CODES = {408, 425, 429}
+
+
+def enqueue(event_type, payload, url=None):
+    """Queue a webhook for delivery; returns the WebhookLog or None"""
+    url = url or getattr(settings, 'RELATIONSHIP_WEBHOOK_URL', None)
+    if not url:
+        logger.warning(f"No webhook URL configured, dropping {event_type}")
+        return None
+
+    log = WebhookLog.objects.create(
+        event_type=event_type,
+        payload=payload,
+        url=url,
+        status='PENDING',
+        next_attempt_at=timezone.now(),
+    )
+    WebhookLogCounter.adjust({'PENDING': 1})
+    return log
+
+
+def enqueue_many(event_type, payloads, url=None):
+    """Queue several webhooks of one event type with a single INSERT"""
+    url = url or getattr(settings, 'RELATIONSHIP_WEBHOOK_URL', None)
+    if not url:
+        logger.warning(f"No webhook URL configured, dropping {len(payloads)} {event_type}")
+        return []
+
+    now = timezone.now()
+    logs = WebhookLog.objects.bulk_create([
+        WebhookLog(
+            event_type=event_type,
+            payload=payload,
+            url=url,
+            status='PENDING',
+            next_attempt_at=now,
+        )
+        for payload in payloads
+    ])
+    WebhookLogCounter.adjust({'PENDING': len(logs)})
+    return logs
+
+
+def max_attempts():
+    """First delivery plus WEBHOOK_RETRIES retries"""
+    return 1 + settings.WEBHOOK_RETRIES
+
+
+def backoff_delay(attempt):
+    """Seconds to wait after the given (1-based) failed attempt"""
+    delay = settings.WEBHOOK_BACKOFF_SECONDS * 2 ** (attempt - 1)
+    return min(delay, settings.WEBHOOK_BACKOFF_MAX_SECONDS)
+
+
+def lease_seconds(limit, concurrency=None):
+    """
+    Lease long enough for a batch of ``limit`` webhooks to be posted and
+    recorded: ceil(limit / concurrency) waves of requests that may each take
+    up to WEBHOOK_TIMEOUT to connect and again to answer, plus one more
+    timeout of margin.
+    """
+    concurrency = concurrency or settings.WEBHOOK_WORKER_CONCURRENCY
+    waves = math.ceil(limit / concurrency)
+    return (2 * waves + 1) * settings.WEBHOOK_TIMEOUT
+
+
+def _lease_expiry(now, limit, concurrency=None):
+    return now + timedelta(seconds=lease_seconds(limit, concurrency))
+
+
+def _due(now):
+    return WebhookLog.objects.filter(status='PENDING').filter(
+        Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now)
+    )
+
+
+def claim_batch(limit, exclude_urls=(), concurrency=None):
+    """
+    Lease up to ``limit`` due webhooks to a worker posting ``concurrency``
+    at a time and return them
+    """
+    now = timezone.now()
+    lease = _lease_expiry(now, limit, concurrency)
+    due = _due(now)
+    if exclude_urls:
+        due = due.exclude(url__in=exclude_urls)
+    claimed = claim_rows(due, ['next_attempt_at', 'pk'], limit, next_attempt_at=lease)
+    return list(WebhookLog.objects.filter(pk__in=claimed).order_by('pk'))
+
+
+def delivery_headers(log):
+    return {
+        'Content-Type': 'application/json',
+        'X-Webhook-Event': log.event_type,
+        'X-Webhook-Delivery': str(log.pk),
+    }
+
+
+def batch_body(logs):
+    """Request body for receivers that accept several events per request"""
+    return {
+        'events': [
+            {'delivery': log.pk, 'event': log.event_type, 'payload': log.payload}
+            for log in logs
+        ]
+    }
+
+
+def is_retryable(status_code):
+    """Whether a failed attempt should be retried (and counts against the circuit)"""
+    return (
+        status_code is None
+        or status_code >= 500
+        or status_code in RETRYABLE_STATUS_CODES
+    )
+
+
+class CircuitBreaker:
+    """
+    Per-destination circuit breaker.
+
+    After ``threshold`` consecutive retryable failures the circuit opens and
+    the destination is skipped for ``cooldown`` seconds. The first request
+    after the cooldown is a probe: success closes the circuit, another failure
+    opens it again straight away.
+    """
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = defaultdict(int)
+        self._open_until = {}
+        self._lock = threading.Lock()
+
+    def allow(self, destination, now=None):
+        now = now or timezone.now()
+        with self._lock:
+            open_until = self._open_until.get(destination)
+            return open_until is None or open_until <= now
+
+    def open_until(self, destination):
+        return self._open_until.get(destination)
+
+    def open_destinations(self, now=None):
+        now = now or timezone.now()
+        with self._lock:
+            return [
+                destination for destination, until in self._open_until.items()
+                if until > now
+            ]
+
+    def record(self, destination, success, now=None):
+        now = now or timezone.now()
+        with self._lock:
+            if success:
+                self._failures.pop(destination, None)
+                self._open_until.pop(destination, None)
+                return
+            self._failures[destination] += 1
+            if self._failures[destination] >= self.threshold:
+                self._open_until[destination] = now + timedelta(seconds=self.cooldown)
+                logger.warning(f"Circuit opened for webhook destination {destination}")
+
+
+class WebhookClient:
+    """
+    Long-lived delivery client used by the worker.
+
+    Keeps one keep-alive session (connection pool) per destination origin,
+    posts through a bounded thread pool and groups events for destinations
+    listed in WEBHOOK_BATCH_URLS into batch requests. Sessions are only used
+    for HTTP, never for database access.
+    """
+
+    def __init__(self, concurrency=None, batch_urls=None, max_batch=None,
+                 breaker=None):
+        self.concurrency = concurrency or settings.WEBHOOK_WORKER_CONCURRENCY
+        self.batch_urls = set(
+            settings.WEBHOOK_BATCH_URLS if batch_urls is None else batch_urls
+        )
+        self.max_batch = max_batch or settings.WEBHOOK_MAX_BATCH_EVENTS
+        self.breaker = breaker or CircuitBreaker(
+            settings.WEBHOOK_CIRCUIT_THRESHOLD, settings.WEBHOOK_CIRCUIT_COOLDOWN
+        )
+        self._sessions = {}
+        self._sessions_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        with self._sessions_lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def session_for(self, url):
+        parts = urlsplit(url)
+        origin = (parts.scheme, parts.netloc)
+        with self._sessions_lock:
+            session = self._sessions.get(origin)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+                session.mount(f'{parts.scheme}://', adapter)
+                self._sessions[origin] = session
+            return session
+
+    def _post(self, url, body, headers):
+        try:
+            response = self.session_for(url).post(
+                url, json=body, headers=headers, timeout=settings.WEBHOOK_TIMEOUT
+            )
+        except requests.exceptions.RequestException as e:
+            return None, '', str(e)[:500]
+        return response.status_code, response.text[:1000], ''
+
+    def _send(self, url, logs):
+        """Deliver one unit of work; returns None when the circuit is open"""
+        if not self.breaker.allow(url):
+            return None
+
+        if len(logs) == 1 and url not in self.batch_urls:
+            log = logs[0]
+            outcome = self._post(url, log.payload, delivery_headers(log))
+        else:
+            headers = {
+                'Content-Type': 'application/json',
+                'X-Webhook-Event': 'batch',
+                'X-Webhook-Batch-Size': str(len(logs)),
+            }
+            outcome = self._post(url, batch_body(logs), headers)
+
+        # Any non-retryable answer (even a 4xx) means the receiver is up
+        self.breaker.record(url, not is_retryable(outcome[0]))
+        return outcome
+
+    def _units(self, logs):
+        by_url = defaultdict(list)
+        for log in logs:
+            by_url[log.url].append(log)
+
+        for url, url_logs in by_url.items():
+            if url in self.batch_urls:
+                for i in range(0, len(url_logs), self.max_batch):
+                    yield url, url_logs[i:i + self.max_batch]
+            else:
+                for log in url_logs:
+                    yield url, [log]
+
+    def deliver(self, logs):
+        """
+        Deliver webhooks concurrently.
+
+        Returns (log, outcome) pairs where outcome is
+        (status_code, response_body, error_message), or None for webhooks
+        skipped because their destination circuit is open.
+        """
+        units = list(self._units(logs))
+        futures = [self._executor.submit(self._send, url, unit) for url, unit in units]
+
+        results = []
+        for (url, unit), future in zip(units, futures):
+            outcome = future.result()
+            results.extend((log, outcome) for log in unit)
+        return results
+
+
+def record_result(log, status_code, response_body, error_message, now=None):
+    """
+    Store the outcome of an attempt and schedule the retry if any.
+
+    Returns the new status; the caller adjusts WebhookLogCounter.
+    """
+    now = now or timezone.now()
+    log.attempt_count += 1
+    log.last_attempt_at = now
+    log.response_status_code = status_code
+    log.response_body = response_body
+    log.error_message = error_message
+
+    if status_code is not None and status_code < 400:
+        log.status = 'SUCCESS'
+        log.next_attempt_at = None
+    elif not is_retryable(status_code) or log.attempt_count >= max_attempts():
+        log.status = 'FAILED'
+        log.next_attempt_at = None
+    else:
+        log.status = 'PENDING'
+        log.next_attempt_at = now + timedelta(seconds=backoff_delay(log.attempt_count))
+
+    log.save(update_fields=[
+        'attempt_count', 'last_attempt_at', 'response_status_code',
+        'response_body', 'error_message', 'status', 'next_attempt_at',
+    ])
+    return log.status
+
+
+def process_batch(limit=None, client=None):
+    """
+    Claim and deliver one batch of due webhooks.
+
+    Returns a dict counting the resulting SUCCESS/PENDING/FAILED statuses.
+    Webhooks for destinations whose circuit is open are not claimed; any that
+    were claimed before the circuit opened are deferred without using up an
+    attempt.
+    """
+    limit = limit or settings.WEBHOOK_BATCH_SIZE
+    counts = {'SUCCESS': 0, 'PENDING': 0, 'FAILED': 0}
+
+    if client is None:
+        with WebhookClient() as client:
+            return process_batch(limit, client)
+
+    logs = claim_batch(
+        limit, exclude_urls=client.breaker.open_destinations(), concurrency=client.concurrency
+    )
+    if not logs:
+        return counts
+
+    deferred = defaultdict(list)
+    finished = defaultdict(int)
+    for log, outcome in client.deliver(logs):
+        if outcome is None:
+            deferred[client.breaker.open_until(log.url) or timezone.now()].append(log.pk)
+            counts['PENDING'] += 1
+            continue
+
+        status_code, response_body, error_message = outcome
+        status = record_result(log, status_code, response_body, error_message)
+        counts[status] += 1
+        if status != 'PENDING':
+            finished['PENDING'] -= 1
+            finished[status] += 1
+        if status == 'FAILED':
+            logger.error(
+                f"Webhook {log.pk} ({log.event_type}) failed after "
+                f"{log.attempt_count} attempts: {error_message or status_code}"
+            )
+        elif status == 'PENDING':
+            logger.warning(
+                f"Webhook {log.pk} attempt {log.attempt_count} failed, "
+                f"retrying at {log.next_attempt_at}"
+            )
+
+    for retry_at, ids in deferred.items():
+        WebhookLog.objects.filter(pk__in=ids).update(next_attempt_at=retry_at)
+    WebhookLogCounter.adjust(finished)
+
+    return counts
@@ -6,3 +6,5 @@ class DashboardConfig(AppConfig):
     name = 'dashboard'
     verbose_name = 'SIRIUS Dashboard'
 
+    def ready(self):
+        import dashboard.signals  # noqa
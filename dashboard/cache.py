@@ -0,0 +1,99 @@
+"""
+Dashboard caching
+
+Short-lived cache for dashboard data with single-flight recomputation. When an
+entry goes stale only one request recomputes it while the others keep serving
+the stale copy; on a cold miss the others wait briefly for that request
+instead of hitting the database too. Only data is cached, never rendered
+pages, which carry a per-visitor CSRF token.
+"""
+
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+PUBLIC_CONTEXT_KEY = 'dashboard:public:context'
+API_KEY_PREFIX = 'dashboard:api:'
+API_DATA_TYPES = ('stats', 'recent_activity', 'performance')
+
+# How long a recomputation may hold the lock before others give up waiting
+LOCK_TIMEOUT = 10
+WAIT_INTERVAL = 0.05
+
+
+def api_cache_key(data_type):
+    return f'{API_KEY_PREFIX}{data_type}'
+
+
+def _lock_key(key):
+    return f'{key}:lock'
+
+
+def _store(key, compute, ttl, stale_ttl):
+    value = compute()
+    cache.set(key, (value, time.time() + ttl), ttl + stale_ttl)
+    return value
+
+
+def _wait_for(key):
+    """Wait for the request holding the lock to store a value"""
+    deadline = time.time() + LOCK_TIMEOUT
+    while time.time() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+        if cache.get(_lock_key(key)) is None:
+            break
+    return None
+
+
+def get_or_compute(key, compute, ttl=None, stale_ttl=None):
+    """
+    Return the cached value for ``key``, computing it at most once at a time.
+
+    Values are fresh for ``ttl`` seconds and may be served stale for another
+    ``stale_ttl`` seconds while a single request revalidates them.
+    """
+    ttl = settings.DASHBOARD_CACHE_TTL if ttl is None else ttl
+    stale_ttl = settings.DASHBOARD_CACHE_STALE_TTL if stale_ttl is None else stale_ttl
+
+    entry = cache.get(key)
+    if entry is not None:
+        value, fresh_until = entry
+        if time.time() < fresh_until:
+            return value
+
+        # Stale: whoever wins the lock revalidates, everyone else serves stale
+        if not cache.add(_lock_key(key), True, LOCK_TIMEOUT):
+            return value
+        try:
+            return _store(key, compute, ttl, stale_ttl)
+        except Exception as e:
+            logger.error(f"Error revalidating {key}, serving stale: {str(e)}")
+            return value
+        finally:
+            cache.delete(_lock_key(key))
+
+    # Cold miss: compute once, let concurrent requests wait for the result
+    if cache.add(_lock_key(key), True, LOCK_TIMEOUT):
+        try:
+            return _store(key, compute, ttl, stale_ttl)
+        finally:
+            cache.delete(_lock_key(key))
+
+    entry = _wait_for(key)
+    if entry is not None:
+        return entry[0]
+    return compute()
+
+
+def invalidate_dashboard_cache():
+    """Drop every cached dashboard data fragment"""
+    keys = [PUBLIC_CONTEXT_KEY]
+    keys += [api_cache_key(data_type) for data_type in API_DATA_TYPES]
+    cache.delete_many(keys)
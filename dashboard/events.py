@@ -0,0 +1,160 @@
+"""
+Live dashboard events
+
+In-process broadcaster used by the Server-Sent Events stream. Model signals
+publish stat deltas and activity events here once per change, and every
+connected dashboard receives them from its own queue, so the number of open
+dashboards does not add database load. Each worker process has its own
+broadcaster and only sees the changes it saves; dashboards get a full
+snapshot whenever they (re)connect.
+"""
+
+import asyncio
+import json
+import threading
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+def _truncate(text, length=100):
+    return text[:length] + '...' if len(text) > length else text
+
+
+def request_activity(request_obj):
+    """Activity entry for a submitted StructureRequest"""
+    return {
+        'type': 'request_submitted',
+        'title': f'New structure request #{request_obj.pk}',
+        'description': _truncate(request_obj.description),
+        'timestamp': request_obj.submitted_at,
+        'url': f'/admin/sales/structurerequest/{request_obj.pk}/change/',
+        'icon': 'fas fa-plus-circle',
+        'color': 'primary'
+    }
+
+
+def structure_activity(structure):
+    """Activity entry for a newly created Structure"""
+    return {
+        'type': 'structure_created',
+        'title': f'Structure created: {structure.name}',
+        'description': _truncate(structure.description),
+        'timestamp': structure.created_at,
+        'url': f'/admin/corporate/structure/{structure.pk}/change/',
+        'icon': 'fas fa-sitemap',
+        'color': 'success'
+    }
+
+
+def approval_activity(approval):
+    """Activity entry for a StructureApproval action"""
+    return {
+        'type': 'structure_approved',
+        'title': f'Structure {approval.get_action_display().lower()}: {approval.structure.name}',
+        'description': f'Action: {approval.get_action_display()}',
+        'timestamp': approval.action_date,
+        'url': f'/admin/sales/structureapproval/{approval.pk}/change/',
+        'icon': 'fas fa-check-circle',
+        'color': 'info'
+    }
+
+
+def status_change_activity(change):
+    """Activity entry for a dashboard StatusChange"""
+    return {
+        'type': 'status_changed',
+        'title': f'{change.object_repr}: {change.from_status} → {change.to_status}',
+        'description': f'Action: {change.action.replace("_", " ")}',
+        'timestamp': change.changed_at,
+        'url': change.get_admin_url(),
+        'icon': 'fas fa-exchange-alt',
+        'color': 'warning'
+    }
+
+
+def format_sse(event, data):
+    """Encode a single Server-Sent Events message"""
+    payload = json.dumps(data, cls=DjangoJSONEncoder)
+    return f'event: {event}\ndata: {payload}\n\n'
+
+
+class DashboardBroadcaster:
+    """
+    Fan-out of dashboard events to connected SSE clients.
+
+    Subscribers are asyncio queues bound to the event loop of the stream that
+    created them. Publishing is thread-safe so it can be called from the sync
+    threads where model signals run.
+    """
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._stats = None
+
+    @property
+    def has_subscribers(self):
+        return bool(self._subscribers)
+
+    @property
+    def stats(self):
+        """Last stats snapshot (None while no dashboard is connected)"""
+        return self._stats
+
+    def subscribe(self):
+        """Register a queue for the running event loop and return it"""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers = {
+                entry for entry in self._subscribers if entry[1] is not queue
+            }
+            if not self._subscribers:
+                # Nothing refreshes the snapshot while nobody is connected
+                self._stats = None
+
+    def publish(self, event, data):
+        """Send an event to every subscriber"""
+        message = format_sse(event, data)
+        with self._lock:
+            subscribers = list(self._subscribers)
+
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, message)
+            except RuntimeError:
+                # Loop already closed - the stream is gone
+                self.unsubscribe(queue)
+
+    def update_stats(self, stats, publish=True):
+        """Store a new stats snapshot and publish only the changed keys"""
+        previous = self._stats or {}
+        self._stats = dict(stats)
+        delta = {
+            key: value for key, value in stats.items()
+            if previous.get(key) != value
+        }
+        if delta and publish:
+            self.publish('stats', delta)
+        return delta
+
+    def reset(self):
+        """Drop subscribers and cached stats (used by tests)"""
+        with self._lock:
+            self._subscribers = set()
+        self._stats = None
+
+    @staticmethod
+    def _deliver(queue, message):
+        # A slow client must not block publishers; drop its oldest event
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(message)
+
+
+broadcaster = DashboardBroadcaster()
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-19 06:57
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatusChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('object_repr', models.CharField(max_length=200)),
+                ('action', models.CharField(help_text='Dashboard action that caused the change', max_length=50)),
+                ('from_status', models.CharField(max_length=30)),
+                ('to_status', models.CharField(max_length=30)),
+                ('changed_at', models.DateTimeField(auto_now_add=True)),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'verbose_name': 'Status Change',
+                'verbose_name_plural': 'Status Changes',
+                'ordering': ['-changed_at'],
+                'indexes': [models.Index(fields=['content_type', 'object_id'], name='dashboard_s_content_fe6702_idx'), models.Index(fields=['changed_at'], name='dashboard_s_changed_8ff283_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+
+
+class StatusChange(models.Model):
+    """
+    Status history for dashboard workflow objects (StructureRequest, Structure)
+    Written in bulk by dashboard quick actions and shown as activity
+    """
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveBigIntegerField()
+    object_repr = models.CharField(max_length=200)
+
+    action = models.CharField(max_length=50, help_text="Dashboard action that caused the change")
+    from_status = models.CharField(max_length=30)
+    to_status = models.CharField(max_length=30)
+
+    changed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL
+    )
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Status Change"
+        verbose_name_plural = "Status Changes"
+        ordering = ["-changed_at"]
+        indexes = [
+            models.Index(fields=["content_type", "object_id"]),
+            models.Index(fields=["changed_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.object_repr}: {self.from_status} → {self.to_status}"
+
+    def get_admin_url(self):
+        # get_for_id is served from the ContentType cache
+        content_type = ContentType.objects.get_for_id(self.content_type_id)
+        return (
+            f'/admin/{content_type.app_label}/'
+            f'{content_type.model}/{self.object_id}/change/'
+        )
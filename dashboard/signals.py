@@ -0,0 +1,94 @@
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from corporate.models import Entity, Structure
+from parties.models import Party
+from sales.models import StructureApproval, StructureRequest
+from .cache import invalidate_dashboard_cache
+from .events import (
+    approval_activity, broadcaster, request_activity, structure_activity
+)
+
+logger = logging.getLogger(__name__)
+
+# Models whose changes affect the dashboard quick stats
+STATS_MODELS = (StructureRequest, Structure, Entity, Party)
+
+
+def _refresh_stats():
+    """Recompute quick stats once and publish the delta to all dashboards"""
+    if not broadcaster.has_subscribers:
+        return
+
+    from .views import DashboardView
+
+    try:
+        broadcaster.update_stats(DashboardView().get_quick_stats())
+    except Exception as e:
+        logger.error(f"Error refreshing dashboard stats: {str(e)}")
+
+
+def schedule_stats_refresh():
+    """Queue a single stats refresh for when the current transaction commits"""
+    if not broadcaster.has_subscribers:
+        return
+    connection = transaction.get_connection()
+    if any(entry[1] is _refresh_stats for entry in connection.run_on_commit):
+        return
+    transaction.on_commit(_refresh_stats)
+
+
+def publish_activity(activity):
+    transaction.on_commit(lambda: broadcaster.publish('activity', activity))
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def handle_stats_change(sender, instance, created=False, **kwargs):
+    if sender not in STATS_MODELS:
+        return
+    # Saves that leave a tracked status untouched do not move any stat
+    if (
+        kwargs['signal'] is post_save
+        and not created
+        and hasattr(instance, 'has_changed')
+        and not instance.has_changed('status')
+    ):
+        return
+    schedule_stats_refresh()
+
+
+@receiver(post_save, sender=StructureRequest)
+def handle_request_submitted(sender, instance, created, **kwargs):
+    if created and broadcaster.has_subscribers:
+        publish_activity(request_activity(instance))
+
+
+@receiver(post_save, sender=Structure)
+def handle_structure_created(sender, instance, created, **kwargs):
+    if created and broadcaster.has_subscribers:
+        publish_activity(structure_activity(instance))
+
+
+@receiver(post_save, sender=StructureApproval)
+def handle_structure_approval(sender, instance, created, **kwargs):
+    if created and broadcaster.has_subscribers:
+        publish_activity(approval_activity(instance))
+
+
+@receiver(post_save, sender=Structure)
+def handle_structure_approved(sender, instance, **kwargs):
+    """Approved structures are what the public dashboard shows"""
+    if instance.has_changed('status') and 'APPROVED' in (
+        instance.status, instance.previous('status')
+    ):
+        transaction.on_commit(invalidate_dashboard_cache)
+
+
+@receiver(post_delete, sender=Structure)
+def handle_approved_structure_deleted(sender, instance, **kwargs):
+    if instance.status == 'APPROVED':
+        transaction.on_commit(invalidate_dashboard_cache)
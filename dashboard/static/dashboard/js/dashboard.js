@@ -41,19 +41,58 @@ function setupActionButtons() {
     });
 }
 
+let currentStats = {};
+
 function setupAutoRefresh() {
-    // Auto-refresh stats every 2 minutes
-    setInterval(refreshStats, 120000);
-    
-    // Auto-refresh recent activity every 5 minutes
-    setInterval(refreshRecentActivity, 300000);
+    // Prefer the live event stream; fall back to polling without it
+    if (!setupLiveStream()) {
+        // Auto-refresh stats every 2 minutes
+        setInterval(refreshStats, 120000);
+        
+        // Auto-refresh recent activity every 5 minutes
+        setInterval(refreshRecentActivity, 300000);
+    }
     
     // Add manual refresh button
     addRefreshButton();
 }
 
+function setupLiveStream() {
+    if (!window.EventSource || !document.querySelector('.activity-timeline')) {
+        return false;
+    }
+    
+    const source = new EventSource('/admin/dashboard/stream/');
+    
+    // Server sends a full snapshot on connect, then only changed keys
+    source.addEventListener('stats', event => {
+        updateStatsDisplay(JSON.parse(event.data));
+    });
+    
+    source.addEventListener('activity', event => {
+        prependActivity(JSON.parse(event.data));
+    });
+    
+    return true;
+}
+
+function prependActivity(activity) {
+    const activityTimeline = document.querySelector('.activity-timeline');
+    if (!activityTimeline) return;
+    
+    const emptyState = activityTimeline.querySelector('.empty-state');
+    if (emptyState) emptyState.remove();
+    
+    activityTimeline.insertBefore(createActivityItem(activity), activityTimeline.firstChild);
+    
+    // Keep the same length as the server-rendered list
+    while (activityTimeline.children.length > 15) {
+        activityTimeline.removeChild(activityTimeline.lastChild);
+    }
+}
+
 function refreshStats() {
-    fetch('/admin/dashboard/api/?type=stats')
+    return fetch('/admin/dashboard/api/?type=stats')
         .then(response => response.json())
         .then(data => {
             updateStatsDisplay(data);
@@ -63,7 +102,10 @@ function refreshStats() {
         });
 }
 
-function updateStatsDisplay(stats) {
+function updateStatsDisplay(changes) {
+    // Merge partial updates into the last known stats
+    const stats = Object.assign(currentStats, changes);
+    
     // Update stat cards
     const statCards = document.querySelectorAll('.stat-card');
     
@@ -84,7 +126,7 @@ function updateStatsDisplay(stats) {
 }
 
 function refreshRecentActivity() {
-    fetch('/admin/dashboard/api/?type=recent_activity')
+    return fetch('/admin/dashboard/api/?type=recent_activity')
         .then(response => response.json())
         .then(data => {
             updateActivityDisplay(data.activities);
@@ -0,0 +1,341 @@
+import asyncio
+import json
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.utils import timezone
+
+from corporate.models import Structure
+from sales.models import StructureApproval, StructureRequest
+from . import work_queue
+from .cache import PUBLIC_CONTEXT_KEY, get_or_compute
+from .events import broadcaster
+from .models import StatusChange
+
+
+def _parse_event(chunk):
+    """Return (event, data) from a single SSE message"""
+    lines = dict(
+        line.split(': ', 1) for line in chunk.strip().split('\n') if ': ' in line
+    )
+    return lines.get('event'), json.loads(lines['data'])
+
+
+class DashboardStreamTest(TestCase):
+    def setUp(self):
+        broadcaster.reset()
+        self.staff = User.objects.create_user(
+            username='staff', password='testpass123', is_staff=True
+        )
+
+    def tearDown(self):
+        broadcaster.reset()
+
+    async def _next_event(self, stream):
+        while True:
+            chunk = await asyncio.wait_for(stream.__anext__(), timeout=2)
+            chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+            if chunk.startswith('event:'):
+                return _parse_event(chunk)
+
+    async def test_stream_requires_staff(self):
+        response = await self.async_client.get('/admin/dashboard/stream/')
+        self.assertEqual(response.status_code, 403)
+
+    async def test_stream_sends_snapshot_then_deltas(self):
+        await sync_to_async(self.client.force_login)(self.staff)
+        self.async_client.cookies = self.client.cookies
+
+        response = await self.async_client.get('/admin/dashboard/stream/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content
+
+        event, data = await self._next_event(stream)
+        self.assertEqual(event, 'stats')
+        self.assertEqual(data['total_structures'], 0)
+
+        def create_structure():
+            with self.captureOnCommitCallbacks(execute=True):
+                Structure.objects.create(name='Live LLC', description='Test')
+
+        await sync_to_async(create_structure)()
+
+        events = dict([await self._next_event(stream), await self._next_event(stream)])
+        self.assertEqual(events['stats'], {'total_structures': 1})
+        self.assertEqual(events['activity']['type'], 'structure_created')
+
+    async def test_stream_closes_after_max_lifetime(self):
+        await sync_to_async(self.client.force_login)(self.staff)
+        self.async_client.cookies = self.client.cookies
+
+        with mock.patch('dashboard.views.STREAM_MAX_SECONDS', 0.1):
+            response = await self.async_client.get('/admin/dashboard/stream/')
+            chunks = [chunk async for chunk in response.streaming_content]
+
+        self.assertTrue(any(b'event: stats' in chunk for chunk in chunks))
+        self.assertFalse(broadcaster.has_subscribers)
+
+    async def test_snapshot_is_recomputed_on_connect(self):
+        await sync_to_async(self.client.force_login)(self.staff)
+        self.async_client.cookies = self.client.cookies
+        # Left over from dashboards that saw a different database state
+        broadcaster.update_stats({'total_structures': 5}, publish=False)
+
+        response = await self.async_client.get('/admin/dashboard/stream/')
+        event, data = await self._next_event(response.streaming_content)
+        self.assertEqual(data['total_structures'], 0)
+
+    def test_last_unsubscribe_drops_snapshot(self):
+        async def connect_and_leave():
+            queue = broadcaster.subscribe()
+            broadcaster.update_stats({'total_structures': 1}, publish=False)
+            broadcaster.unsubscribe(queue)
+
+        asyncio.run(connect_and_leave())
+        self.assertIsNone(broadcaster.stats)
+
+    def test_no_stats_queries_without_subscribers(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            Structure.objects.create(name='Quiet LLC', description='Test')
+        self.assertEqual(callbacks, [])
+
+
+class DashboardCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'value'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(get_or_compute('k', compute, 30, 30)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, ['value'] * 5)
+        self.assertEqual(len(calls), 1)
+
+    def test_stale_value_served_while_revalidating(self):
+        get_or_compute('k', lambda: 'old', ttl=0, stale_ttl=30)
+
+        # Another request holds the revalidation lock
+        cache.add('k:lock', True, 10)
+        self.assertEqual(get_or_compute('k', lambda: 'new', ttl=0, stale_ttl=30), 'old')
+
+        cache.delete('k:lock')
+        self.assertEqual(get_or_compute('k', lambda: 'new', ttl=30, stale_ttl=30), 'new')
+
+    def test_public_dashboard_data_cached_until_approval_changes(self):
+        structure = Structure.objects.create(name='Cached LLC', description='Test')
+        self.client.get('/dashboard/')
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/dashboard/')
+        self.assertEqual(response.status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            structure.status = 'APPROVED'
+            structure.save()
+
+        self.assertIsNone(cache.get(PUBLIC_CONTEXT_KEY))
+        self.assertContains(self.client.get('/dashboard/'), 'Cached LLC')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            structure.status = 'DRAFTING'
+            structure.save()
+
+        self.assertIsNone(cache.get(PUBLIC_CONTEXT_KEY))
+        self.assertNotContains(self.client.get('/dashboard/'), 'Cached LLC')
+
+    def test_public_dashboard_page_is_not_shared(self):
+        # Each visitor gets its own CSRF token, so only the data is cached
+        first = Client(enforce_csrf_checks=True).get('/dashboard/')
+        second = Client(enforce_csrf_checks=True).get('/dashboard/')
+
+        self.assertNotEqual(
+            str(first.context['csrf_token']), str(second.context['csrf_token'])
+        )
+
+
+class BulkActionTest(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(
+            username='staff', password='testpass123', is_staff=True
+        )
+        self.client.force_login(self.staff)
+        self.requests = [
+            StructureRequest.objects.create(description=f'Request {i}')
+            for i in range(3)
+        ]
+        self.structure = Structure.objects.create(name='Bulk LLC', description='Test')
+
+    def post_bulk(self, items):
+        return self.client.post(
+            '/admin/dashboard/quick-action/bulk/',
+            data=json.dumps({'items': items}),
+            content_type='application/json',
+        )
+
+    def test_bulk_transitions_with_per_item_results(self):
+        items = [{'action': 'assign_request', 'id': r.pk} for r in self.requests]
+        items += [
+            {'action': 'send_for_approval', 'id': self.structure.pk},
+            {'action': 'complete_request', 'id': self.requests[0].pk},
+            {'action': 'assign_request', 'id': 999999},
+            {'action': 'unknown', 'id': 1},
+        ]
+        response = self.post_bulk(items)
+
+        data = response.json()
+        self.assertEqual(data['applied'], 4)
+        self.assertEqual(data['failed'], 3)
+        self.assertEqual(
+            [r['success'] for r in data['results']],
+            [True, True, True, True, False, False, False]
+        )
+        self.assertEqual(data['results'][4]['error'], 'Duplicate item')
+        self.assertEqual(data['results'][5]['error'], 'Not found')
+
+        self.assertEqual(
+            StructureRequest.objects.filter(status='IN_REVIEW').count(), 3
+        )
+        self.structure.refresh_from_db()
+        self.assertEqual(self.structure.status, 'SENT_FOR_APPROVAL')
+        self.assertEqual(StatusChange.objects.count(), 4)
+
+    def test_invalid_transition_is_rejected(self):
+        response = self.post_bulk([
+            {'action': 'complete_request', 'id': self.requests[0].pk},
+        ])
+        result = response.json()['results'][0]
+        self.assertFalse(result['success'])
+        self.assertIn('from Submitted', result['error'])
+        self.requests[0].refresh_from_db()
+        self.assertEqual(self.requests[0].status, 'SUBMITTED')
+
+    def test_query_count_does_not_grow_with_items(self):
+        more = [
+            StructureRequest.objects.create(description=f'Extra {i}')
+            for i in range(20)
+        ]
+        items = [{'action': 'assign_request', 'id': r.pk} for r in more]
+        # session + user, savepoint pair, lock, update, history
+        with self.assertNumQueries(7):
+            self.post_bulk(items)
+
+    def test_single_quick_action_uses_transitions(self):
+        self.client.post('/admin/dashboard/quick-action/', {
+            'action': 'assign_request', 'object_id': self.requests[0].pk,
+        })
+        self.requests[0].refresh_from_db()
+        self.assertEqual(self.requests[0].status, 'IN_REVIEW')
+        self.assertTrue(StatusChange.objects.filter(action='assign_request').exists())
+
+
+class WorkQueueTest(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', is_staff=True)
+        self.bob = User.objects.create_user(username='bob', is_staff=True)
+        self.structures = [
+            Structure.objects.create(
+                name=f'Queue {i}', description='Test', status='SENT_FOR_APPROVAL'
+            )
+            for i in range(4)
+        ]
+
+    def test_claims_do_not_overlap(self):
+        first = work_queue.claim_next('approvals', self.alice, 3)
+        second = work_queue.claim_next('approvals', self.bob, 3)
+
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(second), 1)
+        self.assertFalse({s.pk for s in first} & {s.pk for s in second})
+        self.assertEqual(work_queue.claim_next('approvals', self.bob, 3), [])
+
+    def test_expired_claims_return_to_queue(self):
+        claimed = work_queue.claim_next('approvals', self.alice, 4)
+        Structure.objects.filter(pk=claimed[0].pk).update(
+            claim_expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+        self.assertEqual(work_queue.heartbeat('approvals', self.alice, [claimed[0].pk]), [])
+        reclaimed = work_queue.claim_next('approvals', self.bob, 4)
+        self.assertEqual([s.pk for s in reclaimed], [claimed[0].pk])
+
+    def test_heartbeat_and_release(self):
+        claimed = work_queue.claim_next('requests', self.alice, 1)
+        self.assertEqual(claimed, [])
+
+        ids = [s.pk for s in work_queue.claim_next('approvals', self.alice, 2)]
+        self.assertCountEqual(work_queue.heartbeat('approvals', self.alice, ids), ids)
+        self.assertEqual(work_queue.heartbeat('approvals', self.bob, ids), [])
+        self.assertEqual(work_queue.release('approvals', self.alice, ids), 2)
+        self.assertEqual(len(work_queue.claim_next('approvals', self.bob, 4)), 4)
+
+    def test_approval_requires_claim(self):
+        structure = self.structures[0]
+        with self.assertRaises(work_queue.ClaimError):
+            work_queue.record_approval(structure.pk, self.alice, 'APPROVED')
+
+        work_queue.claim_next('approvals', self.alice, 1)
+        with self.assertRaises(work_queue.ClaimError):
+            work_queue.record_approval(structure.pk, self.bob, 'APPROVED')
+
+        approval = work_queue.record_approval(structure.pk, self.alice, 'APPROVED')
+        structure.refresh_from_db()
+        self.assertEqual(approval.processed_by, self.alice)
+        self.assertEqual(structure.status, 'APPROVED')
+        self.assertIsNone(structure.claimed_by)
+
+    def test_claim_endpoint(self):
+        self.client.force_login(self.alice)
+        response = self.client.post(
+            '/admin/dashboard/queue/approvals/claim/',
+            data=json.dumps({'limit': 2}),
+            content_type='application/json',
+        )
+        self.assertEqual(len(response.json()['items']), 2)
+
+    def test_decision_endpoint_rejects_invalid_fields(self):
+        structure = self.structures[0]
+        work_queue.claim_next('approvals', self.alice, 1)
+        self.client.force_login(self.alice)
+        url = f'/admin/dashboard/approvals/{structure.pk}/decide/'
+
+        for fields in ({'final_price': 'abc'}, {'approver_id': 999999}):
+            response = self.client.post(
+                url,
+                data=json.dumps({'action': 'APPROVED_WITH_PRICE_CHANGE', **fields}),
+                content_type='application/json',
+            )
+            self.assertEqual(response.status_code, 400)
+        structure.refresh_from_db()
+        self.assertEqual(structure.status, 'SENT_FOR_APPROVAL')
+
+        response = self.client.post(
+            url,
+            data=json.dumps({'action': 'APPROVED_WITH_PRICE_CHANGE', 'final_price': '1500.00'}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(StructureApproval.objects.get(structure=structure).final_price, Decimal('1500.00'))
@@ -0,0 +1,130 @@
+"""
+Dashboard status transitions
+
+Applies many quick actions at once: rows are locked and validated per model,
+then moved with one UPDATE per action inside a single transaction. Status
+history and activity events are written in bulk.
+"""
+
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils import timezone
+
+from corporate.models import Structure
+from sales.models import StructureRequest
+from .events import broadcaster, status_change_activity
+from .models import StatusChange
+from .signals import schedule_stats_refresh
+
+# action -> (model, allowed current statuses, new status)
+TRANSITIONS = {
+    'assign_request': (StructureRequest, ['SUBMITTED'], 'IN_REVIEW'),
+    'start_progress': (StructureRequest, ['SUBMITTED', 'IN_REVIEW'], 'IN_PROGRESS'),
+    'complete_request': (StructureRequest, ['IN_REVIEW', 'IN_PROGRESS'], 'COMPLETED'),
+    'send_for_approval': (Structure, ['DRAFTING'], 'SENT_FOR_APPROVAL'),
+}
+
+MAX_BULK_ITEMS = 500
+
+
+def _object_repr(obj):
+    if isinstance(obj, StructureRequest):
+        return f"Structure Request #{obj.pk}"
+    return str(obj.name)
+
+
+def _parse_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _publish_activities(activities):
+    for activity in activities:
+        broadcaster.publish('activity', activity)
+
+
+def apply_transitions(items, user=None):
+    """
+    Apply a list of (action, object_id) pairs.
+
+    Returns one result dict per item, in input order. Invalid items are
+    reported individually and do not prevent the valid ones from applying.
+    """
+    results = [
+        {'action': action, 'id': object_id, 'success': False}
+        for action, object_id in items
+    ]
+
+    # Group valid requests by model so each model is locked in one query
+    requested = defaultdict(dict)
+    for result in results:
+        object_id = _parse_id(result['id'])
+        if result['action'] not in TRANSITIONS:
+            result['error'] = 'Unknown action'
+        elif object_id is None:
+            result['error'] = 'Invalid id'
+        else:
+            model = TRANSITIONS[result['action']][0]
+            if object_id in requested[model]:
+                result['error'] = 'Duplicate item'
+            else:
+                result['id'] = object_id
+                requested[model][object_id] = result
+
+    changes = []
+    now = timezone.now()
+
+    with transaction.atomic():
+        for model, by_id in requested.items():
+            objects = model.objects.select_for_update().in_bulk(list(by_id))
+            content_type = ContentType.objects.get_for_model(model)
+            to_update = defaultdict(list)
+
+            for object_id, result in by_id.items():
+                obj = objects.get(object_id)
+                _, allowed, new_status = TRANSITIONS[result['action']]
+                if obj is None:
+                    result['error'] = 'Not found'
+                    continue
+                if obj.status not in allowed:
+                    result['error'] = (
+                        f"Cannot {result['action'].replace('_', ' ')} "
+                        f"from {obj.get_status_display()}"
+                    )
+                    continue
+
+                to_update[new_status].append(object_id)
+                result.update(
+                    success=True,
+                    object=_object_repr(obj),
+                    from_status=obj.status,
+                    to_status=new_status,
+                )
+                changes.append(StatusChange(
+                    content_type=content_type,
+                    object_id=object_id,
+                    object_repr=result['object'],
+                    action=result['action'],
+                    from_status=obj.status,
+                    to_status=new_status,
+                    changed_by=user,
+                ))
+
+            for new_status, ids in to_update.items():
+                model.objects.filter(pk__in=ids).update(
+                    status=new_status, updated_at=now
+                )
+
+        StatusChange.objects.bulk_create(changes)
+
+        if changes:
+            # update() bypasses post_save, so notify live dashboards here
+            schedule_stats_refresh()
+            activities = [status_change_activity(change) for change in changes]
+            transaction.on_commit(lambda: _publish_activities(activities))
+
+    return results
@@ -6,6 +6,15 @@ app_name = 'dashboard'
 urlpatterns = [
     path('', views.DashboardView.as_view(), name='main'),
     path('quick-action/', views.quick_action_view, name='quick_action'),
+    path('quick-action/bulk/', views.bulk_action_view, name='bulk_action'),
     path('api/', views.dashboard_api_view, name='api'),
+    path(
+        'queue/<str:queue>/<str:operation>/', views.work_queue_view,
+        name='work_queue'
+    ),
+    path(
+        'approvals/<int:structure_id>/decide/', views.approval_decision_view,
+        name='approval_decision'
+    ),
+    path('stream/', views.dashboard_stream_view, name='stream'),
 ]
-
@@ -1,17 +1,53 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.db.models import Count, Q
-from django.http import JsonResponse
-from django.shortcuts import render, get_object_or_404, redirect
+from django.core.exceptions import ValidationError
+from django.db.models import Count
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import redirect
 from django.utils.decorators import method_decorator
+from django.views.decorators.http import require_POST
 from django.views.generic import TemplateView
 from django.contrib import messages
 from django.utils import timezone
 from datetime import timedelta
 
 from sales.models import StructureRequest, StructureApproval
-from corporate.models import Structure, Entity, EntityOwnership
+from corporate.models import Structure, Entity
 from parties.models import Party
+from corporate_relationship.digests import get_digest
+from .cache import (
+    PUBLIC_CONTEXT_KEY, api_cache_key, get_or_compute
+)
+from .events import (
+    approval_activity, broadcaster, format_sse, request_activity,
+    status_change_activity, structure_activity
+)
+from .models import StatusChange
+from . import work_queue
+from .transitions import MAX_BULK_ITEMS, apply_transitions
+
+# Seconds between keep-alive comments on idle dashboard streams
+STREAM_KEEPALIVE_SECONDS = 15
+# Streams are closed after this long and EventSource reconnects, so a client
+# that disconnected silently does not keep its subscription forever
+STREAM_MAX_SECONDS = 300
+
+# StructureApproval fields accepted by the approval decision endpoint
+APPROVAL_FIELDS = [
+    'approver_id', 'final_price', 'correction_comment', 'rejector_id',
+    'rejection_reason',
+]
+
+QUICK_ACTION_MESSAGES = {
+    'assign_request': 'Request #{id} assigned for review.',
+    'start_progress': 'Request #{id} marked as in progress.',
+    'send_for_approval': 'Structure "{object}" sent for approval.',
+    'complete_request': 'Request #{id} marked as completed.',
+}
 
 
 @method_decorator([login_required, staff_member_required], name='dispatch')
@@ -20,30 +56,33 @@ class DashboardView(TemplateView):
     Main dashboard view with overview of all structure requests and approvals
     """
     template_name = 'admin/dashboard/dashboard.html'
-    
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        
+
         # Quick statistics
         context['stats'] = self.get_quick_stats()
-        
+
         # Pending requests (Sales → Corporate)
         context['pending_requests'] = self.get_pending_requests()
-        
+
         # Structures in progress (Corporate working)
         context['structures_in_progress'] = self.get_structures_in_progress()
-        
+
         # Pending approvals (Corporate → Sales)
         context['pending_approvals'] = self.get_pending_approvals()
-        
+
         # Recent activity
         context['recent_activity'] = self.get_recent_activity()
-        
+
         # Performance metrics
         context['performance_metrics'] = self.get_performance_metrics()
-        
+
+        # Service activities overdue / due soon (scan_service_activities)
+        context['activity_digest'] = get_digest()
+
         return context
-    
+
     def get_quick_stats(self):
         """Get quick statistics for dashboard cards"""
         return {
@@ -59,7 +98,7 @@ class DashboardView(TemplateView):
             'total_entities': Entity.objects.filter(active=True).count(),
             'total_parties': Party.objects.count(),
         }
-    
+
     def get_pending_requests(self):
         """Get pending structure requests from Sales"""
         return StructureRequest.objects.filter(
@@ -70,7 +109,7 @@ class DashboardView(TemplateView):
         ).prefetch_related(
             'requesting_parties'
         ).order_by('-submitted_at')[:10]
-    
+
     def get_structures_in_progress(self):
         """Get structures currently being developed by Corporate"""
         return Structure.objects.filter(
@@ -82,7 +121,7 @@ class DashboardView(TemplateView):
         ).annotate(
             entities_count=Count('entity_ownerships')
         ).order_by('-created_at')[:10]
-    
+
     def get_pending_approvals(self):
         """Get structures waiting for Sales approval"""
         return Structure.objects.filter(
@@ -92,69 +131,53 @@ class DashboardView(TemplateView):
         ).annotate(
             entities_count=Count('entity_ownerships')
         ).order_by('-updated_at')[:10]
-    
+
     def get_recent_activity(self):
         """Get recent activity across the system"""
         activities = []
-        
+
         # Recent requests
         recent_requests = StructureRequest.objects.filter(
             submitted_at__gte=timezone.now() - timedelta(days=7)
         ).order_by('-submitted_at')[:5]
-        
+
         for request in recent_requests:
-            activities.append({
-                'type': 'request_submitted',
-                'title': f'New structure request #{request.pk}',
-                'description': request.description[:100] + '...' if len(request.description) > 100 else request.description,
-                'timestamp': request.submitted_at,
-                'url': f'/admin/sales/structurerequest/{request.pk}/change/',
-                'icon': 'fas fa-plus-circle',
-                'color': 'primary'
-            })
-        
+            activities.append(request_activity(request))
+
         # Recent structures
         recent_structures = Structure.objects.filter(
             created_at__gte=timezone.now() - timedelta(days=7)
         ).order_by('-created_at')[:5]
-        
+
         for structure in recent_structures:
-            activities.append({
-                'type': 'structure_created',
-                'title': f'Structure created: {structure.name}',
-                'description': structure.description[:100] + '...' if len(structure.description) > 100 else structure.description,
-                'timestamp': structure.created_at,
-                'url': f'/admin/corporate/structure/{structure.pk}/change/',
-                'icon': 'fas fa-sitemap',
-                'color': 'success'
-            })
-        
+            activities.append(structure_activity(structure))
+
         # Recent approvals
         recent_approvals = StructureApproval.objects.filter(
             action_date__gte=timezone.now() - timedelta(days=7)
         ).select_related('structure').order_by('-action_date')[:5]
-        
+
         for approval in recent_approvals:
-            activities.append({
-                'type': 'structure_approved',
-                'title': f'Structure {approval.get_action_display().lower()}: {approval.structure.name}',
-                'description': f'Action: {approval.get_action_display()}',
-                'timestamp': approval.action_date,
-                'url': f'/admin/sales/structureapproval/{approval.pk}/change/',
-                'icon': 'fas fa-check-circle',
-                'color': 'info'
-            })
-        
+            activities.append(approval_activity(approval))
+
+        # Recent status changes from dashboard actions
+        recent_changes = StatusChange.objects.filter(
+            changed_at__gte=timezone.now() - timedelta(days=7)
+        ).order_by('-changed_at')[:5]
+
+        for change in recent_changes:
+            activities.append(status_change_activity(change))
+
         # Sort all activities by timestamp
         activities.sort(key=lambda x: x['timestamp'], reverse=True)
-        
+
         return activities[:15]
-    
+
     def get_performance_metrics(self):
         """Get performance metrics for the dashboard"""
         now = timezone.now()
         last_30_days = now - timedelta(days=30)
-        
+
         # Completion rate
         total_requests = StructureRequest.objects.filter(submitted_at__gte=last_30_days).count()
         completed_requests = StructureRequest.objects.filter(
@@ -162,35 +185,35 @@ class DashboardView(TemplateView):
             updated_at__gte=last_30_days
         ).count()
         completion_rate = (completed_requests / total_requests * 100) if total_requests > 0 else 0
-        
+
         # Average processing time
         completed_with_times = StructureRequest.objects.filter(
             status='COMPLETED',
             updated_at__gte=last_30_days
         )
-        
+
         total_processing_time = 0
         count = 0
         for request in completed_with_times:
             processing_time = (request.updated_at - request.submitted_at).days
             total_processing_time += processing_time
             count += 1
-        
+
         avg_processing_time = total_processing_time / count if count > 0 else 0
-        
+
         # Approval rate
         total_sent_for_approval = Structure.objects.filter(
             updated_at__gte=last_30_days,
             status__in=['SENT_FOR_APPROVAL', 'APPROVED']
         ).count()
-        
+
         approved_structures = StructureApproval.objects.filter(
             action_date__gte=last_30_days,
             action__in=['APPROVED', 'APPROVED_WITH_PRICE_CHANGE']
         ).count()
-        
+
         approval_rate = (approved_structures / total_sent_for_approval * 100) if total_sent_for_approval > 0 else 0
-        
+
         return {
             'completion_rate': round(completion_rate, 1),
             'avg_processing_time': round(avg_processing_time, 1),
@@ -208,32 +231,131 @@ def quick_action_view(request):
     if request.method == 'POST':
         action = request.POST.get('action')
         object_id = request.POST.get('object_id')
-        
-        if action == 'assign_request':
-            request_obj = get_object_or_404(StructureRequest, pk=object_id)
-            request_obj.status = 'IN_REVIEW'
-            request_obj.save()
-            messages.success(request, f'Request #{request_obj.pk} assigned for review.')
-            
-        elif action == 'start_progress':
-            request_obj = get_object_or_404(StructureRequest, pk=object_id)
-            request_obj.status = 'IN_PROGRESS'
-            request_obj.save()
-            messages.success(request, f'Request #{request_obj.pk} marked as in progress.')
-            
-        elif action == 'send_for_approval':
-            structure = get_object_or_404(Structure, pk=object_id)
-            structure.status = 'SENT_FOR_APPROVAL'
-            structure.save()
-            messages.success(request, f'Structure "{structure.name}" sent for approval.')
-            
-        elif action == 'complete_request':
-            request_obj = get_object_or_404(StructureRequest, pk=object_id)
-            request_obj.status = 'COMPLETED'
-            request_obj.save()
-            messages.success(request, f'Request #{request_obj.pk} marked as completed.')
-    
-    return redirect('admin:dashboard')
+
+        result = apply_transitions([(action, object_id)], user=request.user)[0]
+        if result['success']:
+            messages.success(request, QUICK_ACTION_MESSAGES[action].format(**result))
+        else:
+            messages.error(request, f'Could not apply action: {result["error"]}.')
+
+    return redirect('dashboard:main')
+
+
+@login_required
+@staff_member_required
+@require_POST
+def bulk_action_view(request):
+    """
+    Apply many quick actions in one request.
+    Expects JSON ``{"items": [{"action": ..., "id": ...}, ...]}`` and
+    returns per-item results.
+    """
+    try:
+        items = json.loads(request.body)['items']
+        pairs = [(item['action'], item['id']) for item in items]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Invalid request'}, status=400)
+
+    if len(pairs) > MAX_BULK_ITEMS:
+        return JsonResponse(
+            {'error': f'At most {MAX_BULK_ITEMS} items per request'}, status=400
+        )
+
+    results = apply_transitions(pairs, user=request.user)
+    return JsonResponse({
+        'applied': sum(1 for result in results if result['success']),
+        'failed': sum(1 for result in results if not result['success']),
+        'results': results,
+    })
+
+
+def _queue_item(obj):
+    item = {
+        'id': obj.pk,
+        'status': obj.status,
+        'claim_expires_at': obj.claim_expires_at,
+    }
+    if isinstance(obj, Structure):
+        item.update(name=obj.name, url=f'/admin/corporate/structure/{obj.pk}/change/')
+    else:
+        item.update(
+            description=obj.description[:100],
+            url=f'/admin/sales/structurerequest/{obj.pk}/change/'
+        )
+    return item
+
+
+@login_required
+@staff_member_required
+@require_POST
+def work_queue_view(request, queue, operation):
+    """
+    Review work queue: ``claim`` the next items (``{"limit": N}``), send a
+    ``heartbeat`` or ``release`` claimed ids (``{"ids": [...]}``).
+    """
+    if operation not in ('claim', 'heartbeat', 'release'):
+        return JsonResponse({'error': 'Unknown operation'}, status=404)
+    try:
+        data = json.loads(request.body or '{}')
+        work_queue.get_queue(queue)
+    except (ValueError, KeyError):
+        return JsonResponse({'error': 'Invalid request'}, status=400)
+
+    if operation == 'claim':
+        try:
+            limit = int(data.get('limit', 1))
+        except (TypeError, ValueError):
+            return JsonResponse({'error': 'Invalid limit'}, status=400)
+        items = work_queue.claim_next(queue, request.user, limit)
+        return JsonResponse({'items': [_queue_item(obj) for obj in items]})
+
+    ids = data.get('ids')
+    if not isinstance(ids, list):
+        return JsonResponse({'error': 'ids must be a list'}, status=400)
+
+    if operation == 'heartbeat':
+        renewed = work_queue.heartbeat(queue, request.user, ids)
+        return JsonResponse({
+            'renewed': renewed,
+            'lost': [pk for pk in ids if pk not in renewed],
+        })
+
+    released = work_queue.release(queue, request.user, ids)
+    return JsonResponse({'released': released})
+
+
+@login_required
+@staff_member_required
+@require_POST
+def approval_decision_view(request, structure_id):
+    """Record the approval decision for a structure claimed from the queue"""
+    try:
+        data = json.loads(request.body)
+        action = data.pop('action')
+    except (ValueError, KeyError, AttributeError):
+        return JsonResponse({'error': 'Invalid request'}, status=400)
+
+    fields = {
+        key: data[key] for key in APPROVAL_FIELDS if key in data
+    }
+    try:
+        approval = work_queue.record_approval(
+            structure_id, request.user, action, **fields
+        )
+    except Structure.DoesNotExist:
+        return JsonResponse({'error': 'Not found'}, status=404)
+    except work_queue.ClaimError as e:
+        return JsonResponse({'error': str(e)}, status=409)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except ValidationError as e:
+        return JsonResponse({'error': e.messages}, status=400)
+
+    return JsonResponse({
+        'approval_id': approval.pk,
+        'action': approval.action,
+        'structure_status': approval.structure.status,
+    })
 
 
 @login_required
@@ -242,67 +364,117 @@ def dashboard_api_view(request):
     """API endpoint for dashboard data updates"""
     if request.method == 'GET':
         data_type = request.GET.get('type')
-        
+        dashboard_view = DashboardView()
+
         if data_type == 'stats':
-            dashboard_view = DashboardView()
-            stats = dashboard_view.get_quick_stats()
+            stats = get_or_compute(
+                api_cache_key(data_type), dashboard_view.get_quick_stats
+            )
             return JsonResponse(stats)
-            
+
         elif data_type == 'recent_activity':
-            dashboard_view = DashboardView()
-            activities = dashboard_view.get_recent_activity()
+            activities = get_or_compute(
+                api_cache_key(data_type), dashboard_view.get_recent_activity
+            )
             return JsonResponse({'activities': activities})
-            
+
         elif data_type == 'performance':
-            dashboard_view = DashboardView()
-            metrics = dashboard_view.get_performance_metrics()
+            metrics = get_or_compute(
+                api_cache_key(data_type), dashboard_view.get_performance_metrics
+            )
             return JsonResponse(metrics)
-    
+
     return JsonResponse({'error': 'Invalid request'}, status=400)
 
 
+def _is_staff_user(request):
+    return request.user.is_authenticated and request.user.is_staff
+
+
+async def _dashboard_event_stream():
+    """Yield the current stats, then every broadcast event until disconnect"""
+    queue = broadcaster.subscribe()
+    try:
+        # Sempre um snapshot novo: mudanças salvas por outros workers (ou sem
+        # dashboards conectados) não passam por este broadcaster
+        stats = await sync_to_async(DashboardView().get_quick_stats)()
+        broadcaster.update_stats(stats, publish=False)
+
+        yield f'retry: {STREAM_KEEPALIVE_SECONDS * 1000}\n\n'
+        yield format_sse('stats', stats)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + STREAM_MAX_SECONDS
+        while loop.time() < deadline:
+            timeout = min(STREAM_KEEPALIVE_SECONDS, deadline - loop.time())
+            try:
+                yield await asyncio.wait_for(queue.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+    finally:
+        broadcaster.unsubscribe(queue)
+
+
+async def dashboard_stream_view(request):
+    """
+    Server-Sent Events stream replacing dashboard polling.
+    Sends a full stats snapshot on connect, then stat deltas and new
+    activity entries as they are published by model signals.
+    """
+    if not await sync_to_async(_is_staff_user)(request):
+        return JsonResponse({'error': 'Authentication required'}, status=403)
+
+    response = StreamingHttpResponse(
+        _dashboard_event_stream(), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 class PublicDashboardView(TemplateView):
     """
     Public dashboard view that doesn't require authentication
     Shows basic system statistics
     """
     template_name = 'admin/dashboard/dashboard.html'
-    
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        
-        # Basic public statistics
-        context['stats'] = {
-            'pending_requests': 0,  # Hide sensitive data for public view
-            'in_progress': Structure.objects.filter(status='DRAFTING').count(),
-            'pending_approvals': 0,  # Hide sensitive data for public view
-            'completed': Structure.objects.filter(status='APPROVED').count(),
-        }
-        
-        # Public structures (approved ones only)
-        context['structures_in_progress'] = Structure.objects.filter(
-            status__in=['APPROVED']
-        ).order_by('-created_at')[:5]
-        
-        # Empty for public view (no sensitive data)
-        context['pending_requests'] = []
-        context['pending_approvals'] = []
-        context['recent_activity'] = []
-        context['performance_metrics'] = self.get_public_performance_metrics()
-        
+        context.update(get_or_compute(PUBLIC_CONTEXT_KEY, self.get_public_data))
         return context
-    
+
+    def get_public_data(self):
+        """Get the public dashboard data (cached as one fragment)"""
+        return {
+            # Basic public statistics
+            'stats': {
+                'pending_requests': 0,  # Hide sensitive data for public view
+                'in_progress': Structure.objects.filter(status='DRAFTING').count(),
+                'pending_approvals': 0,  # Hide sensitive data for public view
+                'completed': Structure.objects.filter(status='APPROVED').count(),
+            },
+            # Public structures (approved ones only)
+            'structures_in_progress': list(Structure.objects.filter(
+                status__in=['APPROVED']
+            ).order_by('-created_at')[:5]),
+            # Empty for public view (no sensitive data)
+            'pending_requests': [],
+            'pending_approvals': [],
+            'recent_activity': [],
+            'performance_metrics': self.get_public_performance_metrics(),
+        }
+
     def get_public_performance_metrics(self):
         """Get basic performance metrics for public view"""
         total_structures = Structure.objects.count()
         approved_structures = Structure.objects.filter(status='APPROVED').count()
-        
+
         approval_rate = (approved_structures / total_structures * 100) if total_structures > 0 else 0
-        
+
         return {
             'total_structures': total_structures,
             'approved_structures': approved_structures,
             'approval_rate': approval_rate,
             'entities_managed': Entity.objects.count(),
         }
-
@@ -0,0 +1,138 @@
+"""
+Review work queues
+
+Staff claim the next N pending StructureRequests or Structures awaiting
+approval. Claims are leases: a reviewer keeps them alive with heartbeats and
+anything whose lease expired is free to be claimed again. Concurrent
+reviewers never receive the same rows (see corporate.claims).
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from corporate.claims import claim_rows
+from corporate.models import Structure
+from sales.models import StructureApproval, StructureRequest
+
+# queue name -> (model, statuses in queue, ordering)
+QUEUES = {
+    'requests': (StructureRequest, ['SUBMITTED', 'IN_REVIEW'], ['submitted_at', 'pk']),
+    'approvals': (Structure, ['SENT_FOR_APPROVAL'], ['updated_at', 'pk']),
+}
+
+# Structure status after each approval action
+APPROVAL_STATUS = {
+    'APPROVED': 'APPROVED',
+    'APPROVED_WITH_PRICE_CHANGE': 'APPROVED',
+    'NEED_CORRECTION': 'DRAFTING',
+    'REJECTED': 'DRAFTING',
+}
+
+MAX_CLAIM = 50
+
+
+class ClaimError(Exception):
+    """Raised when an item is not claimed by the acting user"""
+
+
+def _lease_expiry(now):
+    return now + timedelta(seconds=settings.WORK_QUEUE_LEASE_SECONDS)
+
+
+def _available(now):
+    return Q(claimed_by__isnull=True) | Q(claim_expires_at__lt=now)
+
+
+def get_queue(name):
+    if name not in QUEUES:
+        raise KeyError(name)
+    return QUEUES[name]
+
+
+def claim_next(name, user, limit=1):
+    """Claim up to ``limit`` available items and return them"""
+    model, statuses, ordering = get_queue(name)
+    limit = max(1, min(int(limit), MAX_CLAIM))
+    now = timezone.now()
+    expires = _lease_expiry(now)
+    pending = model.objects.filter(status__in=statuses).filter(_available(now))
+
+    claimed = claim_rows(pending, ordering, limit, claimed_by=user, claim_expires_at=expires)
+    return list(model.objects.filter(pk__in=claimed).order_by(*ordering))
+
+
+def heartbeat(name, user, ids):
+    """Extend the lease of the user's live claims; returns the renewed ids"""
+    model, _, _ = get_queue(name)
+    now = timezone.now()
+    claims = model.objects.filter(
+        pk__in=ids, claimed_by=user, claim_expires_at__gte=now
+    )
+    renewed = list(claims.values_list('pk', flat=True))
+    model.objects.filter(pk__in=renewed).update(claim_expires_at=_lease_expiry(now))
+    return renewed
+
+
+def release(name, user, ids):
+    """Give claimed items back to the queue; returns how many were released"""
+    model, _, _ = get_queue(name)
+    return model.objects.filter(pk__in=ids, claimed_by=user).update(
+        claimed_by=None, claim_expires_at=None
+    )
+
+
+def clean_approval_fields(fields):
+    """
+    ``fields`` converted and validated by the StructureApproval fields they
+    set (prices, existing parties); raises ValidationError
+    """
+    cleaned = {}
+    errors = {}
+    for name, value in fields.items():
+        try:
+            cleaned[name] = StructureApproval._meta.get_field(name).clean(value, None)
+        except ValidationError as e:
+            errors[name] = e.messages
+    if errors:
+        raise ValidationError(errors)
+    return cleaned
+
+
+def record_approval(structure_id, user, action, **fields):
+    """
+    Record the approval decision for a claimed structure.
+
+    The structure row is locked so two reviewers cannot both decide on it,
+    and the claim is released as the structure leaves the approval queue.
+    """
+    if action not in APPROVAL_STATUS:
+        raise ValueError(f"Unknown approval action: {action}")
+    fields = clean_approval_fields(fields)
+
+    with transaction.atomic():
+        structure = Structure.objects.select_for_update().get(pk=structure_id)
+        if (
+            structure.claimed_by_id != user.pk
+            or structure.claim_expires_at is None
+            or structure.claim_expires_at < timezone.now()
+        ):
+            raise ClaimError("Structure is not claimed by this user")
+        if structure.status != 'SENT_FOR_APPROVAL':
+            raise ClaimError("Structure is not awaiting approval")
+
+        approval, _ = StructureApproval.objects.update_or_create(
+            structure=structure,
+            defaults={'action': action, 'processed_by': user, **fields},
+        )
+
+        structure.status = APPROVAL_STATUS[action]
+        structure.claimed_by = None
+        structure.claim_expires_at = None
+        structure.save()
+
+    return approval
@@ -1,25 +1,62 @@
-from django.contrib import admin
-from .models import EntityPrice, IncorporationCost, ServicePrice, ServiceCost
+from django.contrib import admin, messages
+from django.core.exceptions import ValidationError
+from .models import (
+    EntityPrice, ExchangeRate, IncorporationCost, Invoice, InvoiceLine, ServicePrice, ServiceCost
+)
+
+
+class PriceTotalsMixin:
+    """Totals come from PriceQuerySet.with_totals(), one query for the whole list"""
+
+    price_related = None
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_totals().select_related(self.price_related)
+
+    @admin.display(description='Base Cost', ordering='base_cost')
+    def base_cost_display(self, obj):
+        return f"{obj.base_cost:,.2f} {obj.base_currency}"
+
+    @admin.display(description='Total Cost', ordering='total_cost')
+    def total_cost_display(self, obj):
+        return f"{obj.total_cost:,.2f} {obj.base_currency}"
+
+    @admin.action(description='Start a new price version from today')
+    def revise_prices(self, request, queryset):
+        revised = 0
+        for price in queryset.current():
+            try:
+                price.revise()
+            except ValidationError as e:
+                self.message_user(request, f"{price}: {e.messages[0]}", messages.WARNING)
+            else:
+                revised += 1
+        self.message_user(request, f"{revised} new price versions created")
 
 
 class IncorporationCostInline(admin.TabularInline):
     model = IncorporationCost
     extra = 1
-    fields = ['name', 'cost_type', 'value']
+    fields = ['name', 'cost_type', 'value', 'valid_from', 'valid_to']
 
 
 class ServiceCostInline(admin.TabularInline):
     model = ServiceCost
     extra = 1
-    fields = ['name', 'cost_type', 'value']
+    fields = ['name', 'cost_type', 'value', 'valid_from', 'valid_to']
 
 
 @admin.register(EntityPrice)
-class EntityPriceAdmin(admin.ModelAdmin):
-    list_display = ['entity', 'base_currency', 'markup_type', 'markup_value', 'created_at']
-    list_filter = ['base_currency', 'markup_type', 'created_at']
+class EntityPriceAdmin(PriceTotalsMixin, admin.ModelAdmin):
+    price_related = 'entity'
+    list_display = [
+        'entity', 'base_currency', 'markup_type', 'markup_value',
+        'base_cost_display', 'total_cost_display', 'valid_from', 'valid_to',
+    ]
+    list_filter = ['base_currency', 'markup_type', 'valid_from', 'valid_to']
     search_fields = ['entity__name']
     inlines = [IncorporationCostInline]
+    actions = ['revise_prices']
     
     fieldsets = (
         ('Entity Information', {
@@ -28,6 +65,9 @@ class EntityPriceAdmin(admin.ModelAdmin):
         ('Pricing Configuration', {
             'fields': ('base_currency', 'markup_type', 'markup_value')
         }),
+        ('Validity', {
+            'fields': ('valid_from', 'valid_to')
+        }),
         ('Metadata', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
@@ -46,6 +86,9 @@ class IncorporationCostAdmin(admin.ModelAdmin):
         ('Cost Information', {
             'fields': ('entity_price', 'name', 'cost_type', 'value')
         }),
+        ('Validity', {
+            'fields': ('valid_from', 'valid_to')
+        }),
         ('Metadata', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
@@ -55,11 +98,16 @@ class IncorporationCostAdmin(admin.ModelAdmin):
 
 
 @admin.register(ServicePrice)
-class ServicePriceAdmin(admin.ModelAdmin):
-    list_display = ['service', 'base_currency', 'markup_type', 'markup_value', 'created_at']
-    list_filter = ['base_currency', 'markup_type', 'created_at']
+class ServicePriceAdmin(PriceTotalsMixin, admin.ModelAdmin):
+    price_related = 'service'
+    list_display = [
+        'service', 'base_currency', 'markup_type', 'markup_value',
+        'base_cost_display', 'total_cost_display', 'valid_from', 'valid_to',
+    ]
+    list_filter = ['base_currency', 'markup_type', 'valid_from', 'valid_to']
     search_fields = ['service__name']
     inlines = [ServiceCostInline]
+    actions = ['revise_prices']
     
     fieldsets = (
         ('Service Information', {
@@ -68,6 +116,9 @@ class ServicePriceAdmin(admin.ModelAdmin):
         ('Pricing Configuration', {
             'fields': ('base_currency', 'markup_type', 'markup_value')
         }),
+        ('Validity', {
+            'fields': ('valid_from', 'valid_to')
+        }),
         ('Metadata', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
@@ -86,6 +137,9 @@ class ServiceCostAdmin(admin.ModelAdmin):
         ('Cost Information', {
             'fields': ('service_price', 'name', 'cost_type', 'value')
         }),
+        ('Validity', {
+            'fields': ('valid_from', 'valid_to')
+        }),
         ('Metadata', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
@@ -93,3 +147,45 @@ class ServiceCostAdmin(admin.ModelAdmin):
     )
     readonly_fields = ['created_at', 'updated_at']
 
+
+@admin.register(ExchangeRate)
+class ExchangeRateAdmin(admin.ModelAdmin):
+    list_display = ['currency', 'date', 'rate', 'source', 'updated_at']
+    list_filter = ['currency', 'source']
+    search_fields = ['currency', 'source']
+    date_hierarchy = 'date'
+    readonly_fields = ['created_at', 'updated_at']
+
+
+class InvoiceLineInline(admin.TabularInline):
+    model = InvoiceLine
+    extra = 0
+    fields = ['description', 'service_price', 'base_cost', 'markup_type', 'markup_value', 'amount']
+    raw_id_fields = ['service_price']
+
+
+@admin.register(Invoice)
+class InvoiceAdmin(admin.ModelAdmin):
+    list_display = [
+        'relationship_structure', 'client', 'period_start', 'currency', 'total', 'status',
+    ]
+    list_filter = ['status', 'currency', 'period_start']
+    search_fields = ['client__company_name', 'relationship_structure__structure__name']
+    list_select_related = ['client', 'relationship_structure__structure', 'relationship_structure__client']
+    raw_id_fields = ['client', 'relationship_structure']
+    date_hierarchy = 'period_start'
+    inlines = [InvoiceLineInline]
+
+    fieldsets = (
+        ('Invoice Information', {
+            'fields': ('client', 'relationship_structure', 'period_start', 'period_end')
+        }),
+        ('Amounts', {
+            'fields': ('currency', 'total', 'status')
+        }),
+        ('Metadata', {
+            'fields': ('created_at', 'updated_at'),
+            'classes': ('collapse',)
+        }),
+    )
+    readonly_fields = ['created_at', 'updated_at']
@@ -6,3 +6,5 @@ class FinancialDepartmentConfig(AppConfig):
     name = 'financial_department'
     verbose_name = 'Financial Department'
 
+    def ready(self):
+        import financial_department.signals  # noqa
@@ -0,0 +1,119 @@
+"""
+Billing runs
+
+Generates draft Invoices for every ACTIVE RelationshipStructure in a period:
+one invoice per relationship and currency, one line per service with a
+ServicePrice in force on the last day of the period. Clients are walked in
+chunks by primary key; each chunk loads its relationships and annotated
+prices in bulk, writes invoices and lines with bulk_create and commits on its
+own, so a constant number of queries is spent per chunk and an interrupted
+run can simply be started again: relationships already invoiced for the
+period are skipped.
+"""
+
+import calendar
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
+
+from corporate_relationship.models import RelationshipStructure
+from .models import Invoice, InvoiceLine, ServicePrice
+
+CENT = Decimal('0.01')
+
+
+def month_period(year, month):
+    """(first day, last day) of a month"""
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def client_chunks(chunk_size, start_after=0):
+    """Yield lists of client ids with active relationships, in pk order"""
+    last = start_after
+    while True:
+        ids = list(
+            RelationshipStructure.objects.filter(status='ACTIVE', client_id__gt=last)
+            .order_by('client_id')
+            .values_list('client_id', flat=True)
+            .distinct()[:chunk_size]
+        )
+        if not ids:
+            return
+        yield ids
+        last = ids[-1]
+
+
+def bill_clients(client_ids, period_start, period_end):
+    """
+    Draft invoices for the active relationships of ``client_ids``.
+
+    Runs in one transaction. Returns a dict with the number of invoices and
+    lines written, relationships skipped because they were already invoiced
+    and relationships with no priced service.
+    """
+    stats = {'invoices': 0, 'lines': 0, 'skipped': 0, 'unpriced': 0}
+    with transaction.atomic():
+        relationships = {
+            relationship.pk: relationship
+            for relationship in RelationshipStructure.objects.filter(
+                status='ACTIVE', client_id__in=client_ids
+            ).only('pk', 'client_id').order_by()
+        }
+        invoiced = set(
+            Invoice.objects.filter(
+                relationship_structure__in=list(relationships), period_start=period_start
+            ).values_list('relationship_structure_id', flat=True).order_by()
+        )
+        stats['skipped'] = len(invoiced)
+        pending = [pk for pk in relationships if pk not in invoiced]
+
+        prices = (
+            ServicePrice.objects.in_force(period_end)
+            .filter(service__relationship_structure__in=pending)
+            .select_related('service')
+            .order_by('service__relationship_structure_id', 'service__name', 'pk')
+        )
+        lines = defaultdict(list)
+        for price in prices:
+            key = (price.service.relationship_structure_id, price.base_currency)
+            lines[key].append(InvoiceLine(
+                service=price.service,
+                service_price=price,
+                description=price.service.name,
+                base_cost=price.base_cost,
+                markup_type=price.markup_type,
+                markup_value=price.markup_value,
+                amount=price.total_cost.quantize(CENT),
+            ))
+        billed = {relationship_id for relationship_id, _ in lines}
+        stats['unpriced'] = len(pending) - len(billed)
+
+        invoices = []
+        for (relationship_id, currency), invoice_lines in lines.items():
+            invoices.append(Invoice(
+                client_id=relationships[relationship_id].client_id,
+                relationship_structure_id=relationship_id,
+                period_start=period_start,
+                period_end=period_end,
+                currency=currency,
+                total=sum(line.amount for line in invoice_lines),
+            ))
+        Invoice.objects.bulk_create(invoices)
+
+        for invoice in invoices:
+            for line in lines[(invoice.relationship_structure_id, invoice.currency)]:
+                line.invoice = invoice
+        all_lines = [line for invoice_lines in lines.values() for line in invoice_lines]
+        InvoiceLine.objects.bulk_create(all_lines)
+
+    stats['invoices'] = len(invoices)
+    stats['lines'] = len(all_lines)
+    return stats
+
+
+def run_billing(period_start, period_end, chunk_size=500, start_after=0):
+    """Bill every client chunk, yielding (last client id, stats) after each commit"""
+    for client_ids in client_chunks(chunk_size, start_after):
+        yield client_ids[-1], bill_clients(client_ids, period_start, period_end)
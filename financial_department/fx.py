@@ -0,0 +1,197 @@
+"""
+Currency conversion
+
+ExchangeRate stores one rate per currency and day against
+settings.FX_BASE_CURRENCY; any pair converts through that base using the
+latest rate on or before the requested date. The full rate series of each
+currency is read once and cached (keyed by a version bumped whenever rates
+change), and a Converter memoizes every (currency, date) rate it resolves, so
+converting thousands of amounts costs at most one query and one bisect per
+distinct currency and date.
+"""
+
+import bisect
+import csv
+import time
+from datetime import date as date_type
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ExchangeRate
+
+CENT = Decimal('0.01')
+RATES_VERSION_KEY = 'financial_department:fx_version'
+
+
+class ExchangeRateMissing(LookupError):
+    """No rate stored for a currency on or before the requested date"""
+
+
+def _rates_version():
+    version = cache.get(RATES_VERSION_KEY)
+    if version is None:
+        cache.add(RATES_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(RATES_VERSION_KEY)
+    return version
+
+
+def bump_rates_version():
+    try:
+        cache.incr(RATES_VERSION_KEY)
+    except ValueError:
+        cache.set(RATES_VERSION_KEY, time.time_ns(), None)
+
+
+def _series_key(currency, version):
+    return f'financial_department:fx:{currency}:{version}'
+
+
+def rate_series(currencies):
+    """{currency: (sorted dates, rates)} for ``currencies``, one query for the uncached ones"""
+    version = _rates_version()
+    keys = {currency: _series_key(currency, version) for currency in set(currencies)}
+    cached = cache.get_many(keys.values())
+    series = {
+        currency: cached[key] for currency, key in keys.items() if key in cached
+    }
+
+    missing = [currency for currency in keys if currency not in series]
+    if missing:
+        loaded = {currency: ([], []) for currency in missing}
+        rows = (
+            ExchangeRate.objects.filter(currency__in=missing)
+            .order_by('currency', 'date')
+            .values_list('currency', 'date', 'rate')
+        )
+        for currency, day, rate in rows:
+            loaded[currency][0].append(day)
+            loaded[currency][1].append(rate)
+        cache.set_many(
+            {keys[currency]: value for currency, value in loaded.items()},
+            settings.FX_CACHE_TTL,
+        )
+        series.update(loaded)
+    return series
+
+
+class Converter:
+    """
+    Converts amounts between currencies at given dates.
+
+    Keep one instance for a whole report: rate series are loaded on first use
+    and every resolved rate is memoized for the lifetime of the converter.
+    """
+
+    def __init__(self, target=None):
+        self.target = target or settings.FX_BASE_CURRENCY
+        self.base = settings.FX_BASE_CURRENCY
+        self._series = {}
+        self._rates = {}
+
+    def _load(self, currencies):
+        wanted = {c for c in currencies if c != self.base and c not in self._series}
+        if wanted:
+            self._series.update(rate_series(wanted))
+
+    def rate(self, currency, on):
+        """Units of ``currency`` per unit of the base currency on ``on``"""
+        if currency == self.base:
+            return Decimal('1')
+        key = (currency, on)
+        if key not in self._rates:
+            self._load([currency])
+            dates, rates = self._series[currency]
+            index = bisect.bisect_right(dates, on) - 1
+            if index < 0:
+                raise ExchangeRateMissing(f"No {currency} exchange rate on or before {on}")
+            self._rates[key] = rates[index]
+        return self._rates[key]
+
+    def factor(self, currency, on, target=None):
+        target = target or self.target
+        if currency == target:
+            return Decimal('1')
+        return self.rate(target, on) / self.rate(currency, on)
+
+    def convert(self, amount, currency, on=None, target=None):
+        on = on or timezone.localdate()
+        return (Decimal(amount) * self.factor(currency, on, target)).quantize(CENT)
+
+    def convert_many(self, amounts, currencies, dates, target=None):
+        """
+        Convert parallel sequences of amounts, currencies and dates.
+
+        Rates for every currency involved are loaded up front, then each
+        distinct (currency, date) pair is resolved once.
+        """
+        target = target or self.target
+        currencies = list(currencies)
+        dates = list(dates)
+        self._load(set(currencies) | {target})
+
+        factors = {}
+        converted = []
+        for amount, currency, on in zip(amounts, currencies, dates):
+            key = (currency, on)
+            if key not in factors:
+                factors[key] = self.factor(currency, on, target)
+            converted.append((Decimal(amount) * factors[key]).quantize(CENT))
+        return converted
+
+    def total(self, amounts_by_currency, on=None, target=None):
+        """Sum of a {currency: amount} mapping in the target currency"""
+        on = on or timezone.localdate()
+        target = target or self.target
+        self._load(set(amounts_by_currency) | {target})
+        total = sum(
+            (Decimal(amount) * self.factor(currency, on, target)
+             for currency, amount in amounts_by_currency.items()),
+            Decimal('0'),
+        )
+        return total.quantize(CENT)
+
+
+def _parse_row(row, line):
+    try:
+        day = date_type.fromisoformat(row['date'].strip())
+        currency = row['currency'].strip().upper()
+        rate = Decimal(row['rate'].strip())
+    except (KeyError, AttributeError, ValueError, InvalidOperation):
+        raise ValueError(f"Line {line}: expected date, currency and rate columns")
+    if len(currency) != 3 or rate <= 0:
+        raise ValueError(f"Line {line}: invalid currency or rate")
+    return day, currency, rate
+
+
+def load_rates_csv(fileobj, source='', chunk_size=1000):
+    """
+    Insert or update rates from a CSV with ``date,currency,rate`` columns.
+
+    Dates are ISO (YYYY-MM-DD) and rates are units of the currency per unit of
+    FX_BASE_CURRENCY. The whole file is validated before anything is written.
+    Returns the number of rows loaded.
+    """
+    rates = {}
+    for line, row in enumerate(csv.DictReader(fileobj), start=2):
+        day, currency, rate = _parse_row(row, line)
+        rates[(currency, day)] = rate
+
+    objects = [
+        ExchangeRate(currency=currency, date=day, rate=rate, source=source)
+        for (currency, day), rate in rates.items()
+    ]
+    with transaction.atomic():
+        for start in range(0, len(objects), chunk_size):
+            ExchangeRate.objects.bulk_create(
+                objects[start:start + chunk_size],
+                update_conflicts=True,
+                unique_fields=['currency', 'date'],
+                update_fields=['rate', 'source', 'updated_at'],
+            )
+        # bulk_create skips the signals that bump the rates version
+        transaction.on_commit(bump_rates_version)
+    return len(objects)
@@ -0,0 +1,34 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from financial_department.fx import load_rates_csv
+
+
+class Command(BaseCommand):
+    help = 'Load exchange rates from a CSV file with date,currency,rate columns'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file (rates per unit of FX_BASE_CURRENCY)')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Rows per INSERT',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            with open(path, newline='', encoding='utf-8') as fileobj:
+                loaded = load_rates_csv(
+                    fileobj,
+                    source=os.path.basename(path),
+                    chunk_size=options['chunk_size'],
+                )
+        except OSError as e:
+            raise CommandError(f"Cannot read {path}: {e}")
+        except ValueError as e:
+            raise CommandError(f"{path}: {e}")
+
+        self.stdout.write(self.style.SUCCESS(f"Loaded {loaded} exchange rates"))
@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from financial_department.billing import month_period, run_billing
+
+
+class Command(BaseCommand):
+    help = 'Generate draft invoices for every active RelationshipStructure in a month'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--period',
+            help='Month to bill as YYYY-MM (default: previous month)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Clients per transaction',
+        )
+        parser.add_argument(
+            '--start-after',
+            type=int,
+            default=0,
+            help='Resume after this client id (already invoiced relationships are skipped anyway)',
+        )
+
+    def handle(self, *args, **options):
+        if options['period']:
+            try:
+                month = datetime.strptime(options['period'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError('--period must be YYYY-MM')
+        else:
+            first_of_month = timezone.localdate().replace(day=1)
+            month = (first_of_month - timedelta(days=1)).replace(day=1)
+        period_start, period_end = month_period(month.year, month.month)
+
+        self.stdout.write(f"Billing {period_start} to {period_end}")
+        totals = {'invoices': 0, 'lines': 0, 'skipped': 0, 'unpriced': 0}
+        for last_client_id, stats in run_billing(
+            period_start, period_end, options['chunk_size'], options['start_after']
+        ):
+            for key, value in stats.items():
+                totals[key] += value
+            self.stdout.write(
+                f"   - up to client {last_client_id}: {stats['invoices']} invoices, "
+                f"{stats['lines']} lines"
+            )
+
+        self.stdout.write(
+            f"{totals['skipped']} relationships already invoiced, "
+            f"{totals['unpriced']} without priced services"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {totals['invoices']} draft invoices with {totals['lines']} lines"
+        ))
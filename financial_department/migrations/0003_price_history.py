@@ -0,0 +1,149 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:20
+
+import datetime
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def start_existing_versions(apps, schema_editor):
+    """Existing prices are valid since they were created; their costs too"""
+    for price_name, cost_name, fk in (
+        ('EntityPrice', 'IncorporationCost', 'entity_price'),
+        ('ServicePrice', 'ServiceCost', 'service_price'),
+    ):
+        Price = apps.get_model('financial_department', price_name)
+        Cost = apps.get_model('financial_department', cost_name)
+        for price in Price.objects.only('pk', 'created_at').iterator():
+            valid_from = django.utils.timezone.localdate(price.created_at)
+            Price.objects.filter(pk=price.pk).update(valid_from=valid_from)
+            Cost.objects.filter(**{fk: price.pk}).update(valid_from=valid_from)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('corporate_relationship', '0004_service_activity_due_index'),
+        ('corporate', '0005_work_queue_claims'),
+        ('financial_department', '0002_exchange_rate'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='entityprice',
+            name='financial_d_entity__4beb9c_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='incorporationcost',
+            name='financial_d_entity__19e5ea_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='servicecost',
+            name='financial_d_service_0cee93_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='serviceprice',
+            name='financial_d_service_7b4a46_idx',
+        ),
+        migrations.AddField(
+            model_name='entityprice',
+            name='valid_from',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+        migrations.AddField(
+            model_name='entityprice',
+            name='valid_to',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='incorporationcost',
+            name='valid_from',
+            field=models.DateField(blank=True, default=datetime.date(2000, 1, 1)),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='incorporationcost',
+            name='valid_to',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='servicecost',
+            name='valid_from',
+            field=models.DateField(blank=True, default=datetime.date(2000, 1, 1)),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='servicecost',
+            name='valid_to',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='serviceprice',
+            name='valid_from',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+        migrations.AddField(
+            model_name='serviceprice',
+            name='valid_to',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='entityprice',
+            name='entity',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prices', to='corporate.entity'),
+        ),
+        migrations.AlterField(
+            model_name='serviceprice',
+            name='service',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prices', to='corporate_relationship.service'),
+        ),
+        migrations.RunPython(start_existing_versions, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='entityprice',
+            index=models.Index(fields=['entity', 'valid_from'], name='financial_d_entity__2f216d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incorporationcost',
+            index=models.Index(fields=['entity_price', 'valid_from'], name='financial_d_entity__d5e9ad_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicecost',
+            index=models.Index(fields=['service_price', 'valid_from'], name='financial_d_service_e5be3e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serviceprice',
+            index=models.Index(fields=['service', 'valid_from'], name='financial_d_service_996cd6_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='entityprice',
+            constraint=models.UniqueConstraint(condition=models.Q(('valid_to__isnull', True)), fields=('entity',), name='unique_current_entity_price'),
+        ),
+        migrations.AddConstraint(
+            model_name='entityprice',
+            constraint=models.UniqueConstraint(fields=('entity', 'valid_from'), name='unique_entity_price_start'),
+        ),
+        migrations.AddConstraint(
+            model_name='entityprice',
+            constraint=models.CheckConstraint(check=models.Q(('valid_to__isnull', True), ('valid_to__gt', models.F('valid_from')), _connector='OR'), name='entity_price_valid_period'),
+        ),
+        migrations.AddConstraint(
+            model_name='incorporationcost',
+            constraint=models.CheckConstraint(check=models.Q(('valid_to__isnull', True), ('valid_to__gt', models.F('valid_from')), _connector='OR'), name='incorporation_cost_valid_period'),
+        ),
+        migrations.AddConstraint(
+            model_name='servicecost',
+            constraint=models.CheckConstraint(check=models.Q(('valid_to__isnull', True), ('valid_to__gt', models.F('valid_from')), _connector='OR'), name='service_cost_valid_period'),
+        ),
+        migrations.AddConstraint(
+            model_name='serviceprice',
+            constraint=models.UniqueConstraint(condition=models.Q(('valid_to__isnull', True)), fields=('service',), name='unique_current_service_price'),
+        ),
+        migrations.AddConstraint(
+            model_name='serviceprice',
+            constraint=models.UniqueConstraint(fields=('service', 'valid_from'), name='unique_service_price_start'),
+        ),
+        migrations.AddConstraint(
+            model_name='serviceprice',
+            constraint=models.CheckConstraint(check=models.Q(('valid_to__isnull', True), ('valid_to__gt', models.F('valid_from')), _connector='OR'), name='service_price_valid_period'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0002_work_queue_claims'),
+        ('corporate_relationship', '0004_service_activity_due_index'),
+        ('financial_department', '0003_price_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Invoice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateField()),
+                ('period_end', models.DateField()),
+                ('currency', models.CharField(choices=[('USD', 'US Dollar'), ('BRL', 'Brazilian Real'), ('EUR', 'Euro')], max_length=3)),
+                ('status', models.CharField(choices=[('DRAFT', 'Draft'), ('ISSUED', 'Issued'), ('CANCELLED', 'Cancelled')], default='DRAFT', max_length=10)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='invoices', to='sales.partner')),
+                ('relationship_structure', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='invoices', to='corporate_relationship.relationshipstructure')),
+            ],
+            options={
+                'verbose_name': 'Invoice',
+                'verbose_name_plural': 'Invoices',
+                'ordering': ['-period_start', 'client'],
+            },
+        ),
+        migrations.CreateModel(
+            name='InvoiceLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('description', models.CharField(max_length=200)),
+                ('base_cost', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('markup_type', models.CharField(choices=[('PERCENTAGE', 'Percentage'), ('FIXED', 'Fixed Amount')], max_length=10)),
+                ('markup_value', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('invoice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='financial_department.invoice')),
+                ('service', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='corporate_relationship.service')),
+                ('service_price', models.ForeignKey(blank=True, help_text='Price version billed', null=True, on_delete=django.db.models.deletion.SET_NULL, to='financial_department.serviceprice')),
+            ],
+            options={
+                'verbose_name': 'Invoice Line',
+                'verbose_name_plural': 'Invoice Lines',
+                'ordering': ['invoice', 'description'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['client', 'period_start'], name='financial_d_client__fe9616_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['status', 'period_start'], name='financial_d_status_5eba99_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='invoice',
+            unique_together={('relationship_structure', 'period_start', 'currency')},
+        ),
+    ]
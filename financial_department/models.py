@@ -1,8 +1,172 @@
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def valid_on(day, prefix=''):
+    """Q for rows whose [valid_from, valid_to) period contains ``day``"""
+    return Q(**{f'{prefix}valid_from__lte': day}) & (
+        Q(**{f'{prefix}valid_to__isnull': True}) | Q(**{f'{prefix}valid_to__gt': day})
+    )
+
+
+def _alive_at_end(prefix=''):
+    """Costs still open when their price version ends (or still open today)"""
+    return Q(**{f'{prefix}valid_to__isnull': True}) | Q(
+        **{f'{prefix}valid_to__gte': F('valid_to')}
+    )
 
 
-class EntityPrice(models.Model):
+class PriceQuerySet(models.QuerySet):
+    """Shared by EntityPrice and ServicePrice, whose costs use related_name='costs'"""
+
+    def current(self):
+        """Prices in force today (a revision scheduled for later is not)"""
+        return self.as_of(timezone.localdate())
+
+    def as_of(self, day):
+        """Prices in force on ``day``"""
+        return self.filter(valid_on(day))
+
+    def in_force(self, day=None):
+        """
+        Prices in force on ``day`` (today when None) with their totals.
+
+        A revision scheduled after ``day`` is left out, as are cost
+        components that only start later.
+        """
+        day = day or timezone.localdate()
+        return self.as_of(day).with_totals(as_of=day)
+
+    def with_totals(self, as_of=None):
+        """
+        Annotate base_cost (sum of costs) and total_cost (with markup).
+
+        Only cost components valid on ``as_of`` are summed; without it, the
+        components still open at the end of each price version. Joins the
+        costs table and groups by price, so chain other multi-valued joins
+        with care. Percentages are applied as a multiplication by 0.01 so
+        SQLite does not fall back to integer division.
+        """
+        money = models.DecimalField(max_digits=14, decimal_places=2)
+        costs = valid_on(as_of, 'costs__') if as_of else _alive_at_end('costs__')
+        return self.annotate(
+            base_cost=Coalesce(
+                Sum('costs__value', filter=costs), Value(Decimal('0')), output_field=money
+            ),
+        ).annotate(
+            total_cost=Case(
+                When(
+                    markup_type='PERCENTAGE',
+                    then=F('base_cost') * (
+                        Value(Decimal('1')) + F('markup_value') * Value(Decimal('0.01'))
+                    ),
+                ),
+                default=F('base_cost') + F('markup_value'),
+                output_field=money,
+            ),
+        )
+
+
+class VersionedPriceMixin:
+    """
+    Price records are not overwritten when prices change: revise() closes the
+    current version (valid_to) and opens a new one carrying the open cost
+    components, so old quotes can be reproduced with PriceQuerySet.as_of().
+    Periods are half-open: a version is valid from valid_from up to the day
+    before valid_to.
+    """
+
+    # Fields copied into a new version unless overridden
+    price_fields = ('base_currency', 'markup_type', 'markup_value')
+    target_field = None
+
+    def clean(self):
+        super().clean()
+        if self.valid_to and self.valid_from and self.valid_to <= self.valid_from:
+            raise ValidationError("valid_to must be after valid_from")
+
+    def get_total_cost(self):
+        """Calculate total cost including markup"""
+        if hasattr(self, 'total_cost'):  # annotated by with_totals()
+            return self.total_cost
+        alive = Q(valid_to__isnull=True)
+        if self.valid_to:
+            alive |= Q(valid_to__gte=self.valid_to)
+        base_cost = sum(cost.value for cost in self.costs.filter(alive))
+
+        if self.markup_type == 'PERCENTAGE':
+            return base_cost * (1 + self.markup_value / 100)
+        else:  # FIXED
+            return base_cost + self.markup_value
+
+    def revise(self, valid_from=None, **changes):
+        """
+        Close this (current) version on ``valid_from`` and return the new one.
+
+        ``changes`` overrides price_fields on the new version. Open cost
+        components are closed too and copied to the new version; components
+        starting on or after ``valid_from`` move to it unchanged.
+        """
+        model = type(self)
+        valid_from = valid_from or timezone.localdate()
+        cost_model = self.costs.model
+        price_fk = self.costs.field.name
+
+        with transaction.atomic():
+            current = model.objects.select_for_update().get(pk=self.pk)
+            if current.valid_to is not None:
+                raise ValidationError("Only the current price can be revised")
+            if valid_from <= current.valid_from:
+                raise ValidationError("A new version must start after the current one")
+
+            open_costs = cost_model.objects.filter(
+                **{price_fk: current}, valid_to__isnull=True
+            )
+            carried = list(open_costs.filter(valid_from__lt=valid_from))
+            open_costs.filter(valid_from__lt=valid_from).update(valid_to=valid_from)
+            model.objects.filter(pk=current.pk).update(valid_to=valid_from)
+
+            new = model(
+                **{self.target_field: getattr(current, self.target_field)},
+                **{field: getattr(current, field) for field in self.price_fields},
+                valid_from=valid_from,
+            )
+            for field, value in changes.items():
+                setattr(new, field, value)
+            # post_save here also invalidates cached quotes for the whole change
+            new.save()
+
+            open_costs.filter(valid_from__gte=valid_from).update(**{price_fk: new})
+            for cost in carried:
+                cost.pk = None
+                cost._state.adding = True
+                setattr(cost, price_fk, new)
+                cost.valid_from = valid_from
+                cost.valid_to = None
+            cost_model.objects.bulk_create(carried)
+
+        self.valid_to = valid_from
+        return new
+
+
+class CostValidityMixin:
+    """Cost components default to the validity start of their price version"""
+
+    price_field = None
+
+    def save(self, *args, **kwargs):
+        if self.valid_from is None:
+            self.valid_from = getattr(self, self.price_field).valid_from
+        super().save(*args, **kwargs)
+
+
+class EntityPrice(VersionedPriceMixin, models.Model):
     """
     Manages pricing for legal entities
     Centralizes cost management from Entity model
@@ -14,7 +178,13 @@ class EntityPrice(models.Model):
         ('EUR', 'Euro'),
     ]
 
-    entity = models.OneToOneField('corporate.Entity', on_delete=models.CASCADE)
+    target_field = 'entity'
+
+    entity = models.ForeignKey(
+        'corporate.Entity',
+        on_delete=models.CASCADE,
+        related_name='prices'
+    )
     base_currency = models.CharField(max_length=3, choices=BASE_CURRENCIES)
 
     # Price markup (either percentage or fixed amount)
@@ -25,31 +195,42 @@ class EntityPrice(models.Model):
     markup_type = models.CharField(max_length=10, choices=MARKUP_TYPES)
     markup_value = models.DecimalField(max_digits=10, decimal_places=2)
 
+    # Vigência [valid_from, valid_to); valid_to vazio = preço atual
+    valid_from = models.DateField(default=timezone.localdate)
+    valid_to = models.DateField(null=True, blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PriceQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Entity Price"
         verbose_name_plural = "Entity Prices"
         indexes = [
-            models.Index(fields=["entity"]),
+            models.Index(fields=["entity", "valid_from"]),
             models.Index(fields=["base_currency"]),
         ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["entity"],
+                condition=Q(valid_to__isnull=True),
+                name="unique_current_entity_price",
+            ),
+            models.UniqueConstraint(
+                fields=["entity", "valid_from"], name="unique_entity_price_start"
+            ),
+            models.CheckConstraint(
+                check=Q(valid_to__isnull=True) | Q(valid_to__gt=F("valid_from")),
+                name="entity_price_valid_period",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.entity.name} - {self.get_base_currency_display()}"
 
-    def get_total_cost(self):
-        """Calculate total cost including markup"""
-        base_cost = sum(cost.value for cost in self.costs.all())
-        
-        if self.markup_type == 'PERCENTAGE':
-            return base_cost * (1 + self.markup_value / 100)
-        else:  # FIXED
-            return base_cost + self.markup_value
-
 
-class IncorporationCost(models.Model):
+class IncorporationCost(CostValidityMixin, models.Model):
     """
     Individual cost components for entity incorporation
     One-to-many relationship with EntityPrice
@@ -60,6 +241,8 @@ class IncorporationCost(models.Model):
         ('SERVICE_PROVIDER', 'Service Provider'),
     ]
 
+    price_field = 'entity_price'
+
     entity_price = models.ForeignKey(
         EntityPrice, 
         on_delete=models.CASCADE, 
@@ -73,6 +256,10 @@ class IncorporationCost(models.Model):
         validators=[MinValueValidator(0)]
     )
 
+    # Vigência dentro da versão do preço (padrão: início da versão)
+    valid_from = models.DateField(blank=True)
+    valid_to = models.DateField(null=True, blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -81,15 +268,21 @@ class IncorporationCost(models.Model):
         verbose_name_plural = "Incorporation Costs"
         ordering = ["entity_price", "name"]
         indexes = [
-            models.Index(fields=["entity_price"]),
+            models.Index(fields=["entity_price", "valid_from"]),
             models.Index(fields=["cost_type"]),
         ]
+        constraints = [
+            models.CheckConstraint(
+                check=Q(valid_to__isnull=True) | Q(valid_to__gt=F("valid_from")),
+                name="incorporation_cost_valid_period",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.get_cost_type_display()}: {self.value}"
 
 
-class ServicePrice(models.Model):
+class ServicePrice(VersionedPriceMixin, models.Model):
     """
     Manages pricing for services
     Same structure as EntityPrice but for services
@@ -106,39 +299,53 @@ class ServicePrice(models.Model):
         ('FIXED', 'Fixed Amount')
     ]
 
-    service = models.OneToOneField(
-        'corporate_relationship.Service', 
-        on_delete=models.CASCADE
+    target_field = 'service'
+
+    service = models.ForeignKey(
+        'corporate_relationship.Service',
+        on_delete=models.CASCADE,
+        related_name='prices'
     )
     base_currency = models.CharField(max_length=3, choices=BASE_CURRENCIES)
     markup_type = models.CharField(max_length=10, choices=MARKUP_TYPES)
     markup_value = models.DecimalField(max_digits=10, decimal_places=2)
 
+    # Vigência [valid_from, valid_to); valid_to vazio = preço atual
+    valid_from = models.DateField(default=timezone.localdate)
+    valid_to = models.DateField(null=True, blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PriceQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Service Price"
         verbose_name_plural = "Service Prices"
         indexes = [
-            models.Index(fields=["service"]),
+            models.Index(fields=["service", "valid_from"]),
             models.Index(fields=["base_currency"]),
         ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["service"],
+                condition=Q(valid_to__isnull=True),
+                name="unique_current_service_price",
+            ),
+            models.UniqueConstraint(
+                fields=["service", "valid_from"], name="unique_service_price_start"
+            ),
+            models.CheckConstraint(
+                check=Q(valid_to__isnull=True) | Q(valid_to__gt=F("valid_from")),
+                name="service_price_valid_period",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.service.name} - {self.get_base_currency_display()}"
 
-    def get_total_cost(self):
-        """Calculate total cost including markup"""
-        base_cost = sum(cost.value for cost in self.costs.all())
-        
-        if self.markup_type == 'PERCENTAGE':
-            return base_cost * (1 + self.markup_value / 100)
-        else:  # FIXED
-            return base_cost + self.markup_value
-
 
-class ServiceCost(models.Model):
+class ServiceCost(CostValidityMixin, models.Model):
     """
     Individual cost components for services
     """
@@ -148,6 +355,8 @@ class ServiceCost(models.Model):
         ('SERVICE_PROVIDER', 'Service Provider'),
     ]
 
+    price_field = 'service_price'
+
     service_price = models.ForeignKey(
         ServicePrice, 
         on_delete=models.CASCADE, 
@@ -161,6 +370,10 @@ class ServiceCost(models.Model):
         validators=[MinValueValidator(0)]
     )
 
+    # Vigência dentro da versão do preço (padrão: início da versão)
+    valid_from = models.DateField(blank=True)
+    valid_to = models.DateField(null=True, blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -169,10 +382,124 @@ class ServiceCost(models.Model):
         verbose_name_plural = "Service Costs"
         ordering = ["service_price", "name"]
         indexes = [
-            models.Index(fields=["service_price"]),
+            models.Index(fields=["service_price", "valid_from"]),
             models.Index(fields=["cost_type"]),
         ]
+        constraints = [
+            models.CheckConstraint(
+                check=Q(valid_to__isnull=True) | Q(valid_to__gt=F("valid_from")),
+                name="service_cost_valid_period",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.get_cost_type_display()}: {self.value}"
 
+
+class ExchangeRate(models.Model):
+    """
+    Daily exchange rate of a currency against settings.FX_BASE_CURRENCY
+    ``rate`` is how many units of ``currency`` one unit of the base buys;
+    conversions use the latest rate on or before the date (see fx.py)
+    """
+
+    currency = models.CharField(max_length=3)
+    date = models.DateField()
+    rate = models.DecimalField(
+        max_digits=18,
+        decimal_places=8,
+        validators=[MinValueValidator(Decimal('0.00000001'))]
+    )
+    source = models.CharField(max_length=100, blank=True, help_text="Origin of the rate (e.g. CSV file)")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Exchange Rate"
+        verbose_name_plural = "Exchange Rates"
+        ordering = ["currency", "-date"]
+        unique_together = ["currency", "date"]
+
+    def __str__(self):
+        return f"{self.currency} {self.rate} ({self.date})"
+
+
+class Invoice(models.Model):
+    """
+    Invoice of one RelationshipStructure for a billing period, in one currency
+    Drafts are generated in bulk by the run_billing command (billing.py)
+    """
+
+    STATUS_CHOICES = [
+        ('DRAFT', 'Draft'),
+        ('ISSUED', 'Issued'),
+        ('CANCELLED', 'Cancelled'),
+    ]
+
+    client = models.ForeignKey(
+        'sales.Partner',
+        on_delete=models.PROTECT,
+        related_name='invoices'
+    )
+    relationship_structure = models.ForeignKey(
+        'corporate_relationship.RelationshipStructure',
+        on_delete=models.PROTECT,
+        related_name='invoices'
+    )
+    period_start = models.DateField()
+    period_end = models.DateField()
+    currency = models.CharField(max_length=3, choices=EntityPrice.BASE_CURRENCIES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='DRAFT')
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Invoice"
+        verbose_name_plural = "Invoices"
+        ordering = ["-period_start", "client"]
+        unique_together = ["relationship_structure", "period_start", "currency"]
+        indexes = [
+            models.Index(fields=["client", "period_start"]),
+            models.Index(fields=["status", "period_start"]),
+        ]
+
+    def __str__(self):
+        return f"{self.relationship_structure} - {self.period_start:%Y-%m} ({self.currency})"
+
+
+class InvoiceLine(models.Model):
+    """
+    One billed service, priced with the ServicePrice version in force at the
+    end of the period
+    """
+
+    invoice = models.ForeignKey(Invoice, on_delete=models.CASCADE, related_name='lines')
+    service = models.ForeignKey(
+        'corporate_relationship.Service',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL
+    )
+    service_price = models.ForeignKey(
+        ServicePrice,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        help_text="Price version billed"
+    )
+    description = models.CharField(max_length=200)
+    base_cost = models.DecimalField(max_digits=14, decimal_places=2)
+    markup_type = models.CharField(max_length=10, choices=ServicePrice.MARKUP_TYPES)
+    markup_value = models.DecimalField(max_digits=10, decimal_places=2)
+    amount = models.DecimalField(max_digits=14, decimal_places=2)
+
+    class Meta:
+        verbose_name = "Invoice Line"
+        verbose_name_plural = "Invoice Lines"
+        ordering = ["invoice", "description"]
+
+    def __str__(self):
+        return f"{self.description}: {self.amount}"
@@ -0,0 +1,185 @@
+"""
+Structure quotes
+
+Prices a corporate Structure from its active StructureNodes (EntityPrice of
+each node's entity template, incorporation costs included) and from the
+ServicePrices of the services attached to it through RelationshipStructure.
+Amounts stay in each price's base currency and are totalled per currency.
+
+Price data is loaded in bulk with PriceQuerySet.with_totals(), so a quote costs
+the same few queries however many nodes the structure has. Quotes are
+memoized per (structure version, price version, day): signals.py bumps the
+version of a structure when its nodes or services change and the global price
+version when any price or cost changes, and the day in the key lets a price
+revision scheduled ahead take effect; old entries simply expire.
+"""
+
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from corporate.models import Structure, StructureNode
+from .models import EntityPrice, ServicePrice
+
+PRICE_VERSION_KEY = 'financial_department:price_version'
+
+
+def structure_version_key(structure_id):
+    return f'financial_department:structure_version:{structure_id}'
+
+
+def quote_cache_key(structure_id, structure_version, price_version, day):
+    return f'financial_department:quote:{structure_id}:{structure_version}:{price_version}:{day}'
+
+
+def _new_version():
+    # Unique even if the counter was evicted, so old quotes are never reused
+    return time.time_ns()
+
+
+def bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), None)
+
+
+def bump_structure_versions(structure_ids):
+    for structure_id in set(structure_ids):
+        if structure_id:
+            bump_version(structure_version_key(structure_id))
+
+
+def bump_price_version():
+    bump_version(PRICE_VERSION_KEY)
+
+
+def structure_versions(structure_ids):
+    """{structure_id: current version}, also used by corporate.compliance"""
+    keys = {structure_version_key(pk): pk for pk in set(structure_ids)}
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _new_version(), None)
+            versions[key] = cache.get(key)
+    return {pk: versions[key] for key, pk in keys.items()}
+
+
+def _versions(structure_id):
+    keys = [structure_version_key(structure_id), PRICE_VERSION_KEY]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _new_version(), None)
+            versions[key] = cache.get(key)
+    return versions[keys[0]], versions[keys[1]]
+
+
+def entity_totals(entity_ids, on=None):
+    """{entity_id: EntityPrice in force on ``on``, with base_cost/total_cost} in one query"""
+    return {
+        price.entity_id: price
+        for price in EntityPrice.objects.in_force(on).filter(entity_id__in=set(entity_ids))
+    }
+
+
+def _line(price):
+    return {
+        'currency': price.base_currency,
+        'base_cost': price.base_cost,
+        'markup_type': price.markup_type,
+        'markup_value': price.markup_value,
+        'total_cost': price.total_cost,
+    }
+
+
+def _accumulate(totals, price):
+    currency = totals[price.base_currency]
+    currency['base_cost'] += price.base_cost
+    currency['total_cost'] += price.total_cost
+
+
+def quote_structure(structure_id, on=None):
+    """
+    Per-node, per-service and total cost of a Structure.
+
+    Uses the prices in force on ``on`` (today by default), so a past quote can
+    be reproduced from the price history.
+
+    Four queries: structure, active nodes, entity prices and service prices.
+    Nodes whose entity template has no EntityPrice are listed under
+    ``unpriced_nodes`` and left out of the totals; services only appear once
+    they have a ServicePrice. Returns None when the structure does not exist.
+    """
+    structure = Structure.objects.filter(pk=structure_id).only('pk', 'name').first()
+    if structure is None:
+        return None
+
+    nodes = list(
+        StructureNode.objects.filter(structure=structure, is_active=True)
+        .select_related('entity_template')
+        .order_by('level', 'custom_name')
+    )
+    prices = entity_totals((node.entity_template_id for node in nodes), on)
+    service_prices = (
+        ServicePrice.objects.in_force(on)
+        .filter(service__relationship_structure__structure=structure)
+        .select_related('service')
+        .order_by('service__name', 'pk')
+    )
+
+    totals = defaultdict(lambda: {'base_cost': Decimal('0'), 'total_cost': Decimal('0')})
+    unpriced = []
+
+    node_lines = []
+    for node in nodes:
+        price = prices.get(node.entity_template_id)
+        line = {
+            'node_id': node.pk,
+            'name': node.custom_name,
+            'entity_id': node.entity_template_id,
+            'entity': node.entity_template.name,
+            'level': node.level,
+            'price': _line(price) if price else None,
+        }
+        node_lines.append(line)
+        if price is None:
+            unpriced.append(node.pk)
+            continue
+        _accumulate(totals, price)
+
+    service_lines = []
+    for price in service_prices:
+        service_lines.append({
+            'service_id': price.service_id,
+            'name': price.service.name,
+            'price': _line(price),
+        })
+        _accumulate(totals, price)
+
+    return {
+        'structure': {'id': structure.pk, 'name': structure.name},
+        'as_of': on,
+        'nodes': node_lines,
+        'services': service_lines,
+        'totals': dict(totals),
+        'unpriced_nodes': unpriced,
+    }
+
+
+def cached_structure_quote(structure_id):
+    """
+    Current quote_structure() memoized until the structure or any price
+    changes, or the day ends (a scheduled price revision may start)
+    """
+    key = quote_cache_key(structure_id, *_versions(structure_id), timezone.localdate())
+    quote = cache.get(key)
+    if quote is None:
+        quote = quote_structure(structure_id)
+        if quote is not None:
+            cache.set(key, quote, settings.STRUCTURE_QUOTE_TTL)
+    return quote
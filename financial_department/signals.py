@@ -0,0 +1,62 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from corporate.models import Structure, StructureNode
+from corporate_relationship.models import RelationshipStructure, Service
+from .fx import bump_rates_version
+from .models import EntityPrice, ExchangeRate, IncorporationCost, ServiceCost, ServicePrice
+from .quotes import bump_price_version, bump_structure_versions
+
+
+@receiver([post_save, post_delete], sender=ExchangeRate)
+def bump_exchange_rate_version(sender, instance, **kwargs):
+    transaction.on_commit(bump_rates_version)
+
+
+# Versões usadas na chave do cache de cotações (quotes.py)
+
+@receiver([post_save, post_delete], sender=EntityPrice)
+@receiver([post_save, post_delete], sender=IncorporationCost)
+@receiver([post_save, post_delete], sender=ServicePrice)
+@receiver([post_save, post_delete], sender=ServiceCost)
+def bump_quote_price_version(sender, instance, **kwargs):
+    transaction.on_commit(bump_price_version)
+
+
+def _bump_structures_on_commit(structure_ids):
+    structure_ids = {pk for pk in structure_ids if pk}
+    if structure_ids:
+        transaction.on_commit(lambda: bump_structure_versions(structure_ids))
+
+
+@receiver(post_save, sender=Structure)
+def bump_structure_quote_version(sender, instance, created, update_fields=None, **kwargs):
+    # Só o nome da Structure entra na cotação
+    if created or (update_fields and 'name' not in update_fields):
+        return
+    _bump_structures_on_commit([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=StructureNode)
+def bump_node_quote_version(sender, instance, **kwargs):
+    _bump_structures_on_commit([instance.structure_id])
+
+
+@receiver([post_save, post_delete], sender=RelationshipStructure)
+def bump_relationship_quote_version(sender, instance, **kwargs):
+    _bump_structures_on_commit([instance.structure_id])
+
+
+@receiver([post_save, post_delete], sender=Service)
+def bump_service_quote_version(sender, instance, **kwargs):
+    relationship_ids = {instance.relationship_structure_id}
+    if instance.has_changed('relationship_structure'):
+        relationship_ids.add(instance.previous('relationship_structure'))
+    relationship_ids.discard(None)
+    if relationship_ids:
+        _bump_structures_on_commit(
+            RelationshipStructure.objects.filter(
+                pk__in=relationship_ids
+            ).values_list('structure_id', flat=True)
+        )
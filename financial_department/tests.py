@@ -0,0 +1,518 @@
+import io
+import os
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from corporate.models import Entity, Structure, StructureNode
+from corporate_relationship.models import RelationshipStructure, Service
+from parties.models import Party
+from sales.models import Partner, Product, ProductHierarchy
+from .billing import bill_clients, month_period, run_billing
+from .fx import Converter, ExchangeRateMissing, load_rates_csv
+from .models import (
+    EntityPrice, ExchangeRate, IncorporationCost, Invoice, InvoiceLine, ServiceCost, ServicePrice
+)
+from .quotes import cached_structure_quote, quote_structure
+
+
+class PriceTotalsTest(TestCase):
+    def setUp(self):
+        self.percentage = EntityPrice.objects.create(
+            entity=Entity.objects.create(name='Wyoming LLC'),
+            base_currency='USD', markup_type='PERCENTAGE', markup_value=Decimal('12.5'),
+        )
+        self.fixed = EntityPrice.objects.create(
+            entity=Entity.objects.create(name='BVI IBC'),
+            base_currency='USD', markup_type='FIXED', markup_value=Decimal('250'),
+        )
+        self.empty = EntityPrice.objects.create(
+            entity=Entity.objects.create(name='Cayman Fund'),
+            base_currency='EUR', markup_type='PERCENTAGE', markup_value=Decimal('10'),
+        )
+        for price in (self.percentage, self.fixed):
+            IncorporationCost.objects.create(
+                entity_price=price, name='Registered agent',
+                cost_type='SERVICE_PROVIDER', value=Decimal('1000.00'),
+            )
+            IncorporationCost.objects.create(
+                entity_price=price, name='Filing', cost_type='LEGAL_FEE',
+                value=Decimal('333.33'),
+            )
+
+    def test_annotations_match_python_totals(self):
+        with self.assertNumQueries(1):
+            prices = {price.pk: price for price in EntityPrice.objects.with_totals()}
+
+        self.assertEqual(prices[self.percentage.pk].base_cost, Decimal('1333.33'))
+        self.assertEqual(prices[self.fixed.pk].base_cost, Decimal('1333.33'))
+        self.assertEqual(prices[self.empty.pk].base_cost, Decimal('0'))
+        for pk, price in prices.items():
+            expected = EntityPrice.objects.get(pk=pk).get_total_cost()
+            self.assertEqual(price.total_cost, expected)
+        self.assertEqual(prices[self.fixed.pk].total_cost, Decimal('1583.33'))
+
+        # get_total_cost() reuses the annotation instead of loading costs
+        with self.assertNumQueries(0):
+            prices[self.percentage.pk].get_total_cost()
+
+    def test_order_by_total(self):
+        ordered = EntityPrice.objects.with_totals().order_by('-total_cost')
+        self.assertEqual(list(ordered), [self.fixed, self.percentage, self.empty])
+
+    def test_service_prices(self):
+        executor = User.objects.create_user('executor')
+        price = ServicePrice.objects.create(
+            service=Service.objects.create(
+                name='Annual filing', service_price=100, regulator_fee=10,
+                executor=executor, counterparty_name='Registry',
+            ),
+            base_currency='BRL', markup_type='PERCENTAGE', markup_value=Decimal('20'),
+        )
+        ServiceCost.objects.create(
+            service_price=price, name='Registry', cost_type='LEGAL_FEE', value=Decimal('50.00'),
+        )
+        annotated = ServicePrice.objects.with_totals().get()
+        self.assertEqual(annotated.base_cost, Decimal('50.00'))
+        self.assertEqual(annotated.total_cost, Decimal('60.00'))
+
+    def test_admin_changelist_query_count_is_flat(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(admin_user)
+        url = '/admin/financial_department/entityprice/'
+        with self.assertNumQueries(5) as first:
+            response = self.client.get(url)
+        self.assertContains(response, '1,583.33 USD')
+
+        for n in range(5):
+            price = EntityPrice.objects.create(
+                entity=Entity.objects.create(name=f'Extra {n}'),
+                base_currency='USD', markup_type='FIXED', markup_value=1,
+            )
+            IncorporationCost.objects.create(
+                entity_price=price, name='Filing', cost_type='LEGAL_FEE', value=1,
+            )
+        with self.assertNumQueries(len(first.captured_queries)):
+            self.client.get(url)
+
+
+class StructureQuoteTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.llc = Entity.objects.create(name='Wyoming LLC')
+        self.trust = Entity.objects.create(name='Bahamas Trust')
+        self.unpriced = Entity.objects.create(name='Panama Foundation')
+        self.llc_price = EntityPrice.objects.create(
+            entity=self.llc, base_currency='USD', markup_type='PERCENTAGE', markup_value=10,
+        )
+        IncorporationCost.objects.create(
+            entity_price=self.llc_price, name='Filing', cost_type='LEGAL_FEE', value=1000,
+        )
+        trust_price = EntityPrice.objects.create(
+            entity=self.trust, base_currency='EUR', markup_type='FIXED', markup_value=500,
+        )
+        IncorporationCost.objects.create(
+            entity_price=trust_price, name='Trustee', cost_type='SERVICE_PROVIDER', value=2000,
+        )
+
+        self.structure = Structure.objects.create(name='Family Holding', description='Test')
+        top = StructureNode.objects.create(
+            structure=self.structure, entity_template=self.trust, custom_name='Trust',
+        )
+        for n in range(3):
+            StructureNode.objects.create(
+                structure=self.structure, entity_template=self.llc,
+                custom_name=f'LLC {n}', level=2, parent_node=top,
+            )
+        self.foundation = StructureNode.objects.create(
+            structure=self.structure, entity_template=self.unpriced,
+            custom_name='Foundation', level=2, parent_node=top,
+        )
+        StructureNode.objects.create(
+            structure=self.structure, entity_template=self.llc,
+            custom_name='Dissolved LLC', level=2, is_active=False,
+        )
+
+        party = Party.objects.create(name='Acme Holdings', person_type='JURIDICAL_PERSON')
+        partner = Partner.objects.create(party=party, company_name='Acme', address='Main St')
+        relationship = RelationshipStructure.objects.create(
+            structure=self.structure, client=partner,
+        )
+        self.service = Service.objects.create(
+            name='Annual filing', service_price=100, regulator_fee=10,
+            executor=User.objects.create_user('executor'), counterparty_name='Registry',
+            relationship_structure=relationship,
+        )
+        service_price = ServicePrice.objects.create(
+            service=self.service, base_currency='USD', markup_type='FIXED', markup_value=50,
+        )
+        ServiceCost.objects.create(
+            service_price=service_price, name='Registry', cost_type='LEGAL_FEE', value=200,
+        )
+
+    def test_quote_per_node_and_per_currency(self):
+        with self.assertNumQueries(4):
+            quote = quote_structure(self.structure.pk)
+
+        self.assertEqual(len(quote['nodes']), 5)
+        self.assertEqual(quote['nodes'][0]['name'], 'Trust')
+        self.assertEqual(quote['nodes'][0]['price']['total_cost'], Decimal('2500'))
+        self.assertEqual(quote['nodes'][2]['price']['total_cost'], Decimal('1100'))
+        self.assertEqual(quote['unpriced_nodes'], [self.foundation.pk])
+        self.assertEqual(quote['services'][0]['price']['total_cost'], Decimal('250'))
+        self.assertEqual(quote['totals'], {
+            'USD': {'base_cost': Decimal('3200'), 'total_cost': Decimal('3550')},
+            'EUR': {'base_cost': Decimal('2000'), 'total_cost': Decimal('2500')},
+        })
+        self.assertIsNone(quote_structure(0))
+
+    def test_cached_quote_follows_structure_and_price_versions(self):
+        first = cached_structure_quote(self.structure.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(cached_structure_quote(self.structure.pk), first)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            IncorporationCost.objects.create(
+                entity_price=self.llc_price, name='Agent', cost_type='SERVICE_PROVIDER',
+                value=100,
+            )
+        repriced = cached_structure_quote(self.structure.pk)
+        self.assertEqual(repriced['totals']['USD']['total_cost'], Decimal('3880'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.foundation.delete()
+        self.assertEqual(cached_structure_quote(self.structure.pk)['unpriced_nodes'], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service.name = 'Annual return'
+            self.service.save()
+        quote = cached_structure_quote(self.structure.pk)
+        self.assertEqual(quote['services'][0]['name'], 'Annual return')
+
+    def test_quote_api(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'a@example.com', 'pw'))
+        response = self.client.get(f'/corporate/api/structures/{self.structure.pk}/quote/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Decimal(response.json()['totals']['EUR']['total_cost']), 2500)
+        response = self.client.get('/corporate/api/structures/0/quote/')
+        self.assertEqual(response.status_code, 404)
+
+        response = self.client.get(
+            f'/corporate/api/structures/{self.structure.pk}/quote/?currency=USD'
+        )
+        self.assertEqual(response.status_code, 400)  # no EUR rate loaded
+        with self.captureOnCommitCallbacks(execute=True):
+            ExchangeRate.objects.create(currency='EUR', date=date(2000, 1, 1), rate=Decimal('0.5'))
+        response = self.client.get(
+            f'/corporate/api/structures/{self.structure.pk}/quote/?currency=USD'
+        )
+        self.assertEqual(response.json()['converted'], {
+            'currency': 'USD', 'base_cost': '7200.00', 'total_cost': '8550.00',
+        })
+        response = self.client.get(
+            f'/corporate/api/structures/{self.structure.pk}/quote/?currency=XYZ'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_product_costs_use_entity_prices(self):
+        product = Product.objects.create(
+            nome='Combo', descricao='Test', commercial_name='Combo',
+            master_agreement_url='https://example.com', tempo_total_implementacao=30,
+        )
+        ProductHierarchy.objects.create(product=product, structure=self.llc, order=1)
+        ProductHierarchy.objects.create(
+            product=product, structure=self.trust, order=2, custom_cost=Decimal('900'),
+        )
+        ProductHierarchy.objects.create(product=product, structure=self.unpriced, order=3)
+
+        hierarchy = product.producthierarchy_set.get(order=1)
+        self.assertEqual(hierarchy.get_effective_cost(), Decimal('1100'))
+        with self.assertNumQueries(2):
+            self.assertEqual(product.get_custo_total(), Decimal('2000'))
+
+    def test_product_cost_converts_currencies(self):
+        product = Product.objects.create(
+            nome='Combo', descricao='Test', commercial_name='Combo',
+            master_agreement_url='https://example.com', tempo_total_implementacao=30,
+        )
+        ProductHierarchy.objects.create(product=product, structure=self.llc, order=1)
+        trust = ProductHierarchy.objects.create(product=product, structure=self.trust, order=2)
+
+        with self.assertRaises(ExchangeRateMissing):
+            trust.get_effective_cost()
+        with self.captureOnCommitCallbacks(execute=True):
+            ExchangeRate.objects.create(currency='EUR', date=date(2000, 1, 1), rate=Decimal('0.8'))
+
+        # USD 1100 + EUR 2500 at 0.8 EUR per USD
+        self.assertEqual(trust.get_effective_cost(), Decimal('3125'))
+        with self.assertNumQueries(2):  # EUR rates are already cached
+            self.assertEqual(product.get_custo_total(), Decimal('4225'))
+
+
+RATES_CSV = """date,currency,rate
+2026-01-02,BRL,5.00
+2026-01-02,EUR,0.80
+2026-02-02,BRL,6.00
+"""
+
+
+class ExchangeRateTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            load_rates_csv(io.StringIO(RATES_CSV))
+
+    def test_convert_through_base_currency(self):
+        converter = Converter('EUR')
+        self.assertEqual(converter.convert(100, 'USD', date(2026, 1, 15)), Decimal('80.00'))
+        self.assertEqual(converter.convert(500, 'BRL', date(2026, 1, 15)), Decimal('80.00'))
+        # Latest rate on or before the date
+        self.assertEqual(converter.convert(600, 'BRL', date(2026, 3, 1)), Decimal('80.00'))
+        self.assertEqual(converter.convert(10, 'EUR', date(2025, 1, 1)), Decimal('10.00'))
+        with self.assertRaises(ExchangeRateMissing):
+            converter.convert(10, 'BRL', date(2025, 12, 31))
+
+    def test_convert_many_loads_rates_once(self):
+        amounts = [Decimal('100')] * 300
+        currencies = ['USD', 'BRL', 'EUR'] * 100
+        dates = [date(2026, 1, 2) + (date(2026, 2, 10) - date(2026, 1, 2)) * (n % 2) for n in range(300)]
+
+        with self.assertNumQueries(1):
+            converted = Converter('USD').convert_many(amounts, currencies, dates)
+        self.assertEqual(converted[:3], [Decimal('100.00'), Decimal('16.67'), Decimal('125.00')])
+        self.assertEqual(converted[4], Decimal('20.00'))  # BRL at the February rate
+
+        # Rate series are cached across converters
+        with self.assertNumQueries(0):
+            total = Converter('BRL').total(
+                {'USD': 10, 'BRL': 50, 'EUR': 8}, on=date(2026, 1, 2)
+            )
+        self.assertEqual(total, Decimal('150.00'))
+
+    def test_reload_updates_rates_and_cache(self):
+        self.assertEqual(Converter().rate('EUR', date(2026, 1, 2)), Decimal('0.8'))
+        with self.captureOnCommitCallbacks(execute=True):
+            loaded = load_rates_csv(io.StringIO("date,currency,rate\n2026-01-02,eur,0.9\n"))
+        self.assertEqual(loaded, 1)
+        self.assertEqual(ExchangeRate.objects.count(), 3)
+        self.assertEqual(Converter().rate('EUR', date(2026, 1, 2)), Decimal('0.9'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ExchangeRate.objects.filter(currency='EUR').get().delete()
+        with self.assertRaises(ExchangeRateMissing):
+            Converter().rate('EUR', date(2026, 1, 2))
+
+    def test_invalid_csv_loads_nothing(self):
+        with self.assertRaisesMessage(ValueError, 'Line 3'):
+            load_rates_csv(io.StringIO("date,currency,rate\n2026-03-01,BRL,5\n2026-03-02,BRL,-1\n"))
+        self.assertFalse(ExchangeRate.objects.filter(date__gte=date(2026, 3, 1)).exists())
+
+    def test_load_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'rates.csv')
+            with open(path, 'w') as fileobj:
+                fileobj.write("date,currency,rate\n2026-03-02,EUR,0.85\n")
+            out = io.StringIO()
+            call_command('load_exchange_rates', path, stdout=out)
+        self.assertIn('Loaded 1 exchange rates', out.getvalue())
+        self.assertEqual(ExchangeRate.objects.get(date=date(2026, 3, 2)).source, 'rates.csv')
+
+
+class PriceHistoryTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.jan = date(2026, 1, 1)
+        self.entities = [Entity.objects.create(name=f'LLC {n}') for n in range(5)]
+        self.prices = []
+        for entity in self.entities:
+            price = EntityPrice.objects.create(
+                entity=entity, base_currency='USD', markup_type='FIXED',
+                markup_value=100, valid_from=self.jan,
+            )
+            IncorporationCost.objects.create(
+                entity_price=price, name='Filing', cost_type='LEGAL_FEE', value=1000,
+            )
+            self.prices.append(price)
+
+    def test_costs_default_to_price_validity(self):
+        self.assertEqual(self.prices[0].costs.get().valid_from, self.jan)
+
+    def test_revise_keeps_history(self):
+        old = self.prices[0]
+        new = old.revise(date(2026, 3, 1), markup_value=200)
+        IncorporationCost.objects.create(
+            entity_price=new, name='Agent', cost_type='SERVICE_PROVIDER', value=50,
+        )
+
+        old.refresh_from_db()
+        self.assertEqual(old.valid_to, date(2026, 3, 1))
+        self.assertEqual(old.get_total_cost(), Decimal('1100'))
+        self.assertEqual(new.get_total_cost(), Decimal('1250'))
+        self.assertEqual(EntityPrice.objects.filter(entity=self.entities[0]).count(), 2)
+
+        feb = EntityPrice.objects.in_force(date(2026, 2, 15)).get(entity=self.entities[0])
+        self.assertEqual((feb.pk, feb.total_cost), (old.pk, Decimal('1100')))
+        current = EntityPrice.objects.in_force().get(entity=self.entities[0])
+        self.assertEqual((current.pk, current.total_cost), (new.pk, Decimal('1250')))
+        self.assertFalse(EntityPrice.objects.as_of(date(2025, 12, 31)).exists())
+
+        with self.assertRaises(ValidationError):
+            old.revise(date(2026, 4, 1))
+        with self.assertRaises(ValidationError):
+            new.revise(date(2026, 2, 1))
+
+    def test_scheduled_revision_is_not_in_force_yet(self):
+        today = timezone.localdate()
+        new = self.prices[0].revise(today + timedelta(days=30), markup_value=999)
+
+        current = EntityPrice.objects.in_force().get(entity=self.entities[0])
+        self.assertEqual((current.pk, current.total_cost), (self.prices[0].pk, Decimal('1100')))
+        self.assertEqual(EntityPrice.objects.current().get(entity=self.entities[0]), self.prices[0])
+        later = EntityPrice.objects.in_force(today + timedelta(days=30)).get(entity=self.entities[0])
+        self.assertEqual((later.pk, later.total_cost), (new.pk, Decimal('1999')))
+
+    def test_removed_cost_drops_out_of_later_dates(self):
+        cost = self.prices[0].costs.get()
+        cost.valid_to = date(2026, 2, 1)
+        cost.save()
+        self.assertEqual(
+            EntityPrice.objects.in_force(date(2026, 1, 31)).get(pk=self.prices[0].pk).base_cost,
+            Decimal('1000'),
+        )
+        self.assertEqual(
+            EntityPrice.objects.in_force(date(2026, 2, 1)).get(pk=self.prices[0].pk).base_cost,
+            Decimal('0'),
+        )
+
+    def test_as_of_many_entities_in_one_query(self):
+        for price in self.prices[:3]:
+            price.revise(date(2026, 6, 1), markup_value=500)
+
+        ids = [entity.pk for entity in self.entities]
+
+        def totals(day=None):
+            prices = EntityPrice.objects.in_force(day).filter(entity_id__in=ids)
+            return {price.entity_id: price.total_cost for price in prices}
+
+        with self.assertNumQueries(1):
+            may = totals(date(2026, 5, 31))
+        with self.assertNumQueries(1):
+            today = totals()
+        self.assertEqual(set(may.values()), {Decimal('1100')})
+        self.assertEqual(sorted(today.values()), [Decimal('1100')] * 2 + [Decimal('1500')] * 3)
+
+    def test_one_current_price_per_entity(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            EntityPrice.objects.create(
+                entity=self.entities[0], base_currency='EUR', markup_type='FIXED',
+                markup_value=1, valid_from=date(2026, 2, 1),
+            )
+
+    def test_historical_quote(self):
+        structure = Structure.objects.create(name='Holding', description='Test')
+        StructureNode.objects.create(
+            structure=structure, entity_template=self.entities[0], custom_name='Top',
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.prices[0].revise(date(2026, 6, 1), markup_value=900)
+
+        self.client.force_login(User.objects.create_superuser('admin', 'a@example.com', 'pw'))
+        url = f'/corporate/api/structures/{structure.pk}/quote/'
+        self.assertEqual(
+            Decimal(self.client.get(url).json()['totals']['USD']['total_cost']), 1900
+        )
+        self.assertEqual(
+            Decimal(self.client.get(url, {'on': '2026-02-01'}).json()['totals']['USD']['total_cost']),
+            1100,
+        )
+        self.assertEqual(self.client.get(url, {'on': 'yesterday'}).status_code, 400)
+
+
+class BillingRunTest(TestCase):
+    def setUp(self):
+        self.period = month_period(2026, 9)
+        executor = User.objects.create_user('executor')
+        self.partners = []
+        for n in range(4):
+            party = Party.objects.create(name=f'Client {n}', person_type='JURIDICAL_PERSON')
+            partner = Partner.objects.create(party=party, company_name=f'Client {n}', address='x')
+            self.partners.append(partner)
+            structure = Structure.objects.create(name=f'Holding {n}', description='Test')
+            relationship = RelationshipStructure.objects.create(structure=structure, client=partner)
+            for currency in ('USD', 'EUR'):
+                service = Service.objects.create(
+                    name=f'{currency} filing', service_price=100, regulator_fee=10,
+                    executor=executor, counterparty_name='Registry',
+                    relationship_structure=relationship,
+                )
+                price = ServicePrice.objects.create(
+                    service=service, base_currency=currency, markup_type='PERCENTAGE',
+                    markup_value=10, valid_from=date(2026, 1, 1),
+                )
+                ServiceCost.objects.create(
+                    service_price=price, name='Registry', cost_type='LEGAL_FEE', value=100,
+                )
+        # Unpriced and archived relationships are not billed
+        structure = Structure.objects.create(name='Unpriced', description='Test')
+        RelationshipStructure.objects.create(structure=structure, client=self.partners[0])
+        structure = Structure.objects.create(name='Archived', description='Test')
+        RelationshipStructure.objects.create(
+            structure=structure, client=self.partners[1], status='ARCHIVED',
+        )
+
+    def test_month_period(self):
+        self.assertEqual(month_period(2028, 2), (date(2028, 2, 1), date(2028, 2, 29)))
+
+    def test_chunk_queries_do_not_grow_with_clients(self):
+        ids = [partner.pk for partner in self.partners]
+        with self.assertNumQueries(7) as queries:
+            stats = bill_clients(ids[:1], *self.period)
+        self.assertEqual(stats, {'invoices': 2, 'lines': 2, 'skipped': 0, 'unpriced': 1})
+        with self.assertNumQueries(len(queries.captured_queries)):
+            stats = bill_clients(ids[1:], *self.period)
+        self.assertEqual(stats['invoices'], 6)
+
+    def test_run_writes_invoices_per_currency_and_is_restartable(self):
+        chunks = list(run_billing(*self.period, chunk_size=3))
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(Invoice.objects.count(), 8)
+        self.assertEqual(InvoiceLine.objects.count(), 8)
+
+        invoice = Invoice.objects.get(client=self.partners[2], currency='EUR')
+        self.assertEqual(invoice.status, 'DRAFT')
+        self.assertEqual(invoice.total, Decimal('110.00'))
+        self.assertEqual(invoice.period_end, date(2026, 9, 30))
+        line = invoice.lines.get()
+        self.assertEqual((line.description, line.base_cost, line.amount), (
+            'EUR filing', Decimal('100.00'), Decimal('110.00'),
+        ))
+
+        # A second run only skips what is already invoiced
+        Invoice.objects.filter(client=self.partners[3]).delete()
+        stats = [chunk_stats for _, chunk_stats in run_billing(*self.period, chunk_size=3)]
+        self.assertEqual(sum(s['invoices'] for s in stats), 2)
+        self.assertEqual(sum(s['skipped'] for s in stats), 3)
+        self.assertEqual(Invoice.objects.count(), 8)
+
+    def test_prices_in_force_at_period_end(self):
+        price = ServicePrice.objects.get(
+            service__relationship_structure__client=self.partners[0], base_currency='USD',
+        )
+        price.revise(date(2026, 10, 1), markup_value=50)
+        list(run_billing(*self.period))
+        invoice = Invoice.objects.get(client=self.partners[0], currency='USD')
+        self.assertEqual(invoice.total, Decimal('110.00'))
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('run_billing', '--period', '2026-09', '--chunk-size', '2', stdout=out)
+        self.assertIn('Created 8 draft invoices with 8 lines', out.getvalue())
+        self.assertIn('1 without priced services', out.getvalue())
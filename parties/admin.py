@@ -1,5 +1,10 @@
 from django.contrib import admin
-from .models import Party, PartyRole, Passport, BeneficiaryRelation, DocumentAttachment
+from django.core.exceptions import ValidationError
+from django.forms.models import BaseInlineFormSet
+from django.urls import reverse
+
+from .beneficiaries import save_allocation, validate_allocation
+from .models import Party, PartyRole, Passport, PassportExpiryNotice, BeneficiaryRelation, DocumentAttachment
 
 
 class PartyRoleInline(admin.TabularInline):
@@ -21,11 +26,38 @@ class DocumentAttachmentInline(admin.TabularInline):
     fields = ['document_type', 'url', 'description', 'active']
 
 
+class BeneficiaryAllocationFormSet(BaseInlineFormSet):
+    """
+    Validates a giver's beneficiaries as one set (no per-row Sum) and lets
+    PartyAdmin.save_formset write them in bulk
+    """
+
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        form.instance.skip_allocation_check = True
+        return form
+
+    def clean(self):
+        super().clean()
+        relations = [
+            form.instance for form in self.forms
+            if form.cleaned_data and not form.cleaned_data.get('DELETE')
+            and form.instance.beneficiary_id
+        ]
+        try:
+            # The inline lists every relation of the giver, so nothing else counts
+            validate_allocation(relations)
+        except ValidationError as e:
+            raise ValidationError(e.messages)
+
+
 class BeneficiaryRelationInline(admin.TabularInline):
     model = BeneficiaryRelation
+    formset = BeneficiaryAllocationFormSet
     fk_name = 'giver_party'
     extra = 0
     fields = ['beneficiary', 'percentage', 'conditions', 'effective_date', 'active']
+    autocomplete_fields = ['beneficiary']
 
 
 @admin.register(Party)
@@ -58,12 +90,27 @@ class PartyAdmin(admin.ModelAdmin):
     )
     readonly_fields = ['created_at', 'updated_at']
 
+    def get_search_results(self, request, queryset, search_term):
+        # O autocomplete usa os índices de busca (PartyQuerySet.search); o
+        # changelist mantém a busca por substring de search_fields
+        if request.path == reverse(f'{self.admin_site.name}:autocomplete'):
+            return queryset.search(search_term), False
+        return super().get_search_results(request, queryset, search_term)
+
+    def save_formset(self, request, form, formset, change):
+        if formset.model is not BeneficiaryRelation:
+            return super().save_formset(request, form, formset, change)
+        # Beneficiários gravados em lote (um aggregate, bulk_create/bulk_update)
+        relations = formset.save(commit=False)
+        save_allocation(form.instance, relations, formset.deleted_objects)
+
 
 @admin.register(PartyRole)
 class PartyRoleAdmin(admin.ModelAdmin):
     list_display = ['party', 'role_type', 'context', 'active', 'created_at']
     list_filter = ['role_type', 'active', 'created_at']
     search_fields = ['party__name', 'context']
+    autocomplete_fields = ['party']
     
     fieldsets = (
         ('Role Information', {
@@ -82,6 +129,8 @@ class PassportAdmin(admin.ModelAdmin):
     list_display = ['party', 'number', 'issuing_country', 'expires_at', 'is_expiring_soon_display', 'active']
     list_filter = ['issuing_country', 'active', 'expires_at']
     search_fields = ['party__name', 'number']
+    autocomplete_fields = ['party']
+    list_select_related = ['party']
     
     def is_expiring_soon_display(self, obj):
         return obj.is_expiring_soon()
@@ -106,11 +155,21 @@ class PassportAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at', 'updated_at']
 
 
+@admin.register(PassportExpiryNotice)
+class PassportExpiryNoticeAdmin(admin.ModelAdmin):
+    list_display = ['passport', 'window_days', 'expires_at', 'recipients', 'notified_at']
+    list_filter = ['window_days', 'notified_at']
+    search_fields = ['passport__party__name', 'recipients']
+    list_select_related = ['passport__party']
+    readonly_fields = ['passport', 'window_days', 'expires_at', 'recipients', 'notified_at']
+
+
 @admin.register(BeneficiaryRelation)
 class BeneficiaryRelationAdmin(admin.ModelAdmin):
     list_display = ['get_giver_display', 'beneficiary', 'percentage', 'effective_date', 'active']
     list_filter = ['active', 'effective_date', 'created_at']
     search_fields = ['giver_party__name', 'giver_entity__name', 'beneficiary__name']
+    autocomplete_fields = ['giver_party', 'giver_entity', 'beneficiary']
     
     def get_giver_display(self, obj):
         if obj.giver_party:
@@ -147,6 +206,7 @@ class DocumentAttachmentAdmin(admin.ModelAdmin):
     list_display = ['party', 'document_type', 'description', 'active', 'uploaded_at']
     list_filter = ['document_type', 'active', 'uploaded_at']
     search_fields = ['party__name', 'description']
+    autocomplete_fields = ['party']
     
     fieldsets = (
         ('Document Information', {
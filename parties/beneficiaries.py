@@ -0,0 +1,150 @@
+"""
+Bulk beneficiary allocation
+
+Saves the whole set of BeneficiaryRelations of one giver (Party or Entity) at
+once, for the allocation API and the PartyAdmin inline, instead of one save()
+per relation (row lock, Sum aggregate, insert and PartyRole get_or_create
+each). The set is validated in Python; under a lock on the giver row, a single
+aggregate adds the giver's active relations left out of the set. Relations are
+then written with bulk_update/bulk_create and the BENEFICIARY roles synced
+with one bulk_create(ignore_conflicts=True), so the query count does not grow
+with the number of beneficiaries.
+"""
+
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import BeneficiaryRelation, Party
+
+RELATION_FIELDS = ['beneficiary', 'percentage', 'conditions', 'effective_date', 'active', 'updated_at']
+
+
+def giver_field(giver):
+    return 'giver_party' if isinstance(giver, Party) else 'giver_entity'
+
+
+def validate_allocation(relations, others_total=0):
+    """
+    Check a set of relations of one giver without touching the database: a
+    beneficiary at most once among the active ones and, with ``others_total``
+    already allocated elsewhere, no more than 100% in total.
+    """
+    errors = []
+    seen = set()
+    total = Decimal(others_total)
+    for relation in relations:
+        if not relation.active:
+            continue
+        if relation.beneficiary_id in seen:
+            errors.append(f"Beneficiary {relation.beneficiary_id} is listed more than once")
+        seen.add(relation.beneficiary_id)
+        total += Decimal(str(relation.percentage))
+    if total > 100:
+        errors.append(f"Total benefits cannot exceed 100% (got {total}%)")
+    if errors:
+        raise ValidationError(errors)
+
+
+def save_allocation(giver, relations, deleted=()):
+    """
+    Write new and changed ``relations`` of ``giver`` and delete ``deleted``.
+
+    Relations of the giver not passed in either list are only summed, under
+    a lock on the giver row, to validate the total. Raises ValidationError
+    before anything is written.
+    """
+    relations = list(relations)
+    deleted_pks = [relation.pk for relation in deleted if relation.pk]
+    field = giver_field(giver)
+    now = timezone.now()
+    for relation in relations:
+        setattr(relation, field, giver)
+        relation.updated_at = now  # bulk_update não aplica auto_now
+        relation.skip_allocation_check = True
+
+    with transaction.atomic():
+        list(
+            type(giver)._base_manager.select_for_update()
+            .filter(pk=giver.pk).values_list('pk', flat=True)
+        )
+        others = (
+            BeneficiaryRelation.objects.filter(active=True, **{field: giver})
+            .exclude(pk__in=[relation.pk for relation in relations if relation.pk] + deleted_pks)
+            .aggregate(total=models.Sum('percentage'))['total']
+        )
+        validate_allocation(relations, others or 0)
+
+        if deleted_pks:
+            BeneficiaryRelation.objects.filter(pk__in=deleted_pks).delete()
+        BeneficiaryRelation.objects.bulk_update(
+            [relation for relation in relations if relation.pk], RELATION_FIELDS
+        )
+        BeneficiaryRelation.objects.bulk_create(
+            [relation for relation in relations if not relation.pk]
+        )
+        BeneficiaryRelation.sync_roles(relations)
+    return relations
+
+
+def _parse(item):
+    try:
+        beneficiary_id = int(item['beneficiary'])
+        percentage = Decimal(str(item['percentage']))
+    except (KeyError, TypeError, ValueError, InvalidOperation):
+        raise ValidationError("Each allocation needs a beneficiary id and a percentage")
+    effective_date = item.get('effective_date')
+    if effective_date:
+        try:
+            effective_date = parse_date(effective_date)
+        except (TypeError, ValueError):
+            effective_date = None
+        if effective_date is None:
+            raise ValidationError("effective_date must be YYYY-MM-DD")
+    return beneficiary_id, {
+        'percentage': percentage,
+        'conditions': item.get('conditions') or '',
+        'effective_date': effective_date or None,
+        'active': bool(item.get('active', True)),
+    }
+
+
+def allocate_beneficiaries(giver, allocations, replace=False):
+    """
+    Set the beneficiaries of ``giver`` from ``allocations``: dicts with a
+    ``beneficiary`` id, a ``percentage`` and optional ``conditions``,
+    ``effective_date`` and ``active``.
+
+    The giver's existing relation with a listed beneficiary is updated, other
+    beneficiaries get a new relation. With ``replace`` the active relations
+    of beneficiaries not listed are deactivated. Returns the saved relations.
+    """
+    parsed = dict(_parse(item) for item in allocations)
+    if len(parsed) != len(allocations):
+        raise ValidationError("A beneficiary is listed more than once")
+    found = set(Party.objects.filter(pk__in=parsed).values_list('pk', flat=True))
+    missing = sorted(set(parsed) - found)
+    if missing:
+        raise ValidationError(f"Unknown beneficiaries: {missing}")
+
+    existing = {}
+    for relation in BeneficiaryRelation.objects.filter(**{giver_field(giver): giver}).order_by('pk'):
+        existing.setdefault(relation.beneficiary_id, relation)
+
+    relations = []
+    for beneficiary_id, values in parsed.items():
+        relation = existing.get(beneficiary_id) or BeneficiaryRelation(beneficiary_id=beneficiary_id)
+        for name, value in values.items():
+            setattr(relation, name, value)
+        relation.clean_fields(exclude=['giver_party', 'giver_entity', 'beneficiary'])
+        relations.append(relation)
+    if replace:
+        for beneficiary_id, relation in existing.items():
+            if beneficiary_id not in parsed and relation.active:
+                relation.active = False
+                relations.append(relation)
+
+    return save_allocation(giver, relations)
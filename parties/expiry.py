@@ -0,0 +1,131 @@
+"""
+Passport expiry notices
+
+The scan_passport_expiry command finds active passports expiring within the
+notice windows (settings.PASSPORT_EXPIRY_WINDOWS, e.g. 90, 30 and 7 days) with
+one query on the expires_at index. Each passport is annotated with the
+smallest window it falls in and skipped when a PassportExpiryNotice already
+exists for that window and expiration date, so a daily run only picks up
+passports that crossed into a new window and a repeat run finds nothing.
+
+Passports are grouped per responsible manager (the executors of services on
+structures where the party owns nodes; parties without one go to
+PASSPORT_EXPIRY_NOTIFY_EMAILS) and per party, and each manager gets a single
+digest e-mail. Each digest is sent in its own transaction, together with the
+notices of its passports, so when a delivery fails the digests already sent
+stay recorded and only the passports of the failed one are retried next run
+(a passport shared with a digest that went out keeps that notice, whose
+recipients list who actually received it).
+"""
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from corporate_relationship.models import Service
+from .models import Passport, PassportExpiryNotice
+
+
+def due_passports(windows, today=None):
+    """Passports in a notice window not yet notified for it, with their party"""
+    notified = PassportExpiryNotice.objects.filter(
+        passport=OuterRef('pk'),
+        window_days=OuterRef('expiry_window'),
+        expires_at=OuterRef('expires_at'),
+    )
+    return list(
+        Passport.objects.with_expiry_window(windows, today)
+        .exclude(Exists(notified))
+        .select_related('party')
+        .order_by('expires_at', 'pk')
+    )
+
+
+def responsible_managers(party_ids):
+    """{party_id: {(username, email)}} of the executors serving each party's structures"""
+    owner = 'relationship_structure__structure__node_ownerships__owner_party_id'
+    rows = (
+        Service.objects.filter(**{f'{owner}__in': party_ids})
+        .filter(relationship_structure__status='ACTIVE')
+        .exclude(executor__email='')
+        .values_list(owner, 'executor__username', 'executor__email')
+        .distinct()
+        .order_by()
+    )
+    managers = {}
+    for party_id, username, email in rows:
+        managers.setdefault(party_id, set()).add((username, email))
+    return managers
+
+
+def build_digests(passports, managers, fallback_emails=()):
+    """
+    {email: digest} with the passports of each recipient grouped by party,
+    and the passports that have no recipient at all.
+    """
+    digests = {}
+    unrouted = []
+    for passport in passports:
+        recipients = managers.get(passport.party_id) or {(None, email) for email in fallback_emails}
+        if not recipients:
+            unrouted.append(passport)
+        for username, email in sorted(recipients, key=lambda recipient: recipient[1]):
+            digest = digests.setdefault(email, {'email': email, 'manager': username, 'parties': {}})
+            digest['parties'].setdefault(passport.party.name, []).append(passport)
+    return digests, unrouted
+
+
+def digest_message(digest, today):
+    passports = [passport for group in digest['parties'].values() for passport in group]
+    lines = [f"Hello {digest['manager'] or 'team'},", '', 'Passports expiring soon:']
+    for party, party_passports in sorted(digest['parties'].items()):
+        lines.append('')
+        lines.append(party)
+        for passport in party_passports:
+            lines.append(
+                f"  - {passport.get_issuing_country_display()} passport ending "
+                f"{passport.number[-4:]}: expires {passport.expires_at} "
+                f"({(passport.expires_at - today).days} days)"
+            )
+    return EmailMessage(
+        subject=f"Passport expiry digest: {len(passports)} passport(s)",
+        body='\n'.join(lines),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[digest['email']],
+    )
+
+
+def run_scan(windows=None, today=None, dry_run=False):
+    """
+    Notify the passports that entered a window since the last scan.
+
+    Returns the passports found, the digests (sent unless ``dry_run``) and
+    the passports without any recipient, which are left to a later run.
+    """
+    windows = windows or settings.PASSPORT_EXPIRY_WINDOWS
+    today = today or timezone.localdate()
+    passports = due_passports(windows, today)
+    managers = responsible_managers({passport.party_id for passport in passports}) if passports else {}
+    digests, unrouted = build_digests(passports, managers, settings.PASSPORT_EXPIRY_NOTIFY_EMAILS)
+
+    if digests and not dry_run:
+        sent = {}
+        with get_connection() as connection:
+            for digest in digests.values():
+                notified = [passport for group in digest['parties'].values() for passport in group]
+                # Um bloco por digest: se o envio falhar, só os avisos deste digest voltam atrás
+                with transaction.atomic():
+                    for passport in notified:
+                        PassportExpiryNotice.objects.update_or_create(
+                            passport=passport,
+                            window_days=passport.expiry_window,
+                            expires_at=passport.expires_at,
+                            defaults={'recipients': ', '.join(sent.get(passport, []) + [digest['email']])},
+                        )
+                    connection.send_messages([digest_message(digest, today)])
+                for passport in notified:
+                    sent.setdefault(passport, []).append(digest['email'])
+
+    return {'passports': passports, 'digests': digests, 'unrouted': unrouted}
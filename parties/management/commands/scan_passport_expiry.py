@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from parties.expiry import run_scan
+
+
+class Command(BaseCommand):
+    help = 'Send digests of passports entering an expiry notice window'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--windows',
+            default=','.join(str(days) for days in settings.PASSPORT_EXPIRY_WINDOWS),
+            help='Comma-separated notice windows in days (e.g. 90,30,7)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the digests without sending or recording them',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            windows = [int(days) for days in options['windows'].split(',') if days.strip()]
+        except ValueError:
+            raise CommandError('--windows must be comma-separated numbers of days')
+        if not windows or min(windows) < 0:
+            raise CommandError('--windows must list at least one non-negative window')
+
+        result = run_scan(windows, dry_run=options['dry_run'])
+
+        self.stdout.write(f"{len(result['passports'])} passports entered a notice window")
+        for email, digest in result['digests'].items():
+            count = sum(len(group) for group in digest['parties'].values())
+            self.stdout.write(f"   - {email}: {count} passports, {len(digest['parties'])} parties")
+        if result['unrouted']:
+            self.stdout.write(self.style.WARNING(
+                f"{len(result['unrouted'])} passports have no responsible manager; "
+                "set PASSPORT_EXPIRY_NOTIFY_EMAILS"
+            ))
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS("Dry run: nothing sent"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{len(result['digests'])} digests sent"))
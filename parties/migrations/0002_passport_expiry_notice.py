@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parties', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PassportExpiryNotice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window_days', models.PositiveIntegerField(help_text='Notice window the passport fell in')),
+                ('expires_at', models.DateField(help_text='Expiration date at the time of the notice')),
+                ('recipients', models.TextField(blank=True, help_text='Comma-separated e-mail addresses')),
+                ('notified_at', models.DateTimeField(auto_now_add=True)),
+                ('passport', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='expiry_notices', to='parties.passport')),
+            ],
+            options={
+                'verbose_name': 'Passport Expiry Notice',
+                'verbose_name_plural': 'Passport Expiry Notices',
+                'ordering': ['-notified_at'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='passportexpirynotice',
+            constraint=models.UniqueConstraint(fields=('passport', 'window_days', 'expires_at'), name='unique_passport_expiry_notice'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:35
+
+from django.db import migrations, models
+
+
+def check_existing_rows(apps, schema_editor):
+    """
+    Stop with the offending rows before AddConstraint does: the database would
+    only report that some row violates the check. Nothing is fixed here, since
+    which owner or percentage is right has to be decided on the data itself.
+    """
+    violations = []
+    for operation in Migration.operations:
+        if not isinstance(operation, migrations.AddConstraint):
+            continue
+        model = apps.get_model('parties', operation.model_name)
+        pks = list(
+            model._base_manager.exclude(operation.constraint.check)
+            .order_by('pk').values_list('pk', flat=True)[:50]
+        )
+        if pks:
+            violations.append(f"{operation.constraint.name}: {model.__name__} pk {pks}")
+    if violations:
+        raise ValueError(
+            "Fix these rows before applying the allocation constraints:\n  "
+            + "\n  ".join(violations)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parties', '0002_passport_expiry_notice'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_existing_rows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='beneficiaryrelation',
+            constraint=models.CheckConstraint(check=models.Q(models.Q(('giver_entity__isnull', True), ('giver_party__isnull', False)), models.Q(('giver_entity__isnull', False), ('giver_party__isnull', True)), _connector='OR'), name='beneficiary_relation_one_giver', violation_error_message='Must specify exactly one giver (Party or Entity)'),
+        ),
+        migrations.AddConstraint(
+            model_name='beneficiaryrelation',
+            constraint=models.CheckConstraint(check=models.Q(('percentage__gt', 0), ('percentage__lte', 100)), name='beneficiary_relation_percentage_range', violation_error_message='percentage must be between 0.01 and 100'),
+        ),
+    ]
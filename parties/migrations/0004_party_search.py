@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:44
+
+from django.db import migrations
+
+SEARCH_FIELDS = ['name', 'email', 'tax_identification_number']
+PREFIX_INDEXES = {
+    'name': 'party_name_lower_idx',
+    'email': 'party_email_lower_idx',
+    'tax_identification_number': 'party_tin_lower_idx',
+}
+
+
+# Cada backend recebe só os índices que PartyQuerySet.search usa nele
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        # Busca por substring (icontains) via pg_trgm
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for field in SEARCH_FIELDS:
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS party_{field[:12]}_trgm_idx '
+                f'ON parties_party USING gin (UPPER({field}) gin_trgm_ops)'
+            )
+    else:
+        # Busca por prefixo: faixa sobre LOWER(campo)
+        for field, name in PREFIX_INDEXES.items():
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS {name} ON parties_party (LOWER({field}))'
+            )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        names = [f'party_{field[:12]}_trgm_idx' for field in SEARCH_FIELDS]
+    else:
+        names = PREFIX_INDEXES.values()
+    for name in names:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parties', '0003_allocation_constraints'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -1,9 +1,47 @@
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db import models
+from django.db import connections, models
+from django.db.models.functions import Lower
 from django.utils import timezone
 from datetime import timedelta
 
+from corporate.mixins import AllocationMixin, exactly_one, percentage_range
+
+
+# Campos da busca de parties (PartyQuerySet.search)
+SEARCH_FIELDS = ('name', 'email', 'tax_identification_number')
+
+
+class PartyQuerySet(models.QuerySet):
+    """Busca por nome, e-mail e TIN servida por índice"""
+
+    def search(self, term):
+        """
+        Parties matching ``term`` in name, e-mail or TIN.
+
+        On PostgreSQL any substring matches (trigram indexes, migration 0004).
+        Elsewhere the term must start the field: a range over the LOWER()
+        expression indexes (created only on those backends, also in 0004),
+        since LIKE cannot use an index on SQLite.
+        """
+        term = term.strip()
+        if not term:
+            return self
+        if connections[self.db].vendor == 'postgresql':
+            query = models.Q()
+            for field in SEARCH_FIELDS:
+                query |= models.Q(**{f'{field}__icontains': term})
+            return self.filter(query)
+
+        # LOWER() do SQLite só converte ASCII
+        prefix = ''.join(char.lower() if char.isascii() else char for char in term)
+        query = models.Q()
+        for field in SEARCH_FIELDS:
+            query |= models.Q(**{f'{field}_key__gte': prefix, f'{field}_key__lt': prefix + '\U0010ffff'})
+        return self.annotate(
+            **{f'{field}_key': Lower(field) for field in SEARCH_FIELDS}
+        ).filter(query)
+
 
 class Party(models.Model):
     """
@@ -80,6 +118,8 @@ class Party(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PartyQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Party"
         verbose_name_plural = "Parties"
@@ -90,6 +130,7 @@ class Party(models.Model):
             models.Index(fields=["nationality"]),
             models.Index(fields=["active"]),
             models.Index(fields=["is_partner"]),
+            # Índices da busca (PartyQuerySet.search) por backend: migração 0004
         ]
 
     def __str__(self):
@@ -161,6 +202,34 @@ class PartyRole(models.Model):
         return f"{self.party.name} - {self.get_role_type_display()}{context_str}"
 
 
+class PassportQuerySet(models.QuerySet):
+    """Filtros de vencimento calculados no banco (índice de expires_at)"""
+
+    def expiring(self, days=30, today=None):
+        """Active passports expiring between today and today + ``days``"""
+        today = today or timezone.localdate()
+        return self.filter(
+            active=True, expires_at__gte=today, expires_at__lte=today + timedelta(days=days)
+        )
+
+    def with_expiry_window(self, windows, today=None):
+        """
+        Active passports expiring within the largest of ``windows`` (days),
+        annotated with expiry_window: the smallest window each one falls in.
+        """
+        today = today or timezone.localdate()
+        windows = sorted(set(windows))
+        return self.expiring(windows[-1], today).annotate(
+            expiry_window=models.Case(
+                *[
+                    models.When(expires_at__lte=today + timedelta(days=days), then=models.Value(days))
+                    for days in windows
+                ],
+                output_field=models.IntegerField(),
+            )
+        )
+
+
 class Passport(models.Model):
     """
     Multiple passport management for parties
@@ -181,6 +250,8 @@ class Passport(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PassportQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Passport"
         verbose_name_plural = "Passports"
@@ -208,15 +279,38 @@ class Passport(models.Model):
     @classmethod
     def get_expiring_passports(cls, days=30):
         """Get all passports expiring within specified days"""
-        cutoff_date = timezone.now().date() + timedelta(days=days)
-        return cls.objects.filter(
-            expires_at__lte=cutoff_date,
-            expires_at__gte=timezone.now().date(),
-            active=True
-        )
+        return cls.objects.expiring(days)
 
 
-class BeneficiaryRelation(models.Model):
+class PassportExpiryNotice(models.Model):
+    """
+    Record of a passport expiry notification (scan_passport_expiry).
+    One per passport, window and expiration date: repeat scans skip what was
+    already notified, and a renewed passport (new expires_at) is notified again.
+    """
+
+    passport = models.ForeignKey(Passport, on_delete=models.CASCADE, related_name='expiry_notices')
+    window_days = models.PositiveIntegerField(help_text="Notice window the passport fell in")
+    expires_at = models.DateField(help_text="Expiration date at the time of the notice")
+    recipients = models.TextField(blank=True, help_text="Comma-separated e-mail addresses")
+    notified_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Passport Expiry Notice"
+        verbose_name_plural = "Passport Expiry Notices"
+        ordering = ["-notified_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["passport", "window_days", "expires_at"],
+                name="unique_passport_expiry_notice",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.passport} - {self.window_days} days"
+
+
+class BeneficiaryRelation(AllocationMixin, models.Model):
     """
     Manages beneficiary relationships (formerly Successor)
     Enhanced to handle Entity and UBO givers
@@ -269,6 +363,16 @@ class BeneficiaryRelation(models.Model):
             models.Index(fields=["beneficiary"]),
             models.Index(fields=["active"]),
         ]
+        constraints = [
+            exactly_one(
+                "beneficiary_relation_one_giver", "giver_party", "giver_entity",
+                message="Must specify exactly one giver (Party or Entity)",
+            ),
+            percentage_range("beneficiary_relation_percentage_range", "percentage"),
+        ]
+
+    # Active benefits of a giver (AllocationMixin)
+    allocation_message = "Total benefits cannot exceed 100% (available: {available}%)"
 
     def __str__(self):
         giver_name = ""
@@ -280,46 +384,59 @@ class BeneficiaryRelation(models.Model):
         return f"{giver_name} → {self.beneficiary.name} ({self.percentage}%)"
 
     def clean(self):
-        # Validate exactly one giver type
-        giver_count = sum([bool(self.giver_party), bool(self.giver_entity)])
-        if giver_count != 1:
-            raise ValidationError("Must specify exactly one giver (Party or Entity)")
-
-        # Validate total percentages don't exceed 100%
-        self.validate_percentage_total()
-
-    def validate_percentage_total(self):
-        """Ensure total benefits from same giver don't exceed 100%"""
-        if self.giver_party:
-            total = BeneficiaryRelation.objects.filter(
-                giver_party=self.giver_party,
-                active=True
-            ).exclude(pk=self.pk).aggregate(
-                total=models.Sum('percentage')
-            )['total'] or 0
+        # Exactly one giver is enforced by a constraint; save() rechecks the total under lock
+        self.check_allocation()
+
+    def allocation_parent(self):
+        if self.giver_party_id:
+            return Party, self.giver_party_id
+        if self.giver_entity_id:
+            return self._meta.get_field('giver_entity').related_model, self.giver_entity_id
+        return None
+
+    def allocation_siblings(self):
+        if self.giver_party_id:
+            givers = {'giver_party_id': self.giver_party_id}
         else:
-            total = BeneficiaryRelation.objects.filter(
-                giver_entity=self.giver_entity,
-                active=True
-            ).exclude(pk=self.pk).aggregate(
-                total=models.Sum('percentage')
-            )['total'] or 0
+            givers = {'giver_entity_id': self.giver_entity_id}
+        return BeneficiaryRelation.objects.filter(active=True, **givers)
 
-        if total + self.percentage > 100:
-            raise ValidationError("Total benefits cannot exceed 100%")
+    def counts_toward_allocation(self):
+        return self.active
 
     def save(self, *args, **kwargs):
         """Auto-create beneficiary role when saving (FASE 7)"""
         super().save(*args, **kwargs)
-        
-        # Automatically add role of beneficiary
-        beneficiary_role, created = PartyRole.objects.get_or_create(
-            party=self.beneficiary,
-            role_type='BENEFICIARY',
-            defaults={
-                'context': f'Beneficiary of {self.get_giver_name()}',
-                'active': True
-            }
+        self.sync_roles([self])
+
+    @staticmethod
+    def sync_roles(relations):
+        """
+        Give each beneficiary one BENEFICIARY role, in two queries.
+
+        Like a get_or_create on (party, role_type): a party that already has
+        the role keeps it, and the context names the first giver only.
+        """
+        roles = {}
+        for relation in relations:
+            roles.setdefault(relation.beneficiary_id, relation)
+        existing = set(
+            PartyRole.objects.filter(
+                party_id__in=roles, role_type='BENEFICIARY'
+            ).values_list('party_id', flat=True)
+        )
+        PartyRole.objects.bulk_create(
+            [
+                PartyRole(
+                    party_id=party_id,
+                    role_type='BENEFICIARY',
+                    context=f'Beneficiary of {relation.get_giver_name()}',
+                    active=True,
+                )
+                for party_id, relation in roles.items()
+                if party_id not in existing
+            ],
+            ignore_conflicts=True,
         )
 
     def get_giver_name(self):
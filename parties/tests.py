@@ -0,0 +1,318 @@
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.exceptions import ValidationError
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+
+from corporate.models import Entity, NodeOwnership, Structure, StructureNode
+from corporate_relationship.models import RelationshipStructure, Service
+from sales.models import Partner
+from .beneficiaries import allocate_beneficiaries
+from .expiry import run_scan
+from .models import BeneficiaryRelation, Party, PartyRole, Passport, PassportExpiryNotice
+
+
+@override_settings(PASSPORT_EXPIRY_NOTIFY_EMAILS=['compliance@example.com'])
+class PassportExpiryScanTest(TestCase):
+    def setUp(self):
+        self.today = date(2026, 1, 1)
+        self.windows = [90, 30, 7]
+        structure = Structure.objects.create(name='Holding', description='Test')
+        node = StructureNode.objects.create(
+            structure=structure, entity_template=Entity.objects.create(name='Wyoming LLC'),
+            custom_name='LLC',
+        )
+        self.owner = Party.objects.create(name='Jane Roe', person_type='NATURAL_PERSON')
+        NodeOwnership.objects.create(
+            structure=structure, owner_party=self.owner, owned_node=node, ownership_percentage=100,
+        )
+        partner = Partner.objects.create(
+            party=Party.objects.create(name='Acme Holdings', person_type='JURIDICAL_PERSON'),
+            company_name='Acme', address='Main St',
+        )
+        Service.objects.create(
+            name='Annual filing', service_price=100, regulator_fee=10,
+            executor=User.objects.create_user('manager', 'manager@example.com'),
+            counterparty_name='Registry',
+            relationship_structure=RelationshipStructure.objects.create(
+                structure=structure, client=partner,
+            ),
+        )
+
+        def passport(party, number, days):
+            return Passport.objects.create(
+                party=party, number=number, issued_at=date(2020, 1, 1),
+                expires_at=self.today + timedelta(days=days), issuing_country='BR',
+            )
+
+        self.soon = passport(self.owner, 'BR000001', 20)
+        passport(self.owner, 'BR000002', 80)
+        passport(self.owner, 'BR000003', 200)
+        passport(self.owner, 'BR000004', -1)
+        orphan = Party.objects.create(name='John Doe', person_type='NATURAL_PERSON')
+        passport(orphan, 'BR000005', 5)
+
+    def test_scan_sends_digests_once(self):
+        result = run_scan(self.windows, self.today)
+
+        self.assertEqual(len(result['passports']), 3)
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            ['compliance@example.com', 'manager@example.com'],
+        )
+        manager_digest = next(m for m in mail.outbox if m.to == ['manager@example.com'])
+        self.assertIn('Jane Roe', manager_digest.body)
+        self.assertIn('ending 0001: expires 2026-01-21 (20 days)', manager_digest.body)
+        self.assertNotIn('BR000001', manager_digest.body)
+        self.assertEqual(
+            sorted(PassportExpiryNotice.objects.values_list('window_days', flat=True)), [7, 30, 90]
+        )
+
+        with self.assertNumQueries(1):
+            result = run_scan(self.windows, self.today)
+        self.assertEqual(result['passports'], [])
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_failed_digest_does_not_resend_the_others(self):
+        send_messages = EmailBackend.send_messages
+
+        def fail_for_manager(backend, messages):
+            if messages[0].to == ['manager@example.com']:
+                raise ConnectionError('SMTP down')
+            return send_messages(backend, messages)
+
+        with mock.patch.object(EmailBackend, 'send_messages', fail_for_manager):
+            with self.assertRaises(ConnectionError):
+                run_scan(self.windows, self.today)
+        self.assertEqual([message.to for message in mail.outbox], [['compliance@example.com']])
+        self.assertEqual(
+            list(PassportExpiryNotice.objects.values_list('passport__number', 'recipients')),
+            [('BR000005', 'compliance@example.com')],
+        )
+
+        retry = run_scan(self.windows, self.today)
+        self.assertEqual(sorted(passport.number for passport in retry['passports']), ['BR000001', 'BR000002'])
+        self.assertEqual(
+            [message.to for message in mail.outbox],
+            [['compliance@example.com'], ['manager@example.com']],
+        )
+
+    def test_new_window_and_renewal_are_notified_again(self):
+        run_scan(self.windows, self.today)
+
+        later = run_scan(self.windows, self.today + timedelta(days=15))
+        self.assertEqual([passport.number for passport in later['passports']], ['BR000001'])
+        self.assertEqual(later['passports'][0].expiry_window, 7)
+
+        self.soon.expires_at = self.today + timedelta(days=25)
+        self.soon.save()
+        renewed = run_scan(self.windows, self.today)
+        self.assertEqual([passport.number for passport in renewed['passports']], ['BR000001'])
+
+    @override_settings(PASSPORT_EXPIRY_NOTIFY_EMAILS=[])
+    def test_unrouted_passports_wait_for_a_recipient(self):
+        result = run_scan(self.windows, self.today)
+        self.assertEqual([passport.number for passport in result['unrouted']], ['BR000005'])
+        self.assertFalse(PassportExpiryNotice.objects.filter(passport__number='BR000005').exists())
+
+    def test_command_dry_run(self):
+        out = StringIO()
+        call_command('scan_passport_expiry', '--dry-run', '--windows', '400', stdout=out)
+        self.assertIn('Dry run', out.getvalue())
+        self.assertEqual(mail.outbox, [])
+        self.assertFalse(PassportExpiryNotice.objects.exists())
+
+
+class BeneficiaryRelationTest(TestCase):
+    def setUp(self):
+        self.giver = Party.objects.create(name='Jane Roe', person_type='NATURAL_PERSON')
+        self.heirs = [
+            Party.objects.create(name=f'Heir {n}', person_type='NATURAL_PERSON') for n in range(3)
+        ]
+
+    def test_total_per_giver_is_capped(self):
+        BeneficiaryRelation.objects.create(giver_party=self.giver, beneficiary=self.heirs[0], percentage=70)
+        with self.assertRaisesMessage(ValidationError, 'available: 30'):
+            BeneficiaryRelation.objects.create(
+                giver_party=self.giver, beneficiary=self.heirs[1], percentage=40,
+            )
+        BeneficiaryRelation.objects.create(
+            giver_party=self.giver, beneficiary=self.heirs[1], percentage=40, active=False,
+        )
+        entity = Entity.objects.create(name='Bahamas Trust')
+        BeneficiaryRelation.objects.create(giver_entity=entity, beneficiary=self.heirs[2], percentage=100)
+
+        self.assertEqual(BeneficiaryRelation.objects.count(), 3)
+        self.assertTrue(PartyRole.objects.filter(party=self.heirs[0], role_type='BENEFICIARY').exists())
+
+    def test_one_beneficiary_role_per_party(self):
+        other = Party.objects.create(name='John Roe', person_type='NATURAL_PERSON')
+        BeneficiaryRelation.objects.create(giver_party=self.giver, beneficiary=self.heirs[0], percentage=50)
+        BeneficiaryRelation.objects.create(giver_party=other, beneficiary=self.heirs[0], percentage=50)
+        allocate_beneficiaries(other, [{'beneficiary': self.heirs[0].pk, 'percentage': 60}])
+
+        roles = PartyRole.objects.filter(party=self.heirs[0], role_type='BENEFICIARY')
+        self.assertEqual([role.context for role in roles], ['Beneficiary of Jane Roe'])
+
+    def test_exactly_one_giver(self):
+        relation = BeneficiaryRelation(beneficiary=self.heirs[0], percentage=10)
+        with self.assertRaisesMessage(ValidationError, 'exactly one giver'):
+            relation.full_clean()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            relation.save()
+
+
+class BeneficiaryAllocationTest(TestCase):
+    def setUp(self):
+        self.giver = Party.objects.create(name='Jane Roe', person_type='NATURAL_PERSON')
+        self.heirs = [
+            Party.objects.create(name=f'Heir {n}', person_type='NATURAL_PERSON') for n in range(20)
+        ]
+
+    def _allocations(self, heirs, percentage):
+        return [{'beneficiary': heir.pk, 'percentage': percentage} for heir in heirs]
+
+    def test_query_count_does_not_grow_with_beneficiaries(self):
+        with self.assertNumQueries(9) as few:
+            allocate_beneficiaries(self.giver, self._allocations(self.heirs[:2], 5))
+        with self.assertNumQueries(len(few.captured_queries)):
+            allocate_beneficiaries(self.giver, self._allocations(self.heirs[2:], 5))
+
+        self.assertEqual(BeneficiaryRelation.objects.filter(giver_party=self.giver).count(), 20)
+        self.assertEqual(
+            PartyRole.objects.filter(role_type='BENEFICIARY', context='Beneficiary of Jane Roe').count(),
+            20,
+        )
+
+    def test_total_includes_relations_outside_the_set(self):
+        allocate_beneficiaries(self.giver, self._allocations(self.heirs[:2], 40))
+        with self.assertRaisesMessage(ValidationError, 'cannot exceed 100%'):
+            allocate_beneficiaries(self.giver, self._allocations(self.heirs[2:3], 30))
+        self.assertEqual(BeneficiaryRelation.objects.count(), 2)
+
+        relations = allocate_beneficiaries(
+            self.giver, self._allocations(self.heirs[2:3], 30) + [
+                {'beneficiary': self.heirs[0].pk, 'percentage': '30.00', 'conditions': 'At 21'},
+            ],
+            replace=True,
+        )
+        self.assertEqual(len(relations), 3)
+        self.assertEqual(
+            dict(BeneficiaryRelation.objects.values_list('beneficiary__name', 'active')),
+            {'Heir 0': True, 'Heir 1': False, 'Heir 2': True},
+        )
+
+    def test_allocation_api(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'a@example.com', 'pw'))
+        url = f'/parties/api/party/{self.giver.pk}/beneficiaries/'
+        response = self.client.post(
+            url, {'beneficiaries': self._allocations(self.heirs[:4], 25)},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total'], '100.00')
+
+        response = self.client.post(
+            url, {'beneficiaries': [{'beneficiary': 0, 'percentage': 10}]},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get('/parties/api/entity/0/beneficiaries/').status_code, 404)
+
+    def test_admin_inline_saves_in_bulk(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'a@example.com', 'pw'))
+        data = {
+            'name': 'Jane Roe', 'person_type': 'NATURAL_PERSON', 'active': 'on',
+            'roles-TOTAL_FORMS': 0, 'roles-INITIAL_FORMS': 0,
+            'passports-TOTAL_FORMS': 0, 'passports-INITIAL_FORMS': 0,
+            'documents-TOTAL_FORMS': 0, 'documents-INITIAL_FORMS': 0,
+            'given_benefits-TOTAL_FORMS': 2, 'given_benefits-INITIAL_FORMS': 0,
+        }
+        for n in range(2):
+            data[f'given_benefits-{n}-beneficiary'] = self.heirs[n].pk
+            data[f'given_benefits-{n}-percentage'] = 60
+            data[f'given_benefits-{n}-active'] = 'on'
+        url = f'/admin/parties/party/{self.giver.pk}/change/'
+
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 200)  # form redisplayed with the error
+        self.assertContains(response, 'cannot exceed 100%')
+
+        data['given_benefits-1-percentage'] = 40
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(BeneficiaryRelation.objects.filter(giver_party=self.giver).count(), 2)
+
+
+class PartySearchTest(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'a@example.com', 'pw'))
+        self.jane = Party.objects.create(
+            name='Jane Roe', person_type='NATURAL_PERSON', email='jroe@example.com',
+            tax_identification_number='US-123456',
+        )
+        Party.objects.bulk_create([
+            Party(name=f'Acme {n:02}', person_type='JURIDICAL_PERSON', active=n != 0)
+            for n in range(25)
+        ])
+
+    def test_search_matches_name_email_and_tin_prefixes(self):
+        for term in ('jane', 'JROE@', 'us-123', ' Jane Roe '):
+            with self.subTest(term=term):
+                self.assertEqual(list(Party.objects.search(term)), [self.jane])
+        self.assertEqual(Party.objects.search('acme').count(), 25)
+        self.assertEqual(Party.objects.search('').count(), 26)
+
+    def test_search_api_pages_without_counting(self):
+        url = '/parties/api/search/'
+        with self.assertNumQueries(3):  # session, user, one page
+            first = self.client.get(url, {'q': 'acme', 'page_size': 10}).json()
+        self.assertEqual([party['name'] for party in first['results']][:2], ['Acme 01', 'Acme 02'])
+        self.assertTrue(first['has_next'])
+
+        last = self.client.get(url, {'q': 'acme', 'page_size': 10, 'page': 3}).json()
+        self.assertEqual(len(last['results']), 4)  # Acme 00 is inactive
+        self.assertFalse(last['has_next'])
+        self.assertEqual(
+            len(self.client.get(url, {'q': 'acme', 'active': '0', 'page': 2}).json()['results']), 5
+        )
+
+        for params in ({'page': 0}, {'page_size': 500}, {'page': 'x'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(url, params).status_code, 400)
+
+    def test_admin_autocomplete_uses_party_search(self):
+        response = self.client.get('/admin/autocomplete/', {
+            'app_label': 'corporate', 'model_name': 'nodeownership',
+            'field_name': 'owner_party', 'term': 'us-12',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()['results'], [{'id': str(self.jane.pk), 'text': str(self.jane)}]
+        )
+
+    def test_changelist_keeps_substring_search(self):
+        response = self.client.get('/admin/parties/party/', {'q': 'roe'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.jane])
+
+    def test_wizard_page_no_longer_lists_every_party(self):
+        response = self.client.get('/corporate/structure-wizard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'Acme 01')
+        self.assertContains(response, 'data-search-url="/parties/api/search/"')
+
+    def test_wizard_data_is_serialized_as_json(self):
+        Entity.objects.create(name='</script><script>alert(1)</script> LLC')
+        response = self.client.get('/corporate/structure-wizard/')
+        self.assertNotContains(response, '<script>alert(1)')
+        self.assertContains(response, '<script id="wizard-parties" type="application/json">[]</script>')
+        self.assertEqual(
+            [entity['name'] for entity in response.context['wizard_entities']],
+            ['</script><script>alert(1)</script> LLC'],
+        )
@@ -0,0 +1,12 @@
+from django.urls import path
+from . import views
+
+app_name = 'parties'
+
+urlpatterns = [
+    path('api/search/', views.party_search_api, name='party_search'),
+    path(
+        'api/<str:giver_type>/<int:giver_id>/beneficiaries/', views.beneficiary_allocation_api,
+        name='beneficiary_allocation'
+    ),
+]
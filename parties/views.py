@@ -0,0 +1,95 @@
+import json
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import ValidationError
+from django.http import JsonResponse
+from django.views.decorators.http import require_http_methods
+
+from corporate.models import Entity
+from .beneficiaries import allocate_beneficiaries, giver_field
+from .models import BeneficiaryRelation, Party
+
+GIVER_MODELS = {'party': Party, 'entity': Entity}
+
+
+def _relation(relation):
+    return {
+        'id': relation.pk,
+        'beneficiary_id': relation.beneficiary_id,
+        'percentage': relation.percentage,
+        'conditions': relation.conditions,
+        'effective_date': relation.effective_date,
+        'active': relation.active,
+    }
+
+
+@staff_member_required
+@require_http_methods(["GET", "POST"])
+def beneficiary_allocation_api(request, giver_type, giver_id):
+    """
+    Beneficiaries of a Party or Entity giver. POST replaces or updates the
+    whole set in one go: {"beneficiaries": [{"beneficiary": id,
+    "percentage": "50.00", ...}], "replace": true}
+    """
+    model = GIVER_MODELS.get(giver_type)
+    giver = model.objects.filter(pk=giver_id).first() if model else None
+    if giver is None:
+        return JsonResponse({'error': 'Giver not found'}, status=404)
+
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            allocations = data['beneficiaries']
+            if not isinstance(allocations, list):
+                raise TypeError
+        except (ValueError, KeyError, TypeError):
+            return JsonResponse({'error': 'beneficiaries must be a list'}, status=400)
+        try:
+            allocate_beneficiaries(giver, allocations, replace=bool(data.get('replace')))
+        except ValidationError as e:
+            return JsonResponse({'error': e.messages}, status=400)
+
+    relations = list(
+        BeneficiaryRelation.objects.filter(**{giver_field(giver): giver}).order_by('pk')
+    )
+    return JsonResponse({
+        'giver': {'type': giver_type, 'id': giver.pk, 'name': giver.name},
+        'beneficiaries': [_relation(relation) for relation in relations],
+        'total': sum(relation.percentage for relation in relations if relation.active),
+    })
+
+
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+
+
+@staff_member_required
+def party_search_api(request):
+    """
+    Paginated party search for autocompletes: ?q= matches name, e-mail or
+    TIN (see PartyQuerySet.search), ?page= from 1, ?page_size= up to
+    MAX_SEARCH_PAGE_SIZE
+    """
+    try:
+        page = int(request.GET.get('page', 1))
+        page_size = int(request.GET.get('page_size', SEARCH_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({'error': 'page and page_size must be integers'}, status=400)
+    if page < 1 or not 1 <= page_size <= MAX_SEARCH_PAGE_SIZE:
+        return JsonResponse({'error': 'Invalid page or page_size'}, status=400)
+
+    parties = Party.objects.search(request.GET.get('q', ''))
+    if request.GET.get('active', '1') != '0':
+        parties = parties.filter(active=True)
+    # Uma linha a mais indica a próxima página, sem COUNT(*)
+    offset = (page - 1) * page_size
+    rows = list(
+        parties.order_by('name', 'pk').values(
+            'id', 'name', 'person_type', 'email', 'tax_identification_number', 'nationality',
+        )[offset:offset + page_size + 1]
+    )
+    return JsonResponse({
+        'results': rows[:page_size],
+        'page': page,
+        'has_next': len(rows) > page_size,
+    })
@@ -1,4 +1,5 @@
 from django.contrib import admin
+from financial_department.quotes import cached_structure_quote
 from .models import Partner, Contact, StructureRequest, StructureApproval
 
 
@@ -13,6 +14,7 @@ class PartnerAdmin(admin.ModelAdmin):
     list_display = ['company_name', 'partnership_status', 'partnership_start_date']
     list_filter = ['partnership_status', 'partnership_start_date']
     search_fields = ['company_name', 'party__name']
+    autocomplete_fields = ['party']
     inlines = [ContactInline]
     fieldsets = [
         ('Basic Information', {
@@ -46,7 +48,7 @@ class StructureRequestAdmin(admin.ModelAdmin):
     list_display = ['__str__', 'status', 'submitted_at', 'get_requesting_parties']
     list_filter = ['status', 'submitted_at']
     search_fields = ['description']
-    filter_horizontal = ['requesting_parties']
+    autocomplete_fields = ['requesting_parties', 'point_of_contact_party']
     fieldsets = [
         ('Request Details', {
             'fields': ['description', 'requesting_parties']
@@ -71,9 +73,10 @@ class StructureApprovalAdmin(admin.ModelAdmin):
     list_display = ['structure', 'action', 'action_date', 'processed_by']
     list_filter = ['action', 'action_date']
     search_fields = ['structure__name']
+    autocomplete_fields = ['approver', 'rejector']
     fieldsets = [
         ('Structure Information', {
-            'fields': ['structure']
+            'fields': ['structure', 'quote_summary']
         }),
         ('Approval Action', {
             'fields': ['action']
@@ -86,7 +89,20 @@ class StructureApprovalAdmin(admin.ModelAdmin):
         }),
     ]
     ordering = ['-action_date']
-    readonly_fields = ['action_date']
+    readonly_fields = ['action_date', 'quote_summary']
+
+    @admin.display(description='Quoted Price')
+    def quote_summary(self, obj):
+        quote = cached_structure_quote(obj.structure_id) if obj.structure_id else None
+        if not quote or not quote['totals']:
+            return '-'
+        summary = ', '.join(
+            f"{totals['total_cost']:,.2f} {currency}"
+            for currency, totals in sorted(quote['totals'].items())
+        )
+        if quote['unpriced_nodes']:
+            summary += f" ({len(quote['unpriced_nodes'])} entities without price)"
+        return summary
 
 
 # Note: Legacy models (Product, ProductHierarchy, PersonalizedProduct) are kept in models.py
@@ -1,5 +1,7 @@
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
+
+from corporate.mixins import ChangeTrackingMixin
 
 
 class Partner(models.Model):
@@ -63,11 +65,13 @@ class Contact(models.Model):
         return f"{self.name} ({self.role}) - {self.partner.company_name}"
 
 
-class StructureRequest(models.Model):
+class StructureRequest(ChangeTrackingMixin, models.Model):
     """
     Requests for Corporate team to build structures
     """
 
+    tracked_fields = ('status',)
+
     STATUS_CHOICES = [
         ('SUBMITTED', 'Submitted'),
         ('IN_REVIEW', 'In Review'),
@@ -110,6 +114,16 @@ class StructureRequest(models.Model):
     # Status tracking
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='SUBMITTED')
 
+    # Work queue claim (lease renewed by heartbeat, free again once expired)
+    claimed_by = models.ForeignKey(
+        'auth.User',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='claimed_structure_requests'
+    )
+    claim_expires_at = models.DateTimeField(null=True, blank=True)
+
     # Metadata
     submitted_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -121,6 +135,7 @@ class StructureRequest(models.Model):
         indexes = [
             models.Index(fields=["status"]),
             models.Index(fields=["submitted_at"]),
+            models.Index(fields=["status", "claim_expires_at"]),
         ]
 
     def __str__(self):
@@ -296,13 +311,17 @@ class Product(models.Model):
         if not self.custo_automatico and self.custo_manual:
             return self.custo_manual
 
-        # Calcular automaticamente baseado nas estruturas
-        total = 0
-        for hierarchy in self.producthierarchy_set.all():
-            # Note: This will need to be updated when Entity pricing is implemented
-            total += 0  # Placeholder - will be calculated from financial_department
+        # Calcular automaticamente a partir dos EntityPrice (uma query para todos),
+        # convertidos para FX_BASE_CURRENCY antes de somar
+        from financial_department.fx import Converter
+        from financial_department.quotes import entity_totals
 
-        return total
+        hierarchies = list(self.producthierarchy_set.all())
+        prices = entity_totals(hierarchy.structure_id for hierarchy in hierarchies)
+        converter = Converter()
+        return sum(
+            (hierarchy.get_effective_cost(prices, converter) for hierarchy in hierarchies), 0
+        )
 
 
 class ProductHierarchy(models.Model):
@@ -356,19 +375,37 @@ class ProductHierarchy(models.Model):
             f"{self.structure.name} (#{self.order})"
         )
 
-    def get_effective_cost(self):
-        """Retorna o custo efetivo da estrutura no produto"""
+    def get_effective_cost(self, prices=None, converter=None):
+        """
+        Retorna o custo efetivo da estrutura no produto, em FX_BASE_CURRENCY
+
+        ``prices`` ({entity_id: EntityPrice anotado}) e ``converter``
+        (fx.Converter) evitam queries por hierarquia quando vários custos são
+        calculados juntos. O EntityPrice é convertido da sua base_currency pela
+        taxa de hoje (ExchangeRateMissing se não houver taxa).
+        """
         if self.custom_cost:
             return self.custom_cost
-        # Note: This will need to be updated when Entity pricing is implemented
-        return 0  # Placeholder
+        from financial_department.fx import Converter
+
+        if prices is None:
+            from financial_department.quotes import entity_totals
+
+            prices = entity_totals([self.structure_id])
+        price = prices.get(self.structure_id)
+        if not price:
+            return 0
+        converter = converter or Converter()
+        return converter.convert(price.total_cost, price.base_currency)
 
 
-class PersonalizedProduct(models.Model):
+class PersonalizedProduct(ChangeTrackingMixin, models.Model):
     """
     Produto personalizado que representa Products ou Legal Structures
     """
 
+    tracked_fields = ("status",)
+
     STATUS_CHOICES = [
         ("DRAFT", "Draft"),
         ("ACTIVE", "Active"),
@@ -465,6 +502,12 @@ class PersonalizedProduct(models.Model):
             models.Index(fields=["ativo"]),
         ]
 
+    def save(self, *args, **kwargs):
+        # O signal de aprovação grava RelationshipStructures e o webhook
+        # (outbox) na mesma transação do produto
+        with transaction.atomic(using=kwargs.get("using"), savepoint=False):
+            super().save(*args, **kwargs)
+
     def __str__(self):
         base_name = ""
         if self.base_product:
@@ -515,18 +558,3 @@ class PersonalizedProduct(models.Model):
             # Note: This will need to be updated when Entity pricing is implemented
 
         return 0
-
-    def save(self, *args, **kwargs):
-        """Override save to track status changes for signals"""
-        # Store previous status for signal handling
-        if self.pk:
-            try:
-                old_instance = PersonalizedProduct.objects.get(pk=self.pk)
-                self._previous_status = old_instance.status
-            except PersonalizedProduct.DoesNotExist:
-                self._previous_status = None
-        else:
-            self._previous_status = None
-
-        super().save(*args, **kwargs)
-
@@ -1,3 +1,46 @@
 from django.test import TestCase
 
-# Create your tests here.
+from corporate.models import Entity
+from .models import PersonalizedProduct, StructureRequest
+
+
+class ChangeTrackingTest(TestCase):
+    def setUp(self):
+        self.entity = Entity.objects.create(name='Test LLC')
+        self.product = PersonalizedProduct.objects.create(
+            nome='Test Product', base_structure=self.entity
+        )
+
+    def test_new_instance_reports_change_from_none(self):
+        product = PersonalizedProduct(nome='New', base_structure=self.entity)
+        self.assertTrue(product.has_changed('status'))
+        self.assertIsNone(product.previous('status'))
+
+    def test_loaded_instance_tracks_status(self):
+        product = PersonalizedProduct.objects.get(pk=self.product.pk)
+        self.assertFalse(product.has_changed('status'))
+
+        product.status = 'ACTIVE'
+        self.assertTrue(product.has_changed('status'))
+        self.assertEqual(product.previous('status'), 'DRAFT')
+
+        # Saving needs no SELECT to learn the previous status
+        with self.assertNumQueries(1):
+            product.save()
+        self.assertFalse(product.has_changed('status'))
+        self.assertEqual(product.previous('status'), 'ACTIVE')
+
+    def test_partial_save_keeps_unsaved_changes(self):
+        request = StructureRequest.objects.create(description='Test')
+        request.status = 'IN_REVIEW'
+        request.description = 'Updated'
+        request.save(update_fields=['description'])
+
+        self.assertTrue(request.has_changed('status'))
+        request.refresh_from_db()
+        self.assertFalse(request.has_changed('status'))
+        self.assertEqual(request.status, 'SUBMITTED')
+
+    def test_untracked_field_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.product.has_changed('nome')
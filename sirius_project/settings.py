@@ -95,6 +95,30 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# Deployments run several worker processes, so the cache is shared by all of
+# them (database cache, needs `python manage.py createcachetable`) and an
+# invalidation reaches every worker; development keeps a per-process cache.
+# CACHE_BACKEND/CACHE_LOCATION select another backend such as Redis.
+CACHES = {
+    'default': {
+        'BACKEND': config(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache' if DEBUG
+            else 'django.core.cache.backends.db.DatabaseCache',
+        ),
+        'LOCATION': config('CACHE_LOCATION', default='sirius_cache'),
+    }
+}
+
+# Dashboard cache: seconds an entry is fresh, then how long it may still be
+# served stale while a single request recomputes it
+DASHBOARD_CACHE_TTL = config('DASHBOARD_CACHE_TTL', default=30, cast=int)
+DASHBOARD_CACHE_STALE_TTL = config('DASHBOARD_CACHE_STALE_TTL', default=60, cast=int)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -144,11 +168,61 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 DEFAULT_CURRENCY = 'USD'
 CURRENCIES = ('USD', 'BRL', 'EUR')
 
+# Exchange rates (financial_department.ExchangeRate) are quoted against this
+FX_BASE_CURRENCY = config('FX_BASE_CURRENCY', default='USD')
+FX_CACHE_TTL = config('FX_CACHE_TTL', default=3600, cast=int)
+
 # Corporate Relationship Webhook Configuration
 RELATIONSHIP_WEBHOOK_URL = config('RELATIONSHIP_WEBHOOK_URL', default='http://localhost:8080/webhook')
 WEBHOOK_TIMEOUT = config('WEBHOOK_TIMEOUT', default=10, cast=int)
 WEBHOOK_RETRIES = config('WEBHOOK_RETRIES', default=3, cast=int)
 
+# Webhook outbox worker (run_webhook_worker)
+WEBHOOK_BATCH_SIZE = config('WEBHOOK_BATCH_SIZE', default=20, cast=int)
+WEBHOOK_WORKER_CONCURRENCY = config('WEBHOOK_WORKER_CONCURRENCY', default=4, cast=int)
+WEBHOOK_BACKOFF_SECONDS = config('WEBHOOK_BACKOFF_SECONDS', default=30, cast=int)
+WEBHOOK_BACKOFF_MAX_SECONDS = config('WEBHOOK_BACKOFF_MAX_SECONDS', default=3600, cast=int)
+# Receivers that accept several events per request ({"events": [...]})
+WEBHOOK_BATCH_URLS = config('WEBHOOK_BATCH_URLS', default='', cast=lambda v: [s.strip() for s in v.split(',') if s.strip()])
+WEBHOOK_MAX_BATCH_EVENTS = config('WEBHOOK_MAX_BATCH_EVENTS', default=50, cast=int)
+# Consecutive failures before a destination is paused, and for how long (seconds)
+WEBHOOK_CIRCUIT_THRESHOLD = config('WEBHOOK_CIRCUIT_THRESHOLD', default=5, cast=int)
+WEBHOOK_CIRCUIT_COOLDOWN = config('WEBHOOK_CIRCUIT_COOLDOWN', default=60, cast=int)
+
+# WebhookLog retention (prune_webhook_logs)
+WEBHOOK_LOG_COMPACT_DAYS = config('WEBHOOK_LOG_COMPACT_DAYS', default=30, cast=int)
+WEBHOOK_LOG_RETENTION_DAYS = config('WEBHOOK_LOG_RETENTION_DAYS', default=180, cast=int)
+WEBHOOK_LOG_ARCHIVE_DIR = config('WEBHOOK_LOG_ARCHIVE_DIR', default='')
+
+# ServiceActivity due-date scan (scan_service_activities)
+SERVICE_ACTIVITY_DUE_SOON_DAYS = config('SERVICE_ACTIVITY_DUE_SOON_DAYS', default=7, cast=int)
+SERVICE_ACTIVITY_DIGEST_TTL = config('SERVICE_ACTIVITY_DIGEST_TTL', default=86400, cast=int)
+
+# Passport expiry scan (scan_passport_expiry): notice windows in days and
+# recipients for parties that no service executor is responsible for
+PASSPORT_EXPIRY_WINDOWS = config('PASSPORT_EXPIRY_WINDOWS', default='90,30,7', cast=lambda v: [int(s) for s in v.split(',') if s.strip()])
+PASSPORT_EXPIRY_NOTIFY_EMAILS = config('PASSPORT_EXPIRY_NOTIFY_EMAILS', default='', cast=lambda v: [s.strip() for s in v.split(',') if s.strip()])
+
+# E-mail (digests); the console backend prints messages locally
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='sirius@localhost')
+
+# Executor workload report: weeks ahead and cache lifetime (cached per day)
+WORKLOAD_WEEKS = config('WORKLOAD_WEEKS', default=8, cast=int)
+WORKLOAD_CACHE_TTL = config('WORKLOAD_CACHE_TTL', default=86400, cast=int)
+# Partner portfolio rollup cache (invalidated when the portfolio changes)
+PORTFOLIO_CACHE_TTL = config('PORTFOLIO_CACHE_TTL', default=3600, cast=int)
+# Structure quotes (cache key carries structure/price versions, so no staleness)
+STRUCTURE_QUOTE_TTL = config('STRUCTURE_QUOTE_TTL', default=86400, cast=int)
+# Compliance calendar: default window (days ahead) and cache lifetime
+COMPLIANCE_CALENDAR_DAYS = config('COMPLIANCE_CALENDAR_DAYS', default=365, cast=int)
+COMPLIANCE_CALENDAR_TTL = config('COMPLIANCE_CALENDAR_TTL', default=86400, cast=int)
+# Rendered .ics events (keyed by the source row's updated_at, never stale)
+CALENDAR_FEED_EVENT_TTL = config('CALENDAR_FEED_EVENT_TTL', default=7 * 86400, cast=int)
+
+# Review work queue: seconds a claim lasts without a heartbeat
+WORK_QUEUE_LEASE_SECONDS = config('WORK_QUEUE_LEASE_SECONDS', default=300, cast=int)
+
 # Authentication Configuration
 LOGIN_URL = '/admin/login/'
 LOGIN_REDIRECT_URL = '/admin/dashboard/'
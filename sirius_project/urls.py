@@ -30,6 +30,8 @@ urlpatterns = [
     path('admin/dashboard/', include('dashboard.urls', namespace='dashboard')),
     path('admin/', admin.site.urls),
     path('corporate/', include('corporate.urls', namespace='corporate')),
+    path('relationship/', include('corporate_relationship.urls', namespace='corporate_relationship')),
+    path('parties/', include('parties.urls', namespace='parties')),
 ]
 
 # Serve static files during development
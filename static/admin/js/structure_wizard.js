@@ -409,13 +409,74 @@
             filterItems('#entities-list .entity-card', searchTerm);
         });
         
-        // UBO search
+        // UBO search (server side, parties:party_search)
+        var searchTimer = null;
         $('#ubo-search').on('input', function() {
-            var searchTerm = $(this).val().toLowerCase();
-            filterItems('#ubos-list .ubo-card', searchTerm);
+            var searchTerm = $(this).val().trim();
+            clearTimeout(searchTimer);
+            searchTimer = setTimeout(function() {
+                searchUBOs(searchTerm, 1);
+            }, 250);
+        });
+
+        $('#ubo-load-more').on('click', function() {
+            searchUBOs(UBOSearch.term, UBOSearch.page + 1);
         });
     }
 
+    var UBOSearch = { term: '', page: 1, request: null };
+
+    function searchUBOs(searchTerm, page) {
+        var $list = $('#ubos-list');
+        if (UBOSearch.request) {
+            UBOSearch.request.abort();
+        }
+        if (!searchTerm) {
+            $list.html('<div class="empty-state">Type a name, e-mail or TIN to search</div>');
+            $('#ubo-load-more').hide();
+            return;
+        }
+
+        UBOSearch.term = searchTerm;
+        UBOSearch.page = page;
+        UBOSearch.request = $.getJSON($list.data('search-url'), { q: searchTerm, page: page })
+            .done(function(data) {
+                if (page === 1) {
+                    $list.empty();
+                }
+                data.results.forEach(function(party) {
+                    if (!findUBOById(party.id)) {
+                        wizardData.parties.push(party);
+                    }
+                    $list.append(renderUBOCard(party));
+                });
+                if (page === 1 && data.results.length === 0) {
+                    $list.html('<div class="empty-state">No parties found</div>');
+                }
+                $('#ubo-load-more').toggle(data.has_next);
+            });
+    }
+
+    function renderUBOCard(party) {
+        var selected = StructureWizard.selectedUBOs.indexOf(party.id) !== -1;
+        var $card = $('<div class="item-card ubo-card">').attr('data-id', party.id).toggleClass('selected', selected);
+        var $header = $('<div class="item-header">')
+            .append($('<span class="item-name">').text(party.name))
+            .append('<span class="item-type">UBO</span>');
+        var $details = $('<div class="item-details">');
+        if (party.nationality) {
+            $details.append($('<span class="nationality">').text('🌍 ' + party.nationality));
+        }
+        if (party.tax_identification_number) {
+            $details.append($('<span class="tin">').text('🪪 ' + party.tax_identification_number));
+        }
+        var $button = $('<button type="button" class="btn-select">')
+            .text(selected ? 'Selected' : 'Select')
+            .toggleClass('selected', selected)
+            .on('click', function() { selectUBO(party.id); });
+        return $card.append($header, $details, $('<div class="item-actions">').append($button));
+    }
+
     function filterItems(selector, searchTerm) {
         $(selector).each(function() {
             var $item = $(this);